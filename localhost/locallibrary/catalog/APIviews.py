@@ -2,12 +2,26 @@ import json
 
 from django.contrib.auth.models import Group, User
 from django.http.response import HttpResponse
-from rest_framework import permissions, viewsets
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import prefetch_related_objects
+from django.utils.decorators import method_decorator
+from rest_framework import generics, pagination, permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
+from catalog import loans
 from catalog.models import Author, Book, BookInstance, Genre
-from catalog.serializers import (AuthorSerializer, BookSerializer,
-                                 GenreSerializer, GroupSerializer,
-                                 UserSerializer)
+from catalog.pagination import CatalogCursorPagination
+from catalog.renderers import CompactJSONRenderer
+from catalog.search import search
+from catalog.serializers import (AuthorBulkSerializer, AuthorSerializer,
+                                 BookBulkSerializer, BookSerializer,
+                                 GenreBulkSerializer, GenreSerializer,
+                                 GroupSerializer, LoanSerializer,
+                                 UserSerializer, requested_fields)
+from catalog.versions import conditional
 
 
 def api(request):
@@ -35,26 +49,211 @@ class GroupViewSet(viewsets.ModelViewSet):
     serializer_class = GroupSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-class BookViewSet(viewsets.ModelViewSet):
+class CompactFormatMixin:
+    """
+    Reads with ``?format=compact`` use ``compact_serializer_class``, giving
+    related objects as ids rather than reversing a URL for each of them.
+    ``?fields=`` limits the fields serialized in either format.
+    """
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [CompactJSONRenderer]
+    compact_serializer_class = None
+
+    def get_serializer_class(self):
+        renderer = getattr(self.request, 'accepted_renderer', None)
+        if (self.compact_serializer_class and self.request.method in permissions.SAFE_METHODS
+                and getattr(renderer, 'format', None) == 'compact'):
+            return self.compact_serializer_class
+        return super().get_serializer_class()
+
+    def wants_field(self, name):
+        fields = requested_fields(self.request)
+        return fields is None or name in fields
+
+
+class BulkWriteMixin:
+    """
+    Adds ``/bulk/`` to a viewset, writing a list of objects in one request:
+    POST creates them, PATCH updates them (each item giving its ``id``) and
+    DELETE deletes the objects of a list of ids.
+
+    The batch is validated as a whole and written in one transaction, so
+    either every item is written or none is and the errors are returned by
+    item. A batch conflicting with a concurrent write (e.g. a unique value
+    written meanwhile) gets 409 Conflict and can be sent again. Model
+    permissions are checked once for the batch.
+    """
+    bulk_serializer_class = None
+    bulk_prefetch = ()
+
+    @action(detail=False, methods=['post', 'patch', 'delete'], url_path='bulk',
+            permission_classes=[permissions.IsAuthenticated, permissions.DjangoModelPermissions])
+    def bulk(self, request):
+        if request.method == 'DELETE':
+            return self.bulk_delete(request.data)
+        if request.method == 'PATCH':
+            instances = self.bulk_instances(request.data)
+            serializer = self.bulk_serializer_class(instances, data=request.data, many=True, partial=True)
+        else:
+            serializer = self.bulk_serializer_class(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        try:
+            objs = serializer.save()
+        except IntegrityError:
+            return Response({'non_field_errors': ['The batch conflicts with a concurrent write, send it again.']},
+                            status=status.HTTP_409_CONFLICT)
+
+        # Read the written rows back with their relations in a fixed number
+        # of queries.
+        written = self.get_queryset().prefetch_related(*self.bulk_prefetch).in_bulk([obj.pk for obj in objs])
+        data = self.bulk_serializer_class([written[obj.pk] for obj in objs], many=True).data
+        return Response(data, status=status.HTTP_201_CREATED if request.method == 'POST' else status.HTTP_200_OK)
+
+    def bulk_instances(self, items):
+        """ Return the objects named by the ids of a list of items. """
+        if not isinstance(items, list):
+            return []
+        ids = [item.get('id') for item in items if isinstance(item, dict)]
+        ids = [pk for pk in ids if isinstance(pk, int)]
+        return list(self.get_queryset().filter(pk__in=ids))
+
+    def bulk_delete(self, ids):
+        max_items = settings.CATALOG_BULK_MAX_ITEMS
+        if not isinstance(ids, list) or not ids or not all(isinstance(pk, int) for pk in ids):
+            return Response({'non_field_errors': ['Expected a list of ids.']}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > max_items:
+            return Response({'non_field_errors': [f'At most {max_items} items per request.']},
+                            status=status.HTTP_400_BAD_REQUEST)
+        queryset = self.get_queryset().filter(pk__in=ids)
+        existing = set(queryset.values_list('pk', flat=True))
+        errors = [{} if pk in existing else {'id': [f'Invalid pk "{pk}" - object does not exist.']} for pk in ids]
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            queryset.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@method_decorator(conditional(Book, Genre, BookInstance), name='list')
+@method_decorator(conditional(Book, Genre, BookInstance), name='retrieve')
+class BookViewSet(CompactFormatMixin, BulkWriteMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows books to be viewed or edited.
     """
     queryset = Book.objects.all()
     serializer_class = BookSerializer
+    compact_serializer_class = BookBulkSerializer
+    bulk_serializer_class = BookBulkSerializer
+    bulk_prefetch = ('genre',)
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CatalogCursorPagination
+    cursor_ordering = ('title', 'id')
+    replica_actions = ('list', 'retrieve')
 
-class GenreViewSet(viewsets.ModelViewSet):
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.wants_field('genre'):
+            queryset = queryset.prefetch_related('genre')
+        return queryset
+
+@method_decorator(conditional(Genre), name='list')
+@method_decorator(conditional(Genre), name='retrieve')
+class GenreViewSet(CompactFormatMixin, BulkWriteMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows genres to be viewed or edited.
     """
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
+    compact_serializer_class = GenreBulkSerializer
+    bulk_serializer_class = GenreBulkSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CatalogCursorPagination
+    cursor_ordering = ('name', 'id')
+    replica_actions = ('list', 'retrieve')
 
-class AuthorViewSet(viewsets.ModelViewSet):
+@method_decorator(conditional(Author), name='list')
+@method_decorator(conditional(Author), name='retrieve')
+class AuthorViewSet(CompactFormatMixin, BulkWriteMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows authors to be viewed or edited.
     """
     queryset = Author.objects.all()
     serializer_class = AuthorSerializer
+    compact_serializer_class = AuthorBulkSerializer
+    bulk_serializer_class = AuthorBulkSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CatalogCursorPagination
+    cursor_ordering = ('last_name', 'first_name', 'id')
+    replica_actions = ('list', 'retrieve')
+
+
+class SearchPagination(pagination.PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+@method_decorator(conditional(Book, Author, Genre, BookInstance), name='get')
+class SearchAPIView(CompactFormatMixin, generics.ListAPIView):
+    """
+    API endpoint searching books by title, summary, ISBN, author and genre
+    (``?q=``), best matches first.
+    """
+    serializer_class = BookSerializer
+    compact_serializer_class = BookBulkSerializer
+    pagination_class = SearchPagination
     permission_classes = [permissions.IsAuthenticated]
+    replica_reads = True
+
+    def get_queryset(self):
+        return search(self.request.query_params.get('q', ''))
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None and self.wants_field('genre'):
+            prefetch_related_objects(page, 'genre')
+        return page
+
+
+class CanManageLoans(permissions.BasePermission):
+    """ Librarians, who may mark books as returned. """
+
+    def has_permission(self, request, view):
+        return request.user.has_perm('catalog.can_mark_returned')
+
+
+class LoanViewSet(viewsets.ViewSet):
+    """
+    API endpoints lending copies: ``checkout/``, ``return/``, ``renew/`` and
+    ``reserve/`` take a list of copy ids (``copies``) and change all those
+    they can in one conditional UPDATE, returning the copies changed and why
+    the others were not.
+    """
+    permission_classes = [permissions.IsAuthenticated, CanManageLoans]
+    serializer_class = LoanSerializer
+
+    def run(self, request, operation, required=()):
+        serializer = LoanSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        missing = {name: ['This field is required.'] for name in required if name not in data}
+        if missing:
+            return Response(missing, status=status.HTTP_400_BAD_REQUEST)
+        result = operation(data)
+        return Response({'done': result.done, 'failed': {str(pk): reason for pk, reason in result.failed.items()}})
+
+    @action(detail=False, methods=['post'])
+    def checkout(self, request):
+        return self.run(request, lambda data: loans.checkout(data['copies'], data['borrower'], data.get('due_back')),
+                        required=['borrower'])
+
+    @action(detail=False, methods=['post'], url_path='return', url_name='return')
+    def return_copies(self, request):
+        return self.run(request, lambda data: loans.return_copies(data['copies']))
+
+    @action(detail=False, methods=['post'])
+    def renew(self, request):
+        return self.run(request, lambda data: loans.renew(data['copies'], data['due_back']), required=['due_back'])
+
+    @action(detail=False, methods=['post'])
+    def reserve(self, request):
+        return self.run(request, lambda data: loans.reserve(data['copies'], data.get('borrower', request.user)))
@@ -2,39 +2,71 @@ from django.contrib import admin
 
 # Register your models here.
 
-from .models import Author, Genre, Book, BookInstance
+from .models import Author, Genre, Book, BookInstance, OverdueRun
+from .inlines import PaginatedInlineMixin, PaginatedInlinesAdminMixin
+from .pagination import EstimatedCountPaginator
 
 # admin.site.register(Book)
 # admin.site.register(Author)
-admin.site.register(Genre)
 # admin.site.register(BookInstance)
 
-class BookInline(admin.StackedInline):
+
+@admin.register(Genre)
+class GenreAdmin(admin.ModelAdmin):
+    # Needed by the genre autocomplete of the books
+    search_fields = ['name']
+
+
+class BookInline(PaginatedInlineMixin, admin.StackedInline):
     model = Book
+    extra = 0
+    ordering = ('title', 'id')
+    autocomplete_fields = ['genre']
 
 # Define the admin class
-class AuthorAdmin(admin.ModelAdmin):
+class AuthorAdmin(PaginatedInlinesAdminMixin, admin.ModelAdmin):
     list_display = ('last_name', 'first_name', 'date_of_birth', 'date_of_death')
     fields = ['first_name', 'last_name', ('date_of_birth', 'date_of_death')]
+    search_fields = ['last_name', 'first_name']
 
     inlines = [BookInline]
 
 # Register the admin class with the associated model
 admin.site.register(Author, AuthorAdmin)
 
-class BooksInstanceInline(admin.TabularInline):
+class BooksInstanceInline(PaginatedInlineMixin, admin.TabularInline):
     model = BookInstance
+    extra = 0
+    ordering = ('due_back', 'id')
+    # A <select> of every user on each copy row is not an option
+    autocomplete_fields = ['borrower']
 
 @admin.register(Book)
-class BookAdmin(admin.ModelAdmin):
+class BookAdmin(PaginatedInlinesAdminMixin, admin.ModelAdmin):
     list_display = ('title', 'author', 'display_genre')
+    list_select_related = ('author',)
+    search_fields = ['title', 'isbn']
+    autocomplete_fields = ['author', 'genre']
+    paginator = EstimatedCountPaginator
+    # Don't count the whole table a second time for "(N total)"
+    show_full_result_count = False
     inlines = [BooksInstanceInline]
 
+    def get_queryset(self, request):
+        # For display_genre, which slices the prefetched genres
+        return super().get_queryset(request).prefetch_related('genre')
+
 # Register the Admin classes for BookInstance using the decorator
 @admin.register(BookInstance)
 class BookInstanceAdmin(admin.ModelAdmin):
     list_display = ['book', 'status', 'borrower', 'due_back', 'id']
     list_filter = ('status', 'due_back')
+    list_select_related = ('book', 'borrower')
+    # Total ordering, served by the (due_back, id) index
+    ordering = ('due_back', 'id')
+    autocomplete_fields = ['book', 'borrower']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     fieldsets = (
         (None, {
@@ -44,3 +76,8 @@ class BookInstanceAdmin(admin.ModelAdmin):
             'fields': ('status', 'due_back', 'borrower')
         }),
     )
+
+
+@admin.register(OverdueRun)
+class OverdueRunAdmin(admin.ModelAdmin):
+    list_display = ('started_at', 'loans', 'emails', 'skipped', 'chunks', 'total_seconds')
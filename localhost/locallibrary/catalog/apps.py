@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class CatalogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'catalog'
+
+    def ready(self):
+        from catalog import availability, counters, database, exporter, fragments, search, versions
+        availability.connect_signals()
+        counters.connect_signals()
+        database.connect_signals()
+        exporter.connect_signals()
+        fragments.connect_signals()
+        search.connect_signals()
+        versions.connect_signals()
@@ -0,0 +1,61 @@
+"""
+Asynchronous versions of the read-only pages, for ASGI deployments.
+
+Django 3.2 has no asynchronous ORM, so database work and template rendering
+(which reads the session and user lazily) run through sync_to_async, in as
+few calls as possible per request. The home page counters missing from the
+cache are computed concurrently, each in a thread of its own, while the
+visit count is read.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http.response import HttpResponse
+from django.shortcuts import render
+
+from catalog import counters, views, visits
+
+
+async def index(request):
+    """ View function for home page of site."""
+    counter_values, num_visits = await asyncio.gather(
+        counters.aget_counters(),
+        sync_to_async(visits.get_visits)(request),
+    )
+    context = {
+        **counter_values,
+        'num_visits': num_visits,
+        'map_token': settings.MAP_TOKEN,
+    }
+    response = await sync_to_async(render)(request, 'index.html', context=context)
+    return visits.count_visit(response, num_visits)
+
+
+async def api(request):
+    """ Return Hello World """
+    return HttpResponse('{"message": "Hello World!"}')
+
+
+def render_generic_view(view_class, request, **kwargs):
+    """
+    Run a ListView or DetailView of catalog.views, conditional GET (ETag,
+    304) included, and render it, in one synchronous call.
+    """
+    response = view_class.as_view()(request, **kwargs)
+    if hasattr(response, 'render'):
+        # Not lazily, from the event loop
+        response.render()
+    return response
+
+
+async def book_list(request):
+    return await sync_to_async(render_generic_view)(views.BookListView, request)
+
+
+async def book_detail(request, pk):
+    return await sync_to_async(render_generic_view)(views.BookDetailView, request, pk=pk)
+
+
+async def author_list(request):
+    return await sync_to_async(render_generic_view)(views.AuthorListView, request)
@@ -0,0 +1,94 @@
+"""
+Denormalized availability of the copies of each book.
+
+Book.copies_available, copies_on_loan, copies_reserved, copies_maintenance
+and next_due_back summarize the BookInstance rows of a book, so that pages
+showing "3 of 7 copies available" do not aggregate the copies.
+
+They are recomputed from the copies, in a single UPDATE with subqueries,
+whenever a copy changes book, status or due date (model signals and
+catalog.signals.bulk_changed). Recomputing rather than incrementing keeps
+concurrent writers from making them drift; ``manage.py
+reconcile_availability`` rebuilds them after writes made behind the ORM's
+back.
+"""
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_init, post_save
+from django.utils import timezone
+
+from catalog import signals
+from catalog.models import Book, BookInstance
+
+# Book field counting the copies of each status.
+STATUS_FIELDS = {
+    'a': 'copies_available',
+    'o': 'copies_on_loan',
+    'r': 'copies_reserved',
+    'm': 'copies_maintenance',
+}
+
+FIELDS = [*STATUS_FIELDS.values(), 'next_due_back']
+
+
+def summary():
+    """ Return the expressions computing the availability of a book, by field. """
+    copies = BookInstance.objects.filter(book=OuterRef('pk')).order_by()
+    expressions = {
+        field: Coalesce(Subquery(
+            copies.filter(status=status).values('book').annotate(number=Count('pk')).values('number')
+        ), 0)
+        for status, field in STATUS_FIELDS.items()
+    }
+    expressions['next_due_back'] = Subquery(
+        copies.filter(status='o', due_back__isnull=False).order_by('due_back').values('due_back')[:1]
+    )
+    return expressions
+
+
+def refresh(book_ids):
+    """ Recompute the availability of the given books, returning how many were updated. """
+    book_ids = {pk for pk in book_ids if pk is not None}
+    if not book_ids:
+        return 0
+    return Book.objects.filter(pk__in=book_ids).update(**summary(), updated_at=timezone.now())
+
+
+def stale(book_ids):
+    """ Return the ids of the given books whose stored availability is wrong. """
+    computed = {f'computed_{field}': expression for field, expression in summary().items()}
+    books = Book.objects.filter(pk__in=book_ids).annotate(**computed).values('pk', *FIELDS, *computed)
+    return [
+        book['pk'] for book in books
+        if any(book[field] != book[f'computed_{field}'] for field in FIELDS)
+    ]
+
+
+def remember_state(sender, instance, **kwargs):
+    """ Keep the loaded book, status and due date to know what a save changed. """
+    if not {'book_id', 'status', 'due_back'} & instance.get_deferred_fields():
+        instance._availability_state = (instance.book_id, instance.status, instance.due_back)
+
+
+def copy_saved(sender, instance, created, **kwargs):
+    state = (instance.book_id, instance.status, instance.due_back)
+    previous = getattr(instance, '_availability_state', None)
+    if created or previous != state:
+        refresh([instance.book_id, previous[0] if previous else None])
+    instance._availability_state = state
+
+
+def copy_deleted(sender, instance, **kwargs):
+    refresh([instance.book_id])
+
+
+def bulk_changed(sender, pks, **kwargs):
+    if sender is BookInstance:
+        refresh(BookInstance.objects.filter(pk__in=pks).values_list('book_id', flat=True).distinct())
+
+
+def connect_signals():
+    post_init.connect(remember_state, sender=BookInstance, dispatch_uid='availability_init')
+    post_save.connect(copy_saved, sender=BookInstance, dispatch_uid='availability_copy_saved')
+    post_delete.connect(copy_deleted, sender=BookInstance, dispatch_uid='availability_copy_deleted')
+    signals.bulk_changed.connect(bulk_changed, dispatch_uid='availability_bulk_changed')
@@ -0,0 +1,75 @@
+"""
+Authentication backend caching the permissions of each user.
+
+ModelBackend reads a user's own and group permissions from the database
+(two queries) the first time a request checks one. CachedModelBackend keeps
+both sets in the cache, so the permission_required views, the API's
+permission classes and the ``perms`` of the templates cost no query in the
+steady state. Within a request the sets are kept on the user object, as
+ModelBackend does.
+
+The cache keys include the version of the users, groups and permissions
+(catalog.versions.AUTH), which any change to them bumps once committed: a
+user's permissions are recomputed after their groups, their own permissions
+or the permissions of a group changed. A set read while the change was not
+committed yet is stored under the previous version, which is no longer
+used.
+
+The version is bumped in the cache of the process handling the change, so
+the sets are only cached when the cache is shared by the worker processes
+(catalog.caches); with a per-process cache every request reads them from
+the database, as ModelBackend does.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from catalog import caches, versions
+
+CACHE_PREFIX = 'catalog:permissions:'
+
+
+def _key(user_obj):
+    version = versions.get_versions(versions.AUTH)[versions.AUTH]
+    return f'{CACHE_PREFIX}{version}:{user_obj.pk}'
+
+
+def _timeout():
+    return getattr(settings, 'CATALOG_PERMISSIONS_TIMEOUT', 60 * 60)
+
+
+class CachedModelBackend(ModelBackend):
+    """ ModelBackend reading the permission sets from the cache. """
+
+    def _load(self, user_obj):
+        if hasattr(user_obj, '_perm_cache'):
+            return
+        key = _key(user_obj)
+        permissions = cache.get(key)
+        if permissions is None:
+            permissions = (
+                super().get_user_permissions(user_obj),
+                super().get_group_permissions(user_obj),
+            )
+            cache.set(key, permissions, _timeout())
+        # The attributes ModelBackend keeps the sets of a request in
+        user_obj._user_perm_cache, user_obj._group_perm_cache = permissions
+        user_obj._perm_cache = {*permissions[0], *permissions[1]}
+
+    def _cacheable(self, user_obj, obj):
+        return user_obj.is_active and not user_obj.is_anonymous and obj is None and caches.shared()
+
+    def get_user_permissions(self, user_obj, obj=None):
+        if self._cacheable(user_obj, obj):
+            self._load(user_obj)
+        return super().get_user_permissions(user_obj, obj)
+
+    def get_group_permissions(self, user_obj, obj=None):
+        if self._cacheable(user_obj, obj):
+            self._load(user_obj)
+        return super().get_group_permissions(user_obj, obj)
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if self._cacheable(user_obj, obj):
+            self._load(user_obj)
+        return super().get_all_permissions(user_obj, obj)
@@ -0,0 +1,47 @@
+"""
+Helpers for writing many catalog rows at once.
+"""
+from django.db import IntegrityError, connections, router, transaction
+
+# Times the ids of a bulk insert are allocated again after another insert
+# took them.
+ATTEMPTS = 3
+
+
+def _last_pk(model, using):
+    # A locking read where the backend has one (MySQL): a concurrent
+    # allocation waits for this transaction rather than reading the same
+    # maximum. SQLite serializes the writing transactions itself.
+    return (model._default_manager.using(using).select_for_update()
+            .order_by('-pk').values_list('pk', flat=True).first()) or 0
+
+
+def bulk_create_with_pks(model, objs, batch_size=1000):
+    """
+    ``bulk_create()`` that always sets the primary keys of ``objs``.
+
+    Backends that cannot return the ids of a bulk insert (SQLite, MySQL)
+    get ids allocated after the current maximum. When another insert took
+    them first, the ids are allocated again, up to ATTEMPTS times, after
+    which the IntegrityError is raised.
+    """
+    objs = list(objs)
+    if not objs:
+        return objs
+    using = router.db_for_write(model)
+    manager = model._default_manager.using(using)
+    if connections[using].features.can_return_rows_from_bulk_insert or objs[0].pk is not None:
+        return manager.bulk_create(objs, batch_size=batch_size)
+    for attempt in range(1, ATTEMPTS + 1):
+        try:
+            with transaction.atomic(using=using):
+                for pk, obj in enumerate(objs, start=_last_pk(model, using) + 1):
+                    obj.pk = pk
+                return manager.bulk_create(objs, batch_size=batch_size)
+        except IntegrityError:
+            taken = manager.filter(pk__in=[obj.pk for obj in objs]).exists()
+            for obj in objs:
+                obj.pk = None
+            # Another constraint failed: allocating again would not help.
+            if attempt == ATTEMPTS or not taken:
+                raise
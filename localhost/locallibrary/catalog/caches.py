@@ -0,0 +1,27 @@
+"""
+Whether the cache is shared by the worker processes.
+
+The permission sets (catalog.backends), table and fragment versions
+(catalog.versions, catalog.fragments) and counters (catalog.counters) are
+invalidated in the cache of the process handling the write. With a cache
+kept in the memory of each process (LocMemCache), the other processes would
+go on serving what was invalidated: those modules then do without the
+cache. settings.CACHES configures a shared one.
+"""
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+# Backends keeping their entries in the memory of each process
+PROCESS_LOCAL_BACKENDS = (LocMemCache,)
+
+
+def shared():
+    """ Whether the default cache is seen by every worker process. """
+    return not isinstance(caches['default'], PROCESS_LOCAL_BACKENDS)
+
+
+def table_name():
+    """ The table of the default cache when it is a DatabaseCache, else None. """
+    backend = caches['default']
+    return backend._table if isinstance(backend, DatabaseCache) else None
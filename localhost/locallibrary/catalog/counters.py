@@ -0,0 +1,181 @@
+"""
+Cached dashboard counters for the catalog home page.
+
+The counters are computed once and stored in the cache, so the index view
+can render without touching the database in the steady state.  Model
+signals drop the counters a write changes, each recomputed on the next
+read: an increment would be a read then a write in most caches (the
+database cache among them), and two concurrent ones would lose one.
+
+The receivers change the cache once the write commits: before that, other
+requests still see the old rows, and a rolled back write changes nothing.
+
+Signals are not sent by ``QuerySet.update()`` or ``bulk_create()``; code
+doing so sends catalog.signals.bulk_changed, and a timeout
+(``CATALOG_COUNTERS_TIMEOUT``) bounds how stale a counter can get otherwise.
+The counters are only cached when the cache is shared by the worker
+processes (catalog.caches), which then all see them dropped; otherwise they
+are computed on every read.
+
+aget_counters() is the asynchronous version, computing the missing counters
+concurrently.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save
+
+from catalog import caches, signals
+from catalog.models import Author, Book, BookInstance, Genre
+
+CACHE_PREFIX = 'catalog:counter:'
+
+# Genre searched by the "Dorama genre" line of the home page.
+GENRE_FILTER = 'science'
+
+# Computed on the primary, also from the pages reading from a replica
+# (catalog.routers): a lagging replica's counts would be cached for the
+# whole timeout.
+COUNTERS = {
+    'num_books': lambda: Book.objects.using('default').count(),
+    'num_instances': lambda: BookInstance.objects.using('default').count(),
+    'num_instances_available': lambda: BookInstance.objects.using('default').filter(status__exact='a').count(),
+    'num_authors': lambda: Author.objects.using('default').count(),
+    'num_dorama': lambda: Book.objects.using('default').filter(genre__name__icontains=GENRE_FILTER).count(),
+}
+
+
+def _key(name):
+    return CACHE_PREFIX + name
+
+
+def _timeout():
+    return getattr(settings, 'CATALOG_COUNTERS_TIMEOUT', 60 * 60)
+
+
+def get_counters():
+    """ Return a dict of all the counters, computing the missing ones. """
+    if not caches.shared():
+        return {name: compute() for name, compute in COUNTERS.items()}
+    cached = cache.get_many([_key(name) for name in COUNTERS])
+    counters = {}
+    missing = {}
+    for name, compute in COUNTERS.items():
+        value = cached.get(_key(name))
+        if value is None:
+            value = missing[_key(name)] = compute()
+        counters[name] = value
+    for key, value in missing.items():
+        cache.add(key, value, _timeout())
+    return counters
+
+
+def _compute(compute):
+    # Runs in a thread of its own: give its connection back when done.
+    try:
+        return compute()
+    finally:
+        connection.close()
+
+
+async def aget_counters():
+    """ Like get_counters(), the missing counters being computed concurrently. """
+    shared = caches.shared()
+    cached = await sync_to_async(cache.get_many)([_key(name) for name in COUNTERS]) if shared else {}
+    missing = [name for name in COUNTERS if cached.get(_key(name)) is None]
+    values = await asyncio.gather(*(
+        sync_to_async(_compute, thread_sensitive=False)(COUNTERS[name]) for name in missing
+    ))
+    computed = dict(zip(missing, values))
+    if shared:
+        for name, value in computed.items():
+            await sync_to_async(cache.add)(_key(name), value, _timeout())
+    return {name: computed[name] if name in computed else cached[_key(name)] for name in COUNTERS}
+
+
+def invalidate(*names):
+    """ Drop the given counters (all of them by default). """
+    cache.delete_many([_key(name) for name in (names or COUNTERS)])
+
+
+def _invalidate_on_commit(*names):
+    transaction.on_commit(lambda: invalidate(*names))
+
+
+def remember_status(sender, instance, **kwargs):
+    """ Keep the loaded status so a later save knows whether it changed. """
+    if 'status' not in instance.get_deferred_fields():
+        instance._counter_status = instance.status
+
+
+def book_saved(sender, instance, created, **kwargs):
+    if created:
+        _invalidate_on_commit('num_books')
+
+
+def book_deleted(sender, instance, **kwargs):
+    # The genre links went away with the book.
+    _invalidate_on_commit('num_books', 'num_dorama')
+
+
+def author_saved(sender, instance, created, **kwargs):
+    if created:
+        _invalidate_on_commit('num_authors')
+
+
+def author_deleted(sender, instance, **kwargs):
+    _invalidate_on_commit('num_authors')
+
+
+def genre_changed(sender, instance, **kwargs):
+    _invalidate_on_commit('num_dorama')
+
+
+def bookinstance_saved(sender, instance, created, **kwargs):
+    if created:
+        _invalidate_on_commit('num_instances', 'num_instances_available')
+    elif getattr(instance, '_counter_status', None) != instance.status:
+        _invalidate_on_commit('num_instances_available')
+    instance._counter_status = instance.status
+
+
+def bookinstance_deleted(sender, instance, **kwargs):
+    _invalidate_on_commit('num_instances', 'num_instances_available')
+
+
+def book_genre_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        _invalidate_on_commit('num_dorama')
+
+
+# Counters affected by bulk writes to each model, see catalog.signals.
+BULK_INVALIDATES = {
+    Book: ('num_books', 'num_dorama'),
+    Book.genre.through: ('num_dorama',),
+    BookInstance: ('num_instances', 'num_instances_available'),
+    Author: ('num_authors',),
+    Genre: ('num_dorama',),
+}
+
+
+def bulk_changed(sender, **kwargs):
+    names = BULK_INVALIDATES.get(sender)
+    if names:
+        _invalidate_on_commit(*names)
+
+
+def connect_signals():
+    post_init.connect(remember_status, sender=BookInstance, dispatch_uid='counters_status')
+    post_save.connect(book_saved, sender=Book, dispatch_uid='counters_book_saved')
+    post_delete.connect(book_deleted, sender=Book, dispatch_uid='counters_book_deleted')
+    post_save.connect(author_saved, sender=Author, dispatch_uid='counters_author_saved')
+    post_delete.connect(author_deleted, sender=Author, dispatch_uid='counters_author_deleted')
+    post_save.connect(genre_changed, sender=Genre, dispatch_uid='counters_genre_saved')
+    post_delete.connect(genre_changed, sender=Genre, dispatch_uid='counters_genre_deleted')
+    post_save.connect(bookinstance_saved, sender=BookInstance, dispatch_uid='counters_copy_saved')
+    post_delete.connect(bookinstance_deleted, sender=BookInstance, dispatch_uid='counters_copy_deleted')
+    m2m_changed.connect(book_genre_changed, sender=Book.genre.through, dispatch_uid='counters_book_genre')
+    signals.bulk_changed.connect(bulk_changed, dispatch_uid='counters_bulk_changed')
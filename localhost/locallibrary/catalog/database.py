@@ -0,0 +1,40 @@
+"""
+Per-connection database tuning (see CATALOG_DB_PROFILE in the settings).
+
+The SQLite pragmas of ``CATALOG_SQLITE_PRAGMAS`` are applied when Django
+opens a connection, journal_mode first since it changes the database file
+for every connection. Persistent connections (``CONN_MAX_AGE`` > 0) are
+checked at the start of each request and reopened if no longer usable;
+Django 3.2 only does so after a database error.
+"""
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+def apply_pragmas(connection, pragmas):
+    """ Run ``PRAGMA name = value`` on ``connection`` for each item of ``pragmas``. """
+    ordered = sorted(pragmas.items(), key=lambda item: item[0] != 'journal_mode')
+    with connection.cursor() as cursor:
+        for name, value in ordered:
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_connection(sender, connection, **kwargs):
+    pragmas = getattr(settings, 'CATALOG_SQLITE_PRAGMAS', None)
+    if pragmas and connection.vendor == 'sqlite':
+        apply_pragmas(connection, pragmas)
+
+
+def check_connections(**kwargs):
+    """ Close the persistent connections that can't be used anymore. """
+    for connection in connections.all():
+        if connection.connection is not None and connection.settings_dict['CONN_MAX_AGE'] \
+                and not connection.is_usable():
+            connection.close()
+
+
+def connect_signals():
+    connection_created.connect(configure_connection, dispatch_uid='catalog.database.configure')
+    request_started.connect(check_connections, dispatch_uid='catalog.database.check')
@@ -0,0 +1,210 @@
+"""
+Streaming export of the catalog and loan data as CSV or JSON Lines.
+
+Rows are read with ``QuerySet.iterator()`` and denormalized one chunk at a
+time (author and genre names, book titles and borrowers), so memory use
+stays constant whatever the size of the tables. An export can be limited to
+the rows changed since a timestamp with ``since``; deleted rows are not
+part of an incremental export. The rows carry fields of related rows (the
+genres and author name of a book, the book title and borrower of a copy),
+so changing those touches the ``updated_at`` of the rows exporting them
+(the receivers below): a genre added, removed, renamed or deleted, or an
+author renamed or deleted, touches their books; a book renamed or deleted,
+or a borrower renamed or deleted, touches their copies.
+"""
+import csv
+import json
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.utils import timezone
+
+from catalog import signals
+from catalog.models import Author, Book, BookInstance, Genre
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/jsonl',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def book_rows(books):
+    through = Book.genre.through
+    genres = {}
+    for book_id, name in (through.objects.filter(book_id__in=[book.pk for book in books])
+                          .order_by('genre__name').values_list('book_id', 'genre__name')):
+        genres.setdefault(book_id, []).append(name)
+    for book in books:
+        yield {
+            'id': book.pk,
+            'title': book.title,
+            'author_id': book.author_id,
+            'author': str(book.author) if book.author else '',
+            'summary': book.summary,
+            'isbn': book.isbn,
+            'genres': ';'.join(genres.get(book.pk, [])),
+            'updated_at': book.updated_at,
+        }
+
+
+def author_rows(authors):
+    for author in authors:
+        yield {
+            'id': author.pk,
+            'first_name': author.first_name,
+            'last_name': author.last_name,
+            'date_of_birth': author.date_of_birth,
+            'date_of_death': author.date_of_death,
+            'updated_at': author.updated_at,
+        }
+
+
+def genre_rows(genres):
+    for genre in genres:
+        yield {'id': genre.pk, 'name': genre.name, 'updated_at': genre.updated_at}
+
+
+def copy_rows(copies):
+    for copy in copies:
+        yield {
+            'id': copy.pk,
+            'book_id': copy.book_id,
+            'book': copy.book.title if copy.book else '',
+            'imprint': copy.imprint,
+            'status': copy.status,
+            'due_back': copy.due_back,
+            'borrower': copy.borrower.username if copy.borrower else '',
+            'updated_at': copy.updated_at,
+        }
+
+
+# Export name: (queryset, chunk denormalizer, columns)
+EXPORTS = {
+    'books': (
+        lambda: Book.objects.select_related('author'), book_rows,
+        ['id', 'title', 'author_id', 'author', 'summary', 'isbn', 'genres', 'updated_at'],
+    ),
+    'authors': (
+        lambda: Author.objects.all(), author_rows,
+        ['id', 'first_name', 'last_name', 'date_of_birth', 'date_of_death', 'updated_at'],
+    ),
+    'genres': (
+        lambda: Genre.objects.all(), genre_rows,
+        ['id', 'name', 'updated_at'],
+    ),
+    'copies': (
+        lambda: BookInstance.objects.select_related('book', 'borrower'), copy_rows,
+        ['id', 'book_id', 'book', 'imprint', 'status', 'due_back', 'borrower', 'updated_at'],
+    ),
+}
+
+
+def export_rows(name, since=None, chunk_size=2000):
+    """ Yield the rows (dicts) of the export ``name``. """
+    queryset, denormalize, columns = EXPORTS[name]
+    queryset = queryset().order_by('pk')
+    if since is not None:
+        queryset = queryset.filter(updated_at__gte=since)
+    objects = queryset.iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(objects, chunk_size))
+        if not chunk:
+            return
+        yield from denormalize(chunk)
+
+
+def json_default(value):
+    """ Serialize dates as ISO 8601 and UUIDs as strings. """
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+class Echo:
+    """ File-like object returning what is written, for csv.writer. """
+
+    def write(self, value):
+        return value
+
+
+def render(name, rows, file_format):
+    """ Yield the lines of ``rows`` in ``file_format``. """
+    if file_format == 'csv':
+        columns = EXPORTS[name][2]
+        writer = csv.writer(Echo())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow([row[column] for column in columns])
+    else:
+        for row in rows:
+            yield json.dumps(row, default=json_default, ensure_ascii=False) + '\n'
+
+
+def touch_books(book_ids):
+    """ Mark the given books as changed for the incremental exports. """
+    Book.objects.filter(pk__in=list(book_ids)).update(updated_at=timezone.now())
+
+
+def touch_copies(copies):
+    """ Mark the copies of the given queryset as changed for the incremental exports. """
+    copies.update(updated_at=timezone.now())
+
+
+def _exported_fields_saved(update_fields, fields):
+    # Saves of other fields only (e.g. a login's last_login) change nothing
+    # exported with the related rows.
+    return update_fields is None or not update_fields.isdisjoint(fields)
+
+
+def book_genre_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        touch_books(instance.book_set.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            touch_books([instance.pk])
+        elif pk_set:
+            touch_books(pk_set)
+
+
+def genre_changed(sender, instance, created=False, **kwargs):
+    if not created:
+        touch_books(instance.book_set.values_list('pk', flat=True))
+
+
+def author_changed(sender, instance, created=False, update_fields=None, **kwargs):
+    if not created and _exported_fields_saved(update_fields, {'first_name', 'last_name'}):
+        touch_books(instance.book_set.values_list('pk', flat=True))
+
+
+def book_changed(sender, instance, created=False, update_fields=None, **kwargs):
+    if not created and _exported_fields_saved(update_fields, {'title'}):
+        touch_copies(BookInstance.objects.filter(book=instance))
+
+
+def borrower_changed(sender, instance, created=False, update_fields=None, **kwargs):
+    if not created and _exported_fields_saved(update_fields, {'username'}):
+        touch_copies(BookInstance.objects.filter(borrower=instance))
+
+
+def bulk_changed(sender, pks, created=False, **kwargs):
+    if created:
+        return
+    if sender is Author:
+        touch_books(Book.objects.filter(author__in=list(pks)).values_list('pk', flat=True))
+    elif sender is Book:
+        touch_copies(BookInstance.objects.filter(book__in=list(pks)))
+
+
+def connect_signals():
+    m2m_changed.connect(book_genre_changed, sender=Book.genre.through, dispatch_uid='exporter_book_genre')
+    post_save.connect(genre_changed, sender=Genre, dispatch_uid='exporter_genre_saved')
+    pre_delete.connect(genre_changed, sender=Genre, dispatch_uid='exporter_genre_deleted')
+    post_save.connect(author_changed, sender=Author, dispatch_uid='exporter_author_saved')
+    pre_delete.connect(author_changed, sender=Author, dispatch_uid='exporter_author_deleted')
+    post_save.connect(book_changed, sender=Book, dispatch_uid='exporter_book_saved')
+    pre_delete.connect(book_changed, sender=Book, dispatch_uid='exporter_book_deleted')
+    post_save.connect(borrower_changed, sender=User, dispatch_uid='exporter_borrower_saved')
+    pre_delete.connect(borrower_changed, sender=User, dispatch_uid='exporter_borrower_deleted')
+    signals.bulk_changed.connect(bulk_changed, dispatch_uid='exporter_bulk_changed')
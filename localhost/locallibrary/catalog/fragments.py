@@ -0,0 +1,173 @@
+"""
+Cache of rendered template fragments, keyed by object and version.
+
+Templates wrap the expensive parts of a page in ``{% fragment %}`` (see
+catalog.templatetags.catalog_fragments); a fragment is keyed by its name,
+the version of that part of the object (catalog.versions) and the values it
+varies on. The signal receivers below drop the versions of exactly the
+fragments a write changes, once it commits (a fragment rendered before the
+commit shows the old rows, and must not be stored under the new version):
+
+    book            the genre line of a book
+    book-copies     the copies list of a book
+    author-works    the works list of an author, with their genres and
+                    copy counts
+
+Hits and misses are counted in the cache by fragment name, see
+``manage.py fragment_cache_stats``. Fragments are only cached when the cache
+is shared by the worker processes (catalog.caches), which then all see the
+versions dropped.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
+
+from catalog import caches, signals
+from catalog.models import Author, Book, BookInstance, Genre
+from catalog.routers import reading_from_replica
+from catalog.versions import bump_objects, get_object_version
+
+CACHE_PREFIX = 'catalog:fragment:'
+STATS_PREFIX = 'catalog:fragment-stats:'
+
+FRAGMENTS = ('book', 'book-copies', 'author-works')
+
+
+def _timeout():
+    if reading_from_replica():
+        # The replica may not have caught up with the version yet
+        return getattr(settings, 'CATALOG_REPLICA_PIN_SECONDS', 10)
+    return getattr(settings, 'CATALOG_FRAGMENT_TIMEOUT', 24 * 60 * 60)
+
+
+def fragment_key(name, pk, vary_on=()):
+    vary = hashlib.md5(':'.join(str(value) for value in vary_on).encode()).hexdigest()
+    return f'{CACHE_PREFIX}{name}:{pk}:{get_object_version(name, pk)}:{vary}'
+
+
+def get_or_render(name, pk, vary_on, render):
+    """ Return the cached fragment, rendering and storing it on a miss. """
+    if not caches.shared():
+        return render()
+    key = fragment_key(name, pk, vary_on)
+    content = cache.get(key)
+    if content is None:
+        count(name, 'misses')
+        content = render()
+        cache.set(key, content, _timeout())
+    else:
+        count(name, 'hits')
+    return content
+
+
+def count(name, outcome):
+    key = f'{STATS_PREFIX}{name}:{outcome}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def stats():
+    """ Return {fragment name: (hits, misses)}. """
+    keys = [f'{STATS_PREFIX}{name}:{outcome}' for name in FRAGMENTS for outcome in ('hits', 'misses')]
+    values = cache.get_many(keys)
+    return {
+        name: (values.get(f'{STATS_PREFIX}{name}:hits', 0), values.get(f'{STATS_PREFIX}{name}:misses', 0))
+        for name in FRAGMENTS
+    }
+
+
+def reset_stats():
+    cache.delete_many([f'{STATS_PREFIX}{name}:{outcome}' for name in FRAGMENTS for outcome in ('hits', 'misses')])
+
+
+def bump_on_commit(name, pks):
+    """ versions.bump_objects() once the current transaction commits. """
+    # The rows are read now, while the transaction can still see them
+    pks = list(pks)
+    transaction.on_commit(lambda: bump_objects(name, pks))
+
+
+def books_changed(book_ids):
+    """ Drop the fragments showing the given books. """
+    book_ids = list(book_ids)
+    if not book_ids:
+        return
+    bump_on_commit('book', book_ids)
+    bump_on_commit('author-works', Book.objects.filter(pk__in=book_ids).values_list('author_id', flat=True))
+
+
+def remember_relations(sender, instance, **kwargs):
+    """ Keep the loaded foreign keys so a later save knows what it moved from. """
+    field = 'author_id' if sender is Book else 'book_id'
+    if field not in instance.get_deferred_fields():
+        instance._fragment_parent = getattr(instance, field)
+
+
+def book_changed(sender, instance, **kwargs):
+    bump_on_commit('book', [instance.pk])
+    bump_on_commit('author-works', [instance.author_id, getattr(instance, '_fragment_parent', None)])
+    instance._fragment_parent = instance.author_id
+
+
+def copies_changed(book_ids):
+    """ Drop the fragments showing the copies of the given books. """
+    book_ids = [pk for pk in set(book_ids) if pk is not None]
+    if not book_ids:
+        return
+    bump_on_commit('book-copies', book_ids)
+    bump_on_commit('author-works', Book.objects.filter(pk__in=book_ids).values_list('author_id', flat=True))
+
+
+def copy_changed(sender, instance, **kwargs):
+    copies_changed([instance.book_id, getattr(instance, '_fragment_parent', None)])
+    instance._fragment_parent = instance.book_id
+
+
+def author_changed(sender, instance, **kwargs):
+    bump_on_commit('author-works', [instance.pk])
+
+
+def genre_changed(sender, instance, created=False, **kwargs):
+    if not created:
+        books_changed(instance.book_set.values_list('pk', flat=True))
+
+
+def book_genre_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        books_changed(instance.book_set.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            books_changed([instance.pk])
+        elif pk_set:
+            books_changed(pk_set)
+
+
+def bulk_changed(sender, pks, created=False, **kwargs):
+    if sender is Book:
+        books_changed(pks)
+    elif sender is BookInstance:
+        copies_changed(BookInstance.objects.filter(pk__in=pks).values_list('book_id', flat=True))
+    elif sender is Author:
+        bump_on_commit('author-works', pks)
+    elif sender is Genre and not created:
+        books_changed(Book.objects.filter(genre__in=pks).values_list('pk', flat=True).distinct())
+
+
+def connect_signals():
+    post_init.connect(remember_relations, sender=Book, dispatch_uid='fragments_book_init')
+    post_init.connect(remember_relations, sender=BookInstance, dispatch_uid='fragments_copy_init')
+    post_save.connect(book_changed, sender=Book, dispatch_uid='fragments_book_saved')
+    post_delete.connect(book_changed, sender=Book, dispatch_uid='fragments_book_deleted')
+    post_save.connect(copy_changed, sender=BookInstance, dispatch_uid='fragments_copy_saved')
+    post_delete.connect(copy_changed, sender=BookInstance, dispatch_uid='fragments_copy_deleted')
+    post_save.connect(author_changed, sender=Author, dispatch_uid='fragments_author_saved')
+    post_delete.connect(author_changed, sender=Author, dispatch_uid='fragments_author_deleted')
+    post_save.connect(genre_changed, sender=Genre, dispatch_uid='fragments_genre_saved')
+    pre_delete.connect(genre_changed, sender=Genre, dispatch_uid='fragments_genre_deleted')
+    m2m_changed.connect(book_genre_changed, sender=Book.genre.through, dispatch_uid='fragments_book_genre')
+    signals.bulk_changed.connect(bulk_changed, dispatch_uid='fragments_bulk_changed')
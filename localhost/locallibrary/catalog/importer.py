@@ -0,0 +1,225 @@
+"""
+Bulk import of books, authors, genres and copies from CSV or JSON Lines.
+
+Each record describes one book::
+
+    {"title": "The Hobbit", "author": "Tolkien, John", "summary": "...",
+     "isbn": "9780261102217", "genres": ["Fantasy"], "copies": 3,
+     "imprint": "Allen & Unwin, 1937"}
+
+In CSV files ``genres`` is separated by ``;``. ``author`` is written as
+"Last name, First name", like Author.__str__.
+
+Records are streamed and written in chunks, each chunk in one transaction
+with bulk inserts. Authors and genres are deduplicated through in-memory
+maps of the existing rows. The number of records imported so far is stored
+in an ImportCheckpoint in the same transaction, so an interrupted import
+resumes after the last committed chunk.
+"""
+import csv
+import json
+import time
+from itertools import islice
+from multiprocessing import Pool
+
+from django.db import transaction
+
+from catalog.bulk import bulk_create_with_pks
+from catalog.models import Author, Book, BookInstance, Genre, ImportCheckpoint
+from catalog.signals import bulk_changed
+
+STATUSES = {code for code, name in BookInstance.LOAN_STATUS}
+
+
+class RecordError(ValueError):
+    """ A record that cannot be imported. """
+
+
+def read_records(path, file_format):
+    """ Yield the raw records (dicts) of a CSV or JSON Lines file. """
+    with open(path, newline='', encoding='utf-8') as f:
+        if file_format == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield line
+
+
+def parse_record(raw):
+    """ Validate and normalize a raw record, raising RecordError. """
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except ValueError as e:
+            raise RecordError(f'invalid JSON: {e}')
+    if not isinstance(raw, dict):
+        raise RecordError('a record must be an object')
+
+    title = (raw.get('title') or '').strip()
+    if not title:
+        raise RecordError('title is required')
+    if len(title) > Book._meta.get_field('title').max_length:
+        raise RecordError('title is too long')
+    isbn = (raw.get('isbn') or '').strip()
+    if len(isbn) > Book._meta.get_field('isbn').max_length:
+        raise RecordError('isbn is too long')
+
+    author = None
+    if (raw.get('author') or '').strip():
+        last_name, _, first_name = raw['author'].partition(',')
+        author = (first_name.strip(), last_name.strip())
+        if max(map(len, author)) > Author._meta.get_field('last_name').max_length:
+            raise RecordError('author name is too long')
+
+    genres = raw.get('genres') or []
+    if isinstance(genres, str):
+        genres = genres.split(';')
+    genres = sorted({genre.strip() for genre in genres if genre.strip()})
+    if any(len(genre) > Genre._meta.get_field('name').max_length for genre in genres):
+        raise RecordError('genre name is too long')
+
+    try:
+        copies = int(raw.get('copies') or 0)
+    except (TypeError, ValueError):
+        raise RecordError('copies must be a number')
+    status = (raw.get('status') or 'a').strip()
+    if status not in STATUSES:
+        raise RecordError(f'unknown status {status!r}')
+    imprint = (raw.get('imprint') or '').strip()
+    if len(imprint) > BookInstance._meta.get_field('imprint').max_length:
+        raise RecordError('imprint is too long')
+
+    return {
+        'title': title,
+        'summary': (raw.get('summary') or '').strip(),
+        'isbn': isbn,
+        'author': author,
+        'genres': genres,
+        'copies': copies,
+        'imprint': imprint,
+        'status': status,
+    }
+
+
+def parse_chunk(chunk):
+    """ Parse a list of (position, raw record), in a worker process if parallel. """
+    parsed = []
+    for position, raw in chunk:
+        try:
+            parsed.append((position, parse_record(raw), None))
+        except RecordError as e:
+            parsed.append((position, None, str(e)))
+    return parsed
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class CatalogImporter:
+    """ Import records into the catalog in chunks of ``chunk_size``. """
+
+    def __init__(self, source, chunk_size=1000, workers=1, log=None):
+        self.source = source
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.log = log or (lambda message: None)
+        self.authors = {}
+        self.genres = {}
+        self.errors = []
+        self.imported = 0
+        self.copies = 0
+
+    def load_maps(self):
+        """ Map the existing authors and genres by name. """
+        self.authors = {
+            (first_name, last_name): pk
+            for pk, first_name, last_name in Author.objects.values_list('pk', 'first_name', 'last_name').iterator()
+        }
+        self.genres = dict((name, pk) for pk, name in Genre.objects.values_list('pk', 'name'))
+
+    def run(self, records):
+        """ Import ``records``, skipping those imported by an earlier run. """
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(source=self.source)
+        start_position = checkpoint.position
+        if start_position:
+            self.log(f'Resuming after record {start_position}')
+        self.load_maps()
+
+        numbered = islice(enumerate(records, start=1), start_position, None)
+        chunks = chunked(numbered, self.chunk_size)
+        start = time.perf_counter()
+        if self.workers > 1:
+            with Pool(self.workers) as pool:
+                for parsed in pool.imap(parse_chunk, chunks):
+                    self.write_chunk(parsed, start)
+        else:
+            for chunk in chunks:
+                self.write_chunk(parse_chunk(chunk), start)
+        return self.imported
+
+    def write_chunk(self, parsed, start):
+        records = [(position, record) for position, record, error in parsed if record]
+        self.errors += [(position, error) for position, record, error in parsed if error]
+        with transaction.atomic():
+            book_ids, copy_ids = self.write_records([record for position, record in records])
+            ImportCheckpoint.objects.filter(source=self.source).update(position=parsed[-1][0])
+            transaction.on_commit(lambda: bulk_changed.send(sender=Book, pks=book_ids, created=True))
+            transaction.on_commit(lambda: bulk_changed.send(sender=BookInstance, pks=copy_ids, created=True))
+
+        self.imported += len(records)
+        elapsed = time.perf_counter() - start
+        self.log(f'{parsed[-1][0]} records read, {self.imported} books imported '
+                 f'({self.imported / elapsed:.0f} books/s), {len(self.errors)} errors')
+
+    def write_records(self, records):
+        self.create_missing_authors(records)
+        self.create_missing_genres(records)
+
+        books = bulk_create_with_pks(Book, [
+            Book(
+                title=record['title'],
+                summary=record['summary'],
+                isbn=record['isbn'],
+                author_id=self.authors[record['author']] if record['author'] else None,
+            )
+            for record in records
+        ], batch_size=self.chunk_size)
+
+        through = Book.genre.through
+        through.objects.bulk_create([
+            through(book_id=book.pk, genre_id=self.genres[name])
+            for book, record in zip(books, records)
+            for name in record['genres']
+        ], batch_size=self.chunk_size)
+
+        copies = [
+            BookInstance(book_id=book.pk, imprint=record['imprint'], status=record['status'])
+            for book, record in zip(books, records)
+            for _ in range(record['copies'])
+        ]
+        BookInstance.objects.bulk_create(copies, batch_size=self.chunk_size)
+        self.copies += len(copies)
+        return [book.pk for book in books], [copy.pk for copy in copies]
+
+    def create_missing_authors(self, records):
+        missing = {record['author'] for record in records if record['author'] and record['author'] not in self.authors}
+        authors = bulk_create_with_pks(Author, [
+            Author(first_name=first_name, last_name=last_name) for first_name, last_name in sorted(missing)
+        ])
+        self.authors.update(((author.first_name, author.last_name), author.pk) for author in authors)
+        transaction.on_commit(lambda: bulk_changed.send(
+            sender=Author, pks=[author.pk for author in authors], created=True))
+
+    def create_missing_genres(self, records):
+        missing = {name for record in records for name in record['genres'] if name not in self.genres}
+        genres = bulk_create_with_pks(Genre, [Genre(name=name) for name in sorted(missing)])
+        self.genres.update((genre.name, genre.pk) for genre in genres)
+        transaction.on_commit(lambda: bulk_changed.send(
+            sender=Genre, pks=[genre.pk for genre in genres], created=True))
@@ -0,0 +1,172 @@
+"""
+Admin inlines loading their rows a page at a time.
+
+An inline renders a form per child on the change page and posts them all
+back, which doesn't work for a book with thousands of copies. The inlines
+of PaginatedInlineMixin render their first ``per_page`` rows; a "Show
+more" button (js/paginated_inlines.js) fetches the next pages from the
+parent's admin (``<object_id>/inline/<prefix>/?page=N``, served by
+PaginatedInlinesAdminMixin) and appends their rows. On submit, the script
+disables the rows left untouched, so only the changed and new rows are
+posted, and PaginatedInlineFormSet only loads the rows it receives.
+Memory, page size and saves thus depend on the rows shown or changed, not
+on the number of children.
+"""
+import re
+
+from django.contrib.admin.utils import unquote
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.forms.models import BaseInlineFormSet
+from django.http import Http404, JsonResponse
+from django.template.loader import render_to_string
+from django.urls import path
+
+# Form index of the first row of the pages loaded after the first one, far
+# above the rows added with "Add another" (numbered after the first page).
+LOADED_INDEX_START = 100000
+
+
+class PaginatedInlineFormSet(BaseInlineFormSet):
+    """
+    Inline formset over one page of the children when unbound, and over the
+    children it receives when bound.
+
+    The posted forms are renumbered first: rows left out by the script
+    leave gaps, and the rows of the later pages are numbered from
+    LOADED_INDEX_START. Forms below the posted INITIAL_FORMS or from
+    LOADED_INDEX_START are existing rows, the others new ones.
+    """
+    per_page = 20
+
+    def __init__(self, data=None, files=None, instance=None, save_as_new=False, prefix=None, queryset=None,
+                 page=1, **kwargs):
+        self.page = page
+        self.index_start = 0 if page == 1 else LOADED_INDEX_START + (page - 2) * self.per_page
+        self.has_more = False
+        self.submitted_pks = []
+        if data is not None:
+            data, files = self.renumber(data, files, prefix or self.get_default_prefix())
+        super().__init__(data, files, instance, save_as_new, prefix, queryset, **kwargs)
+
+    def renumber(self, data, files, prefix):
+        pattern = re.compile(r'^(initial-)?%s-(\d+)-(.+)$' % re.escape(prefix))
+        try:
+            initial_forms = int(data.get(f'{prefix}-INITIAL_FORMS', 0))
+        except ValueError:
+            initial_forms = 0
+        indexes = {
+            int(match[2]) for match in map(pattern.match, [*data, *(files or ())]) if match
+        }
+
+        def is_initial(index):
+            return index < initial_forms or index >= LOADED_INDEX_START
+
+        ordered = sorted(indexes, key=lambda index: (not is_initial(index), index))
+        numbers = {index: number for number, index in enumerate(ordered)}
+
+        def rename(source):
+            renamed = source.copy()
+            for key in source:
+                match = pattern.match(key)
+                if match:
+                    del renamed[key]
+            for key in source:
+                match = pattern.match(key)
+                if match:
+                    initial, index, name = match.groups()
+                    renamed.setlist(f'{initial or ""}{prefix}-{numbers[int(index)]}-{name}', source.getlist(key))
+            return renamed
+
+        data = rename(data)
+        initial = [index for index in ordered if is_initial(index)]
+        data[f'{prefix}-TOTAL_FORMS'] = str(len(ordered))
+        data[f'{prefix}-INITIAL_FORMS'] = str(len(initial))
+        pk_name = self.model._meta.pk.name
+        self.submitted_pks = [
+            data[f'{prefix}-{number}-{pk_name}'] for number in range(len(initial))
+            if data.get(f'{prefix}-{number}-{pk_name}')
+        ]
+        return data, rename(files) if files is not None else None
+
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            queryset = super().get_queryset()
+            if self.is_bound:
+                pk_field = self.model._meta.pk
+                pks = []
+                for value in self.submitted_pks:
+                    try:
+                        pks.append(pk_field.to_python(value))
+                    except ValidationError:
+                        # Tampered with: left to the form validation
+                        pass
+                self._queryset = list(queryset.filter(pk__in=pks))
+            else:
+                start = (self.page - 1) * self.per_page
+                rows = list(queryset[start:start + self.per_page + 1])
+                self.has_more = len(rows) > self.per_page
+                self._queryset = rows[:self.per_page]
+        return self._queryset
+
+    def add_prefix(self, index):
+        if isinstance(index, int):
+            index += self.index_start
+        return super().add_prefix(index)
+
+
+class PaginatedInlineMixin:
+    """ InlineModelAdmin mixin paginating the rows, see the module docstring. """
+    formset = PaginatedInlineFormSet
+    per_page = 20
+    template_wrapper = 'admin/catalog/paginated_inline.html'
+
+    class Media:
+        js = ('admin/js/jquery.init.js', 'js/paginated_inlines.js')
+
+    def __init__(self, parent_model, admin_site):
+        super().__init__(parent_model, admin_site)
+        # The usual tabular or stacked template, wrapped with the pager
+        self.base_template = self.template
+        self.template = self.template_wrapper
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.per_page = self.per_page
+        return formset
+
+
+class PaginatedInlinesAdminMixin:
+    """ ModelAdmin mixin serving the pages of its PaginatedInlineMixin inlines. """
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path('<path:object_id>/inline/<str:prefix>/', self.admin_site.admin_view(self.inline_page_view),
+                 name='%s_%s_inline_page' % info),
+        ] + super().get_urls()
+
+    def inline_page_view(self, request, object_id, prefix):
+        """ Return the rows of page ``?page=`` (2 or more) of an inline, as JSON. """
+        obj = self.get_object(request, unquote(object_id))
+        if obj is None:
+            raise Http404
+        if not self.has_view_or_change_permission(request, obj):
+            raise PermissionDenied
+        try:
+            page = int(request.GET.get('page', ''))
+        except ValueError:
+            raise Http404
+        if page < 2:
+            raise Http404
+
+        for inline in self.get_inline_instances(request, obj):
+            formset_class = inline.get_formset(request, obj)
+            if isinstance(inline, PaginatedInlineMixin) and formset_class.get_default_prefix() == prefix:
+                break
+        else:
+            raise Http404
+
+        formset = formset_class(instance=obj, prefix=prefix, queryset=inline.get_queryset(request), page=page)
+        inline_admin_formset = self.get_inline_formsets(request, [formset], [inline], obj)[0]
+        html = render_to_string(inline.base_template, {'inline_admin_formset': inline_admin_formset}, request)
+        return JsonResponse({'html': html, 'has_more': formset.has_more, 'next_page': page + 1})
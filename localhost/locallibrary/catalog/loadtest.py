@@ -0,0 +1,184 @@
+"""
+A small HTTP load generator, used by the benchmark commands.
+
+``concurrency`` threads send the requests over keep-alive connections (one
+per thread, with http.client) until ``requests`` have been sent, and the
+latency of each response is recorded. Only the standard library is used, so
+it runs wherever the project does; the server under test runs separately.
+
+Requests are either a URL, fetched with GET, or a ``(method, url, body)``
+tuple whose body (a dict) is sent form-encoded. login() signs a user in
+through the site's login page and returns the headers that carry the
+session and the CSRF token of the following requests.
+"""
+import http.client
+import re
+import threading
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+# The regressions reported by compare(), by figure: whether a higher value is
+# better.
+COMPARED = {'throughput': True, 'p50_ms': False, 'p95_ms': False, 'p99_ms': False}
+
+
+def percentile(values, fraction):
+    """ The ``fraction`` (0..1) percentile of ``values``, by nearest rank. """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+class Result:
+    """ Latencies (seconds), status codes and errors of a load run. """
+
+    def __init__(self, latencies, statuses, errors, elapsed):
+        self.latencies = latencies
+        self.statuses = statuses
+        self.errors = errors
+        self.elapsed = elapsed
+
+    @property
+    def throughput(self):
+        return len(self.latencies) / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        """ Return a dict of the figures reported by the benchmarks. """
+        return {
+            'requests': len(self.latencies),
+            'errors': self.errors,
+            'non_2xx': sum(1 for status in self.statuses if not 200 <= status < 400),
+            'throughput': self.throughput,
+            'p50_ms': percentile(self.latencies, 0.50) * 1000,
+            'p95_ms': percentile(self.latencies, 0.95) * 1000,
+            'p99_ms': percentile(self.latencies, 0.99) * 1000,
+        }
+
+
+def _request(entry):
+    """ Return the method, split URL and encoded body of a request entry. """
+    if isinstance(entry, str):
+        return 'GET', urlsplit(entry), None
+    method, url, body = entry
+    return method, urlsplit(url), urlencode(body) if body is not None else None
+
+
+def run(urls, concurrency=32, requests=1000, headers=None, timeout=30):
+    """
+    Send the requests of ``urls`` (full URLs or ``(method, url, body)``
+    tuples, taken in turn) ``requests`` times from ``concurrency`` threads,
+    and return a Result.
+    """
+    latencies, statuses = [], []
+    errors = 0
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker():
+        nonlocal errors
+        connections = {}
+        while True:
+            with lock:
+                number = next(counter, None)
+            if number is None:
+                break
+            method, url, body = _request(urls[number % len(urls)])
+            path = url.path + (f'?{url.query}' if url.query else '')
+            request_headers = dict(headers or {})
+            if body is not None:
+                request_headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            start = time.perf_counter()
+            try:
+                conn = connections.get(url.netloc)
+                if conn is None:
+                    conn = connections[url.netloc] = http.client.HTTPConnection(url.netloc, timeout=timeout)
+                conn.request(method, path, body=body, headers=request_headers)
+                response = conn.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                connections.pop(url.netloc, None)
+                with lock:
+                    errors += 1
+                continue
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses.append(response.status)
+        for conn in connections.values():
+            conn.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return Result(latencies, statuses, errors, time.perf_counter() - start)
+
+
+def _cookies(response, cookies):
+    for header in response.headers.get_all('Set-Cookie') or []:
+        for name, morsel in SimpleCookie(header).items():
+            cookies[name] = morsel.value
+
+
+def login(base_url, username, password, path='/accounts/login/', timeout=30):
+    """
+    Sign in through the login form at ``path`` and return the headers
+    (Cookie, X-CSRFToken) authenticating the following requests as
+    ``username``, whose CSRF token is also the ``csrftoken`` item.
+    """
+    url = urlsplit(base_url)
+    conn = http.client.HTTPConnection(url.netloc, timeout=timeout)
+    cookies = {}
+    try:
+        conn.request('GET', url.path.rstrip('/') + path)
+        response = conn.getresponse()
+        page = response.read().decode()
+        _cookies(response, cookies)
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', page)
+        if token is None:
+            raise ValueError(f'No login form at {base_url}{path}')
+        conn.request('POST', url.path.rstrip('/') + path, body=urlencode({
+            'csrfmiddlewaretoken': token.group(1), 'username': username, 'password': password,
+        }), headers={
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'Cookie': '; '.join(f'{name}={value}' for name, value in cookies.items()),
+        })
+        response = conn.getresponse()
+        response.read()
+        # The session and CSRF token are new after signing in
+        _cookies(response, cookies)
+    finally:
+        conn.close()
+    if response.status != 302 or 'sessionid' not in cookies:
+        raise ValueError(f'{username} could not sign in at {base_url}{path}')
+    return {
+        'Cookie': '; '.join(f'{name}={value}' for name, value in cookies.items()),
+        'X-CSRFToken': cookies['csrftoken'],
+    }
+
+
+def compare(baseline, current, threshold=0.1):
+    """
+    Compare the summaries of ``current`` to those of ``baseline`` (dicts of
+    summaries by scenario) and return the regressions, as (scenario,
+    figure, baseline value, current value) tuples: the figures of
+    COMPARED more than ``threshold`` (a fraction) worse than the baseline.
+    Scenarios missing from either side are not compared.
+    """
+    regressions = []
+    for scenario, summary in current.items():
+        before = baseline.get(scenario)
+        if before is None:
+            continue
+        for figure, higher_is_better in COMPARED.items():
+            old, new = before.get(figure), summary.get(figure)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append((scenario, figure, old, new))
+    return regressions
@@ -0,0 +1,82 @@
+"""
+Checkout, return, renewal and reservation of book copies.
+
+Every operation is a single conditional UPDATE over all the requested
+copies (``... WHERE id IN (...) AND status = 'a'`` for a checkout), so two
+librarians lending the same copy at the same time cannot both succeed,
+whatever the database: the second UPDATE no longer matches the row. The
+rows changed by the UPDATE are then read back by the ``updated_at`` stamp it
+wrote, in the same transaction.
+
+QuerySet.update() sends no signals, so catalog.signals.bulk_changed is sent
+for the changed copies once the transaction commits.
+"""
+import datetime
+import uuid
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from catalog.models import BookInstance
+from catalog.signals import bulk_changed
+
+# Default loan period, as proposed by the renewal form.
+LOAN_PERIOD = datetime.timedelta(weeks=3)
+
+# Longest loan or renewal allowed from today.
+MAX_LOAN_PERIOD = datetime.timedelta(weeks=4)
+
+
+class LoanResult:
+    """ Outcome of an operation: the copies changed and the reason the others were not. """
+
+    def __init__(self, done, failed):
+        self.done = done
+        self.failed = failed
+
+    def __repr__(self):
+        return f'<LoanResult done={len(self.done)} failed={len(self.failed)}>'
+
+
+def _transition(copy_ids, allowed, reason, **changes):
+    """
+    Apply ``changes`` to the copies of ``copy_ids`` matching ``allowed``
+    (a Q object), in one UPDATE.
+    """
+    copy_ids = list(dict.fromkeys(pk if isinstance(pk, uuid.UUID) else uuid.UUID(str(pk)) for pk in copy_ids))
+    stamp = timezone.now()
+    with transaction.atomic():
+        BookInstance.objects.filter(id__in=copy_ids).filter(allowed).update(updated_at=stamp, **changes)
+        done = set(BookInstance.objects.filter(id__in=copy_ids, updated_at=stamp).values_list('id', flat=True))
+        if done:
+            transaction.on_commit(lambda: bulk_changed.send(sender=BookInstance, pks=list(done)))
+
+    failed = [pk for pk in copy_ids if pk not in done]
+    existing = set(BookInstance.objects.filter(id__in=failed).values_list('id', flat=True)) if failed else set()
+    return LoanResult(
+        done=[pk for pk in copy_ids if pk in done],
+        failed={pk: reason if pk in existing else 'not found' for pk in failed},
+    )
+
+
+def checkout(copy_ids, borrower, due_back=None):
+    """ Lend the available copies, or those reserved for ``borrower``, to ``borrower``. """
+    allowed = Q(status='a') | Q(status='r', borrower=borrower)
+    return _transition(copy_ids, allowed, 'not available', status='o', borrower=borrower,
+                       due_back=due_back or datetime.date.today() + LOAN_PERIOD)
+
+
+def return_copies(copy_ids):
+    """ Mark the copies on loan as returned and available. """
+    return _transition(copy_ids, Q(status='o'), 'not on loan', status='a', borrower=None, due_back=None)
+
+
+def renew(copy_ids, due_back):
+    """ Move the due date of the copies on loan to ``due_back``. """
+    return _transition(copy_ids, Q(status='o'), 'not on loan', due_back=due_back)
+
+
+def reserve(copy_ids, borrower):
+    """ Reserve the available copies for ``borrower``. """
+    return _transition(copy_ids, Q(status='a'), 'not available', status='r', borrower=borrower, due_back=None)
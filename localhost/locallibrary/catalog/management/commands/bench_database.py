@@ -0,0 +1,146 @@
+import random
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.test.utils import override_settings
+
+from catalog import loans
+from catalog.bulk import bulk_create_with_pks
+from catalog.loadtest import percentile
+from catalog.models import Book, BookInstance
+
+# Title prefix of the generated rows, removed afterwards.
+BENCH_TAG = 'bench_database'
+
+# Rollback journal and no pragma: what SQLite does unless told otherwise.
+DEFAULT_PRAGMAS = {'journal_mode': 'DELETE'}
+
+
+class Command(BaseCommand):
+    help = (
+        'Run the same mixed read/write catalog load with the default database profile '
+        '(a connection per request, rollback journal) and the tuned one (persistent '
+        'connections, CATALOG_SQLITE_PRAGMAS of CATALOG_DB_PROFILE=tuned), and compare them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds per profile.')
+        parser.add_argument('--books', type=int, default=200)
+        parser.add_argument('--copies', type=int, default=5, help='Copies per book.')
+        parser.add_argument('--profile', choices=['default', 'tuned', 'both'], default='both')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('The database profiles only apply to SQLite.')
+        tuned = dict(settings.CATALOG_SQLITE_PRAGMAS) or {
+            'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'mmap_size': 256 * 1024 * 1024,
+            'cache_size': -64 * 1024, 'busy_timeout': 5000,
+        }
+        profiles = {
+            'default': (DEFAULT_PRAGMAS, False),
+            'tuned': (tuned, True),
+        }
+        names = list(profiles) if options['profile'] == 'both' else [options['profile']]
+
+        book_ids, copy_ids = self.generate(options['books'], options['copies'])
+        try:
+            for name in names:
+                pragmas, persistent = profiles[name]
+                # The journal mode sticks to the file: switch it with no other connection open.
+                connection.close()
+                with override_settings(CATALOG_SQLITE_PRAGMAS=pragmas):
+                    connection.ensure_connection()
+                    stats = self.run(book_ids, copy_ids, persistent, options)
+                self.report(name, pragmas, persistent, stats, options['duration'])
+        finally:
+            connection.close()
+            with override_settings(CATALOG_SQLITE_PRAGMAS=settings.CATALOG_SQLITE_PRAGMAS or DEFAULT_PRAGMAS):
+                self.cleanup()
+
+    def run(self, book_ids, copy_ids, persistent, options):
+        stats = defaultdict(list)
+        errors = defaultdict(int)
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options['duration']
+
+        def client(kind, rng):
+            operation = self.read if kind == 'read' else self.write
+            latencies, failed = [], 0
+            try:
+                while time.perf_counter() < deadline:
+                    start = time.perf_counter()
+                    try:
+                        operation(rng, book_ids, copy_ids)
+                    except OperationalError:
+                        # SQLite gave up waiting for a lock
+                        failed += 1
+                    else:
+                        latencies.append(time.perf_counter() - start)
+                    if not persistent:
+                        # CONN_MAX_AGE = 0: the connection ends with the request
+                        connection.close()
+            finally:
+                connection.close()
+            with lock:
+                stats[kind].extend(latencies)
+                errors[kind] += failed
+
+        threads = [threading.Thread(target=client, args=('read', random.Random(number)))
+                   for number in range(options['readers'])]
+        threads += [threading.Thread(target=client, args=('write', random.Random(-1 - number)))
+                    for number in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return stats, errors
+
+    def read(self, rng, book_ids, copy_ids):
+        """ What the book list and book detail pages read. """
+        offset = rng.randrange(max(1, len(book_ids) - 10))
+        list(Book.objects.filter(pk__in=book_ids).select_related('author').order_by('title', 'id')[offset:offset + 10])
+        book = Book.objects.select_related('author').get(pk=rng.choice(book_ids))
+        list(book.bookinstance_set.order_by('due_back', 'id'))
+
+    def write(self, rng, book_ids, copy_ids):
+        """ A librarian lending or taking back a few copies. """
+        batch = rng.sample(copy_ids, 3)
+        if rng.random() < 0.5:
+            loans.checkout(batch, None)
+        else:
+            loans.return_copies(batch)
+
+    def report(self, name, pragmas, persistent, stats, duration):
+        latencies, errors = stats
+        pragmas = ', '.join(f'{key}={value}' for key, value in pragmas.items())
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{name}: {pragmas}; {"persistent connections" if persistent else "a connection per request"}'
+        ))
+        for kind in ('read', 'write'):
+            values = latencies[kind]
+            self.stdout.write(
+                f'  {kind}s: {len(values) / duration:8.0f}/s  p50 {percentile(values, 0.5) * 1000:6.1f}ms  '
+                f'p95 {percentile(values, 0.95) * 1000:6.1f}ms  p99 {percentile(values, 0.99) * 1000:6.1f}ms  '
+                f'{errors[kind]} lock timeouts'
+            )
+
+    def generate(self, number_of_books, copies_per_book):
+        books = bulk_create_with_pks(Book, [
+            Book(title=f'{BENCH_TAG} {number:05}', summary=BENCH_TAG, isbn=str(number))
+            for number in range(number_of_books)
+        ])
+        copies = bulk_create_with_pks(BookInstance, [
+            BookInstance(book=book, imprint=BENCH_TAG, status='a')
+            for book in books for _ in range(copies_per_book)
+        ])
+        return [book.pk for book in books], [copy.pk for copy in copies]
+
+    def cleanup(self):
+        BookInstance.objects.filter(imprint=BENCH_TAG).delete()
+        Book.objects.filter(summary=BENCH_TAG).delete()
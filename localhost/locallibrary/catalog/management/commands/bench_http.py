@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from catalog import loadtest
+
+# Pages compared, relative to the base URL: the synchronous views and their
+# asynchronous versions (catalog.async_views).
+PAGES = {
+    'sync': ['/catalog/', '/catalog/books/', '/catalog/author/', '/catalog/api/1'],
+    'async': ['/catalog/async/', '/catalog/async/books/', '/catalog/async/author/', '/catalog/async/api/1'],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the throughput and latency of running servers, e.g. WSGI and ASGI:\n'
+        '  uwsgi --http :8000 --module locallibrary.wsgi --processes 4\n'
+        '  uvicorn locallibrary.asgi:application --port 8001 --workers 4\n'
+        '  manage.py bench_http wsgi=http://127.0.0.1:8000 asgi=http://127.0.0.1:8001'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('servers', nargs='+', help='name=base URL of each server to measure.')
+        parser.add_argument('--concurrency', type=int, default=64)
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--pages', choices=['sync', 'async', 'both'], default='both',
+                            help='Which versions of the pages to request.')
+
+    def handle(self, *args, **options):
+        pages = ['sync', 'async'] if options['pages'] == 'both' else [options['pages']]
+        self.stdout.write(f'{"server":<12}{"pages":<8}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}'
+                          f'{"p99 ms":>10}{"errors":>8}{"non-2xx":>9}')
+        for server in options['servers']:
+            name, _, base_url = server.rpartition('=')
+            name = name or base_url
+            for kind in pages:
+                urls = [base_url.rstrip('/') + path for path in PAGES[kind]]
+                # Warm up the connections, caches and templates first.
+                loadtest.run(urls, concurrency=min(8, options['concurrency']), requests=len(urls) * 8)
+                result = loadtest.run(urls, concurrency=options['concurrency'], requests=options['requests'])
+                summary = result.summary()
+                self.stdout.write(
+                    f'{name:<12}{kind:<8}{summary["throughput"]:>10.0f}{summary["p50_ms"]:>10.1f}'
+                    f'{summary["p95_ms"]:>10.1f}{summary["p99_ms"]:>10.1f}{summary["errors"]:>8}{summary["non_2xx"]:>9}'
+                )
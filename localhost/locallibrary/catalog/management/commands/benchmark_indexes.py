@@ -0,0 +1,192 @@
+import datetime
+import os
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+
+from catalog.models import Author, Book, BookInstance, Genre
+
+# Imprint of the generated copies and summary of the generated books.
+BENCHMARK_IMPRINT = 'benchmark_indexes'
+
+# Rows deleted per query by the cleanup.
+DELETE_CHUNK = 500
+
+STATUSES = ['a', 'o', 'm', 'r']
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a large BookInstance table and show the query plans and '
+        'timings of the hot catalog queries with and without the catalog indexes. '
+        'Runs in a temporary database created from the migrations (a file in the '
+        'temporary directory with SQLite), so the catalog is left untouched.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000, help='Number of BookInstance rows to generate.')
+        parser.add_argument('--books', type=int, default=10000, help='Number of books the copies belong to.')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query, the best one is reported.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the temporary database and the generated rows in it.')
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        rng = random.Random(options['seed'])
+
+        with self.temporary_database(options['keep']):
+            self.stdout.write(f'Generating {options["rows"]} copies of {options["books"]} books...')
+            created = self.generate(rng, options['rows'], options['books'])
+            books, users = created[Book], created[User]
+            params = {
+                'book': books[0],
+                'author': books[0].author,
+                'user': users[0],
+            }
+            try:
+                with_indexes = self.run_queries(params)
+                with self.indexes_removed():
+                    without_indexes = self.run_queries(params)
+            finally:
+                if not options['keep']:
+                    self.cleanup(created)
+
+        self.stdout.write(f'\n{"query":<28}{"without (ms)":>14}{"with (ms)":>12}')
+        for name in with_indexes:
+            self.stdout.write(f'{name:<28}{without_indexes[name]:>14.2f}{with_indexes[name]:>12.2f}')
+
+    @contextmanager
+    def temporary_database(self, keep):
+        """ Point the default connection to a new database for the duration. """
+        test_settings = connection.settings_dict['TEST']
+        old_test_name, directory = test_settings.get('NAME'), None
+        if connection.vendor == 'sqlite' and not old_test_name:
+            # On disk rather than the in-memory test database
+            directory = tempfile.mkdtemp()
+            test_settings['NAME'] = os.path.join(directory, 'benchmark_indexes.sqlite3')
+        old_name = connection.settings_dict['NAME']
+        try:
+            name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            self.stdout.write(f'Temporary database: {name}')
+            try:
+                yield
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keep)
+                if keep:
+                    self.stdout.write(f'Temporary database kept: {name}')
+                elif directory:
+                    os.rmdir(directory)
+        finally:
+            test_settings['NAME'] = old_test_name
+
+    def queries(self, params):
+        today = datetime.date.today()
+        return {
+            'available copies': lambda: BookInstance.objects.filter(status__exact='a').order_by().values(
+                'status').annotate(count=Count('pk')),
+            'borrowed list': lambda: BookInstance.objects.filter(status__exact='o').order_by('due_back', 'id')[:10],
+            'loans of a user': lambda: BookInstance.objects.filter(
+                borrower=params['user'], status__exact='o').order_by('due_back')[:10],
+            'overdue loans': lambda: BookInstance.objects.filter(status__exact='o', due_back__lt=today)[:10],
+            'books of an author': lambda: Book.objects.filter(author=params['author']),
+            'genre by name': lambda: Genre.objects.filter(name='Science Fiction'),
+            'author list': lambda: Author.objects.order_by('last_name', 'first_name', 'id')[:5],
+        }
+
+    def run_queries(self, params):
+        timings = {}
+        for name, make_query in self.queries(params).items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n{name}'))
+            self.stdout.write(make_query().explain())
+            best = None
+            for _ in range(self.repeat):
+                start = time.perf_counter()
+                list(make_query())
+                elapsed = (time.perf_counter() - start) * 1000
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = best
+            self.stdout.write(f'{best:.2f} ms')
+        return timings
+
+    def catalog_indexes(self):
+        for model in (Author, Book, BookInstance, Genre):
+            for index in model._meta.indexes:
+                yield model, index
+
+    @contextmanager
+    def indexes_removed(self):
+        self.stdout.write(self.style.MIGRATE_HEADING('\nDropping the catalog indexes'))
+        with connection.schema_editor() as editor:
+            for model, index in self.catalog_indexes():
+                editor.remove_index(model, index)
+        self.analyze()
+        try:
+            yield
+        finally:
+            self.stdout.write(self.style.MIGRATE_HEADING('\nRestoring the catalog indexes'))
+            with connection.schema_editor() as editor:
+                for model, index in self.catalog_indexes():
+                    editor.add_index(model, index)
+            self.analyze()
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def generate(self, rng, rows, number_of_books):
+        """ Create the rows, returning the objects created by model (without the copies). """
+        authors = [
+            Author.objects.create(first_name=f'Benchmark {i}', last_name=f'Author {i:04}')
+            for i in range(max(1, number_of_books // 10))
+        ]
+        genres = [] if Genre.objects.filter(name='Science Fiction').exists() else [
+            Genre.objects.create(name='Science Fiction')]
+        Book.objects.bulk_create([
+            Book(title=f'Benchmark book {i:07}', summary=BENCHMARK_IMPRINT, isbn=f'{i:013}', author=rng.choice(authors))
+            for i in range(number_of_books)
+        ], batch_size=1000)
+        books = list(Book.objects.filter(summary=BENCHMARK_IMPRINT).select_related('author'))
+        users = [User.objects.create(username=f'{BENCHMARK_IMPRINT}_{i}') for i in range(100)]
+
+        batch_size = 10000
+        start_date = datetime.date.today() - datetime.timedelta(days=60)
+        for offset in range(0, rows, batch_size):
+            batch = []
+            for _ in range(min(batch_size, rows - offset)):
+                status = rng.choice(STATUSES)
+                batch.append(BookInstance(
+                    book=rng.choice(books),
+                    imprint=BENCHMARK_IMPRINT,
+                    status=status,
+                    due_back=start_date + datetime.timedelta(days=rng.randrange(120)) if status == 'o' else None,
+                    borrower=rng.choice(users) if status == 'o' else None,
+                ))
+            BookInstance.objects.bulk_create(batch)
+        self.analyze()
+        return {Author: authors, Genre: genres, Book: books, User: users}
+
+    def cleanup(self, created):
+        """ Delete the rows generate() created, by primary key. """
+        self.stdout.write('Removing the generated rows...')
+        book_ids = [book.pk for book in created[Book]]
+        # Raw deletes: going through the ORM would load every row for the
+        # delete signals. The copies are those of the generated books.
+        with connection.cursor() as cursor:
+            for model, column, pks in (
+                (BookInstance, 'book_id', book_ids),
+                (Book, 'id', book_ids),
+                (Author, 'id', [author.pk for author in created[Author]]),
+                (Genre, 'id', [genre.pk for genre in created[Genre]]),
+            ):
+                for start in range(0, len(pks), DELETE_CHUNK):
+                    chunk = pks[start:start + DELETE_CHUNK]
+                    placeholders = ', '.join(['%s'] * len(chunk))
+                    cursor.execute(f'DELETE FROM {model._meta.db_table} WHERE {column} IN ({placeholders})', chunk)
+        User.objects.filter(pk__in=[user.pk for user in created[User]]).delete()
@@ -0,0 +1,112 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from catalog import counters, search
+from catalog.models import Author, Book, Genre, SearchTerm
+
+# Summary used to tag the generated books so they can be removed afterwards.
+BENCHMARK_TAG = 'benchmark_search'
+
+WORDS = (
+    'ancient dragon empire river mountain secret garden journey winter shadow '
+    'silver kingdom ocean machine star letter storm forest city island memory '
+    'clock glass fire queen traveller library night summer war peace'
+).split()
+
+
+class Command(BaseCommand):
+    help = 'Compare catalog search with the icontains lookups on generated books.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=50000)
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query, the best one is reported.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--keep', action='store_true', help='Keep the generated books.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self.repeat = options['repeat']
+        self.stdout.write(f'Generating and indexing {options["books"]} books...')
+        self.generate(rng, options['books'])
+        try:
+            self.stdout.write(f'\n{"query":<24}{"icontains (ms)":>16}{"search (ms)":>14}{"matches":>10}')
+            for query in ('dragon', 'silver kingdom', 'Genre 3', 'Author 0042', '0000000004711'):
+                self.stdout.write(
+                    f'{query:<24}{self.time(lambda: self.icontains(query)):>16.2f}'
+                    f'{self.time(lambda: self.search(query)):>14.2f}'
+                    f'{search.search(query).count():>10}'
+                )
+        finally:
+            if not options['keep']:
+                self.cleanup()
+
+    def search(self, query):
+        """ A first page of results, with the count used by the paginator. """
+        results = search.search(query)
+        return results.count(), results[:10]
+
+    def icontains(self, query):
+        """ The same page with icontains lookups on every field. """
+        books = Book.objects.select_related('author')
+        for term in query.split():
+            books = books.filter(
+                Q(title__icontains=term) | Q(summary__icontains=term) | Q(isbn__icontains=term)
+                | Q(author__first_name__icontains=term) | Q(author__last_name__icontains=term)
+                | Q(genre__name__icontains=term)
+            )
+        books = books.distinct()
+        return books.count(), list(books[:10])
+
+    def time(self, run):
+        best = None
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            run()
+            elapsed = (time.perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def generate(self, rng, number_of_books):
+        with transaction.atomic():
+            authors = [
+                Author.objects.create(first_name=BENCHMARK_TAG, last_name=f'Author {i:04}')
+                for i in range(max(1, number_of_books // 20))
+            ]
+            genres = [Genre.objects.create(name=f'{BENCHMARK_TAG} Genre {i}') for i in range(20)]
+            Book.objects.bulk_create([
+                Book(
+                    title=' '.join(rng.sample(WORDS, 3)).title(),
+                    summary=f'{BENCHMARK_TAG} ' + ' '.join(rng.choice(WORDS) for _ in range(40)),
+                    isbn=f'{i:013}',
+                    author=rng.choice(authors),
+                )
+                for i in range(number_of_books)
+            ], batch_size=1000)
+            through = Book.genre.through
+            through.objects.bulk_create([
+                through(book_id=book_id, genre_id=rng.choice(genres).pk)
+                for book_id in Book.objects.filter(summary__startswith=BENCHMARK_TAG).values_list('pk', flat=True)
+            ], batch_size=1000)
+        # bulk_create() does not send signals
+        search.rebuild_index()
+        counters.invalidate()
+
+    def cleanup(self):
+        self.stdout.write('Removing the generated books...')
+        book_ids = list(Book.objects.filter(summary__startswith=BENCHMARK_TAG).values_list('pk', flat=True))
+        # Raw deletes: going through the ORM would reindex every book from the
+        # delete signals.
+        books = f"SELECT id FROM {Book._meta.db_table} WHERE summary LIKE %s"
+        with connection.cursor() as cursor:
+            for table in (Book.genre.through._meta.db_table, SearchTerm._meta.db_table):
+                cursor.execute(f'DELETE FROM {table} WHERE book_id IN ({books})', [f'{BENCHMARK_TAG}%'])
+            cursor.execute(f'DELETE FROM {Book._meta.db_table} WHERE summary LIKE %s', [f'{BENCHMARK_TAG}%'])
+            cursor.execute(f'DELETE FROM {Author._meta.db_table} WHERE first_name = %s', [BENCHMARK_TAG])
+            cursor.execute(f'DELETE FROM {Genre._meta.db_table} WHERE name LIKE %s', [f'{BENCHMARK_TAG}%'])
+        for start in range(0, len(book_ids), 1000):
+            search.index_books(book_ids[start:start + 1000])
+        counters.invalidate()
@@ -0,0 +1,78 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from catalog.bulk import bulk_create_with_pks
+from catalog.models import Author, Book, Genre
+from catalog.serializers import BookBulkSerializer, BookSerializer
+
+
+# Summary used to tag the generated books.
+BENCHMARK_TAG = 'benchmark_serializers'
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Measure the books serialized per second by the API representations.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per case, the best one is reported.')
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        # The generated rows are bulk created (no signals, so no cache
+        # updates) in a transaction rolled back at the end, so the database
+        # is left untouched.
+        try:
+            with transaction.atomic():
+                self.generate(options['books'])
+                self.run(options['books'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, number_of_books):
+        books = Book.objects.filter(summary=BENCHMARK_TAG).order_by('pk')
+        cases = [
+            ('hyperlinked, no prefetch', books, BookSerializer, ''),
+            ('hyperlinked', books.prefetch_related('genre'), BookSerializer, ''),
+            ('compact', books.prefetch_related('genre'), BookBulkSerializer, '?format=compact'),
+            ('compact ?fields=id,title', books, BookBulkSerializer, '?format=compact&fields=id,title'),
+        ]
+        self.stdout.write(f'{"case":<28}{"books/s":>12}{"queries":>10}')
+        for name, queryset, serializer_class, query_string in cases:
+            request = Request(APIRequestFactory().get('/api/books/' + query_string))
+            best, queries = None, 0
+            for _ in range(self.repeat):
+                start = time.perf_counter()
+                with CaptureQueriesContext(connection) as captured:
+                    serializer_class(list(queryset.all()), many=True, context={'request': request}).data
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+                queries = len(captured)
+            self.stdout.write(f'{name:<28}{number_of_books / best:>12.0f}{queries:>10}')
+
+    def generate(self, number_of_books):
+        self.stdout.write(f'Generating {number_of_books} books...')
+        authors = bulk_create_with_pks(Author, [
+            Author(first_name=BENCHMARK_TAG, last_name=f'Author {i:04}') for i in range(max(1, number_of_books // 20))
+        ])
+        genres = bulk_create_with_pks(Genre, [Genre(name=f'{BENCHMARK_TAG} {i}') for i in range(10)])
+        books = bulk_create_with_pks(Book, [
+            Book(title=f'Book {i:06}', summary=BENCHMARK_TAG, isbn=f'{i:013}', author=authors[i % len(authors)])
+            for i in range(number_of_books)
+        ])
+        through = Book.genre.through
+        through.objects.bulk_create([
+            through(book_id=book.pk, genre_id=genres[(i + offset) % len(genres)].pk)
+            for i, book in enumerate(books)
+            for offset in (0, 3)
+        ], batch_size=1000)
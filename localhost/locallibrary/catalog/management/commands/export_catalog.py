@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from catalog import exporter
+
+
+class Command(BaseCommand):
+    help = 'Stream an export of the books, authors, genres or copies as CSV or JSON Lines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(exporter.EXPORTS))
+        parser.add_argument('--format', choices=sorted(exporter.FORMATS), default='jsonl')
+        parser.add_argument('--since', help='Only export rows changed since this ISO 8601 date and time.')
+        parser.add_argument('--output', help='File to write, defaults to stdout.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError('--since must be an ISO 8601 date and time')
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+
+        rows = exporter.export_rows(options['name'], since=since, chunk_size=options['chunk_size'])
+        lines = exporter.render(options['name'], rows, options['format'])
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
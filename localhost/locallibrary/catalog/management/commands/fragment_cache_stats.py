@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from catalog import fragments
+
+
+class Command(BaseCommand):
+    help = 'Show the hit rate of the fragment cache, by fragment.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counts after showing them.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"fragment":<16}{"hits":>10}{"misses":>10}{"hit rate":>10}')
+        for name, (hits, misses) in fragments.stats().items():
+            total = hits + misses
+            rate = f'{hits / total:.1%}' if total else '-'
+            self.stdout.write(f'{name:<16}{hits:>10}{misses:>10}{rate:>10}')
+        if options['reset']:
+            fragments.reset_stats()
+            self.stdout.write('Counts reset.')
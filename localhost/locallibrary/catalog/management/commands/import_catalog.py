@@ -0,0 +1,49 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.importer import CatalogImporter, read_records
+from catalog.models import ImportCheckpoint
+
+
+class Command(BaseCommand):
+    help = (
+        'Import books, authors, genres and copies from a CSV or JSON Lines file '
+        'in chunked transactions. An interrupted import resumes where it stopped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSON Lines (.jsonl, .ndjson) file to import.')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Records written per transaction.')
+        parser.add_argument('--workers', type=int, default=1, help='Processes parsing the records.')
+        parser.add_argument('--restart', action='store_true', help='Ignore the progress of an earlier run.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'{path} does not exist')
+        file_format = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+        source = os.path.abspath(path)
+        if options['restart']:
+            ImportCheckpoint.objects.filter(source=source).delete()
+
+        importer = CatalogImporter(
+            source,
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            log=self.stdout.write,
+        )
+        start = time.perf_counter()
+        importer.run(read_records(path, file_format))
+        elapsed = time.perf_counter() - start
+
+        for position, error in importer.errors[:20]:
+            self.stderr.write(f'Record {position}: {error}')
+        if len(importer.errors) > 20:
+            self.stderr.write(f'... and {len(importer.errors) - 20} more errors')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {importer.imported} books and {importer.copies} copies in {elapsed:.1f}s '
+            f'({importer.imported / max(elapsed, 1e-9):.0f} books/s), {len(importer.errors)} records skipped.'
+        ))
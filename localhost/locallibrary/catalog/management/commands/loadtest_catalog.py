@@ -0,0 +1,138 @@
+import datetime
+import json
+import math
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog import loadtest
+from catalog.management.commands.seed_catalog import DEFAULT_PASSWORD, LIBRARIAN, READER_PREFIX
+from catalog.models import Author, Book, BookInstance
+from catalog.views import BookListView
+
+# Requests per scenario (at most) drawn from the catalog, in turn.
+SAMPLE = 200
+
+# Who sends the requests of each scenario: nobody, a reader or the librarian.
+SCENARIOS = {
+    'index': None,
+    'books': None,
+    'book-detail': None,
+    'author-detail': None,
+    'api-books': 'reader',
+    'my-borrowed': 'reader',
+    'borrowed': 'librarian',
+    'renew': 'librarian',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Load a running server with the catalog scenarios (pages, borrowed lists, renewals and the API) '
+        'and report their throughput and latency, optionally against a saved baseline. Run it with the '
+        'settings of the server, on a catalog generated by manage.py seed_catalog:\n'
+        '  manage.py seed_catalog --books 20000\n'
+        '  uwsgi --http :8000 --module locallibrary.wsgi --processes 4\n'
+        '  manage.py loadtest_catalog http://127.0.0.1:8000 --save-baseline baseline.json\n'
+        '  manage.py loadtest_catalog http://127.0.0.1:8000 --baseline baseline.json'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('base_url', nargs='?', default='http://127.0.0.1:8000')
+        parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=1000, help='Requests per scenario.')
+        parser.add_argument('--password', default=DEFAULT_PASSWORD, help='Password of the generated users.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--save-baseline', metavar='PATH', help='Write the results to this JSON file.')
+        parser.add_argument('--baseline', metavar='PATH', help='Compare the results to this JSON file.')
+        parser.add_argument('--threshold', type=float, default=0.1,
+                            help='Fraction by which a figure may be worse than the baseline (default 0.1).')
+
+    def handle(self, *args, **options):
+        base_url = options['base_url'].rstrip('/')
+        rng = random.Random(options['seed'])
+        users = {None: {}}
+        results = {}
+
+        self.stdout.write(f'{"scenario":<16}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}'
+                          f'{"p99 ms":>10}{"errors":>8}{"non-2xx":>9}')
+        for name in options['scenarios']:
+            role = SCENARIOS[name]
+            if role not in users:
+                users[role] = self.login(base_url, role, options['password'])
+            requests = self.requests(name, base_url, rng)
+            if not requests:
+                self.stdout.write(f'{name:<16}skipped: no data, run manage.py seed_catalog first')
+                continue
+            # Warm up the connections, caches and templates first.
+            loadtest.run(requests, concurrency=min(4, options['concurrency']),
+                         requests=min(len(requests), 20), headers=users[role])
+            result = loadtest.run(requests, concurrency=options['concurrency'],
+                                  requests=options['requests'], headers=users[role])
+            summary = results[name] = result.summary()
+            self.stdout.write(
+                f'{name:<16}{summary["throughput"]:>10.0f}{summary["p50_ms"]:>10.1f}{summary["p95_ms"]:>10.1f}'
+                f'{summary["p99_ms"]:>10.1f}{summary["errors"]:>8}{summary["non_2xx"]:>9}'
+            )
+
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as file:
+                json.dump(results, file, indent=2, sort_keys=True)
+            self.stdout.write(f'Baseline saved to {options["save_baseline"]}.')
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)
+            regressions = loadtest.compare(baseline, results, options['threshold'])
+            for scenario, figure, old, new in regressions:
+                self.stdout.write(self.style.ERROR(f'{scenario}: {figure} {old:.1f} -> {new:.1f}'))
+            if regressions:
+                raise CommandError(f'{len(regressions)} figures regressed by more than '
+                                   f'{options["threshold"]:.0%} from {options["baseline"]}.')
+            self.stdout.write(self.style.SUCCESS(f'No regression from {options["baseline"]}.'))
+
+    def login(self, base_url, role, password):
+        if role == 'librarian':
+            username = LIBRARIAN
+        else:
+            # A reader with loans, so that their borrowed list is not empty
+            username = BookInstance.objects.filter(
+                status='o', borrower__username__startswith=READER_PREFIX,
+            ).order_by('borrower__username').values_list('borrower__username', flat=True).first()
+            username = username or f'{READER_PREFIX}000000'
+        try:
+            return loadtest.login(base_url, username, password)
+        except (OSError, ValueError) as error:
+            raise CommandError(f'Cannot sign in as {username}: {error}')
+
+    def sample(self, rng, queryset):
+        ids = list(queryset.values_list('pk', flat=True))
+        return rng.sample(ids, min(SAMPLE, len(ids)))
+
+    def requests(self, name, base_url, rng):
+        """ Return the requests of scenario ``name`` for loadtest.run(). """
+        catalog = f'{base_url}/catalog'
+        if name == 'index':
+            return [f'{catalog}/']
+        if name == 'books':
+            pages = math.ceil(Book.objects.count() / BookListView.paginate_by)
+            return [f'{catalog}/books/?page={rng.randint(1, pages)}' for _ in range(SAMPLE)] if pages else []
+        if name == 'book-detail':
+            return [f'{catalog}/books/{pk}' for pk in self.sample(rng, Book.objects.all())]
+        if name == 'author-detail':
+            return [f'{catalog}/author/{pk}' for pk in self.sample(rng, Author.objects.all())]
+        if name == 'api-books':
+            # The first page of the list, then single books
+            books = [f'{base_url}/api/books/{pk}/' for pk in self.sample(rng, Book.objects.all())]
+            return [f'{base_url}/api/books/', *books] if books else []
+        if name == 'my-borrowed':
+            return [f'{catalog}/mybooks/']
+        if name == 'borrowed':
+            return [f'{catalog}/borrowed']
+        if name == 'renew':
+            renewal_date = (datetime.date.today() + datetime.timedelta(weeks=2)).isoformat()
+            return [
+                ('POST', f'{catalog}/book/{pk}/renew/', {'renewal_date': renewal_date})
+                for pk in self.sample(rng, BookInstance.objects.filter(status='o'))
+            ]
+        raise ValueError(f'Unknown scenario {name}')
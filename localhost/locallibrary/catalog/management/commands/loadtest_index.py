@@ -0,0 +1,82 @@
+import threading
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.test import Client
+from django.urls import reverse
+
+from catalog.loadtest import percentile
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+class Command(BaseCommand):
+    help = (
+        'Load the home page from parallel visitors, in process (django.test.Client), and report '
+        'the throughput and the database writes per page view.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--visitors', type=int, default=8, help='Parallel visitors, each with its cookies.')
+        parser.add_argument('--visits', type=int, default=200, help='Page views per visitor.')
+        parser.add_argument('--path', default=None, help='Page to load, the home page by default.')
+
+    def handle(self, *args, **options):
+        path = options['path'] or reverse('index')
+        self.stdout.write(f'Database: {connection.vendor} {connection.settings_dict["NAME"]}')
+        self.totals = Counter()
+        self.latencies = []
+        self.lock = threading.Lock()
+
+        threads = [threading.Thread(target=self.visitor, args=(path, options['visits']))
+                   for _ in range(options['visitors'])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        views = len(self.latencies)
+        self.stdout.write(
+            f'{views} page views in {elapsed:.2f}s ({views / elapsed:.0f}/s), '
+            f'p50 {percentile(self.latencies, 0.5) * 1000:.1f}ms, p95 {percentile(self.latencies, 0.95) * 1000:.1f}ms, '
+            f'{self.totals["errors"]} errors'
+        )
+        self.stdout.write(
+            f'{self.totals["queries"] / max(views, 1):.2f} queries and '
+            f'{self.totals["writes"] / max(views, 1):.2f} writes per page view'
+        )
+
+    def visitor(self, path, visits):
+        client = Client()
+        counts = Counter()
+        latencies = []
+
+        def count(execute, sql, params, many, context):
+            counts['queries'] += 1
+            if sql.lstrip().upper().startswith(WRITE_STATEMENTS):
+                counts['writes'] += 1
+            return execute(sql, params, many, context)
+
+        try:
+            with connection.execute_wrapper(count):
+                for _ in range(visits):
+                    start = time.perf_counter()
+                    try:
+                        response = client.get(path)
+                    except OperationalError:
+                        # SQLite gave up waiting for the write lock
+                        counts['errors'] += 1
+                        continue
+                    if response.status_code != 200:
+                        counts['errors'] += 1
+                        continue
+                    latencies.append(time.perf_counter() - start)
+        finally:
+            connection.close()
+        with self.lock:
+            self.totals.update(counts)
+            self.latencies.extend(latencies)
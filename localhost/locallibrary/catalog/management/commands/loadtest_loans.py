@@ -0,0 +1,129 @@
+import random
+import threading
+import time
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+
+from catalog import loans
+from catalog.bulk import bulk_create_with_pks
+from catalog.models import Book, BookInstance
+
+# Title and user name prefix of the generated rows, removed afterwards.
+LOADTEST_TAG = 'loadtest_loans'
+
+
+class Command(BaseCommand):
+    help = (
+        'Check out and return copies from parallel threads, then check that no copy was lent twice. '
+        'Runs against the configured database (SQLite, or PostgreSQL when DATABASES points to it).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--copies', type=int, default=200)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--operations', type=int, default=200, help='Operations per thread.')
+        parser.add_argument('--batch', type=int, default=5, help='Copies per operation.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--wal', action='store_true', help='Switch a SQLite database to WAL journaling first.')
+        parser.add_argument('--naive', action='store_true',
+                            help='Use an unlocked read-modify-write per copy instead of the loans service, '
+                                 'to show the lost updates it allows.')
+
+    def handle(self, *args, **options):
+        if options['wal'] and connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode=WAL')
+        self.stdout.write(f'Database: {connection.vendor} {connection.settings_dict["NAME"]}')
+
+        book, copy_ids, borrowers = self.generate(options['copies'], options['threads'])
+        self.net = Counter()
+        self.operations = Counter()
+        self.lock = threading.Lock()
+        try:
+            threads = [
+                threading.Thread(target=self.client, args=(
+                    random.Random(options['seed'] + number), borrowers[number], copy_ids, options,
+                ))
+                for number in range(options['threads'])
+            ]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+            self.report(copy_ids, elapsed)
+        finally:
+            self.cleanup(book, borrowers)
+
+    def client(self, rng, borrower, copy_ids, options):
+        """ One librarian lending and taking back random copies. """
+        try:
+            for _ in range(options['operations']):
+                batch = rng.sample(copy_ids, options['batch'])
+                lend = rng.random() < 0.5
+                try:
+                    if options['naive']:
+                        done = self.naive(batch, borrower, lend)
+                    elif lend:
+                        done = loans.checkout(batch, borrower).done
+                    else:
+                        done = loans.return_copies(batch).done
+                except OperationalError:
+                    # SQLite gave up waiting for the write lock
+                    with self.lock:
+                        self.operations['errors'] += 1
+                    continue
+                with self.lock:
+                    self.operations['operations'] += 1
+                    self.operations['copies changed'] += len(done)
+                    for pk in done:
+                        self.net[pk] += 1 if lend else -1
+        finally:
+            connection.close()
+
+    def naive(self, batch, borrower, lend):
+        done = []
+        for pk in batch:
+            copy = BookInstance.objects.get(pk=pk)
+            if lend and copy.status == 'a':
+                copy.status, copy.borrower = 'o', borrower
+            elif not lend and copy.status == 'o':
+                copy.status, copy.borrower = 'a', None
+            else:
+                continue
+            copy.save()
+            done.append(pk)
+        return done
+
+    def report(self, copy_ids, elapsed):
+        on_loan = set(BookInstance.objects.filter(pk__in=copy_ids, status='o').values_list('pk', flat=True))
+        # Each copy must have been lent once more than returned if it is on
+        # loan, as often as returned otherwise.
+        wrong = [pk for pk in copy_ids if self.net[pk] != (1 if pk in on_loan else 0)]
+        operations = self.operations['operations']
+        self.stdout.write(
+            f'{operations} operations in {elapsed:.2f}s ({operations / elapsed:.0f} operations/s, '
+            f'{self.operations["copies changed"] / elapsed:.0f} copies changed/s), '
+            f'{self.operations["errors"]} lock timeouts'
+        )
+        if wrong:
+            self.stdout.write(self.style.ERROR(f'{len(wrong)} copies were lent or returned twice (lost updates).'))
+        else:
+            self.stdout.write(self.style.SUCCESS('No lost update: every copy was lent and returned in turn.'))
+
+    def generate(self, number_of_copies, number_of_threads):
+        book = Book.objects.create(title=LOADTEST_TAG, summary=LOADTEST_TAG, isbn='0')
+        copies = bulk_create_with_pks(BookInstance, [
+            BookInstance(book=book, imprint=LOADTEST_TAG, status='a') for _ in range(number_of_copies)
+        ])
+        borrowers = [User.objects.create(username=f'{LOADTEST_TAG}_{number}') for number in range(number_of_threads)]
+        return book, [copy.pk for copy in copies], borrowers
+
+    def cleanup(self, book, borrowers):
+        BookInstance.objects.filter(book=book).delete()
+        book.delete()
+        User.objects.filter(pk__in=[borrower.pk for borrower in borrowers]).delete()
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog.overdue import process_overdue
+
+
+class Command(BaseCommand):
+    help = 'Email reminders for the overdue loans, once, or every --interval seconds with --loop.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--loop', action='store_true', help='Keep running, for use without cron.')
+        parser.add_argument('--interval', type=int, default=60 * 60, help='Seconds between two runs with --loop.')
+
+    def handle(self, *args, **options):
+        log = self.stdout.write if options['verbosity'] > 1 else None
+        while True:
+            run = process_overdue(chunk_size=options['chunk_size'], log=log)
+            self.stdout.write(
+                f'{run.started_at:%Y-%m-%d %H:%M:%S}: {run.loans} overdue loans, {run.emails} emails sent, '
+                f'{run.skipped} without email address, in {run.chunks} chunks '
+                f'({run.total_seconds:.2f}s: {run.query_seconds:.2f}s queries, {run.mail_seconds:.2f}s mail)'
+            )
+            if not options['loop']:
+                return
+            try:
+                time.sleep(options['interval'])
+            except KeyboardInterrupt:
+                return
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from catalog import availability, versions
+from catalog.models import Book
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized copy availability of the books.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--check', action='store_true',
+                            help='Only report the books whose availability is wrong.')
+
+    def handle(self, *args, **options):
+        book_ids = list(Book.objects.order_by('pk').values_list('pk', flat=True))
+        batch_size = options['batch_size']
+        stale = []
+        for start in range(0, len(book_ids), batch_size):
+            stale += availability.stale(book_ids[start:start + batch_size])
+        self.stdout.write(f'{len(stale)} of {len(book_ids)} books have a wrong availability.')
+        if options['check'] or not stale:
+            return
+        for start in range(0, len(stale), batch_size):
+            availability.refresh(stale[start:start + batch_size])
+        # QuerySet.update() sends no signals: expire the cached book pages.
+        versions.bump(Book)
+        self.stdout.write(f'Recomputed the availability of {len(stale)} books.')
@@ -0,0 +1,184 @@
+import datetime
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, Permission, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from catalog import availability, counters, versions
+from catalog.bulk import bulk_create_with_pks
+from catalog.models import Author, Book, BookInstance, Genre
+from catalog.signals import bulk_changed
+
+# Password of the generated users, used by manage.py loadtest_catalog.
+DEFAULT_PASSWORD = 'loadtest-2HJ1vRV0Z'
+
+# Prefix of the generated readers' user names; the librarian is LIBRARIAN.
+READER_PREFIX = 'reader'
+LIBRARIAN = 'librarian'
+
+LIBRARIAN_PERMISSIONS = [
+    'can_mark_returned', 'can_view_borrowed',
+    'view_author', 'add_author', 'change_author', 'delete_author',
+    'view_book', 'add_book', 'change_book', 'delete_book',
+    'view_bookinstance', 'change_bookinstance', 'view_genre',
+]
+
+GENRES = [
+    'Science Fiction', 'Fantasy', 'Mystery', 'Romance', 'Horror', 'Poetry', 'History', 'Biography',
+    'Travel', 'Philosophy', 'Economics', 'Mathematics', 'Physics', 'Cooking', 'Art', 'Music',
+]
+WORDS = [
+    'silent', 'river', 'empire', 'glass', 'winter', 'garden', 'shadow', 'machine', 'ocean', 'letter',
+    'crown', 'forest', 'storm', 'city', 'mirror', 'journey', 'night', 'fire', 'island', 'memory',
+]
+FIRST_NAMES = ['Akira', 'Maria', 'John', 'Yuki', 'Anna', 'Kenji', 'Laura', 'Omar', 'Sofia', 'Hiro']
+LAST_NAMES = ['Tanaka', 'Smith', 'Garcia', 'Suzuki', 'Muller', 'Rossi', 'Kim', 'Sato', 'Silva', 'Brown']
+
+# (status, weight) of the generated copies
+STATUSES = [('a', 50), ('o', 30), ('r', 10), ('m', 10)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a large catalog (authors, genres, books, copies, readers and a librarian) with bulk '
+        'inserts. The same --seed generates the same catalog.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=10000)
+        parser.add_argument('--copies-per-book', type=int, default=5)
+        parser.add_argument('--users', type=int, default=1000, help='Readers borrowing the copies.')
+        parser.add_argument('--authors', type=int, default=None, help='Default: a tenth of the books.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Books written per transaction.')
+        parser.add_argument('--password', default=DEFAULT_PASSWORD, help='Password of the generated users.')
+        parser.add_argument('--append', action='store_true',
+                            help='Add to a catalog that already has books, numbering the new rows after the '
+                                 'existing ones and lending to the existing readers as well.')
+
+    def handle(self, *args, **options):
+        existing_readers = list(User.objects.filter(username__startswith=READER_PREFIX)
+                                .order_by('username').values_list('pk', flat=True))
+        if not options['append']:
+            if Book.objects.exists():
+                raise CommandError('The catalog already has books: use --append to add to them.')
+            if existing_readers:
+                raise CommandError(f'Users named {READER_PREFIX}* already exist: use --append to reuse them.')
+        rng = random.Random(options['seed'])
+        start = time.perf_counter()
+        # Titles, ISBNs and names go on from the existing rows
+        first_book = Book.objects.count()
+
+        with transaction.atomic():
+            genres = self.create_genres()
+            authors = self.create_authors(
+                rng, Author.objects.count(), options['authors'] or max(1, options['books'] // 10))
+            readers = existing_readers + self.create_users(
+                len(existing_readers), options['users'], options['password'])
+
+        today = datetime.date.today()
+        last_book = first_book + options['books']
+        for first in range(first_book, last_book, options['chunk_size']):
+            numbers = range(first, min(last_book, first + options['chunk_size']))
+            with transaction.atomic():
+                book_ids = self.create_books(
+                    rng, numbers, options['copies_per_book'], authors, genres, readers, today)
+                # Keep the search index, counters and versions up to date
+                transaction.on_commit(lambda: bulk_changed.send(sender=Book, pks=book_ids, created=True))
+            done = numbers.stop - first_book
+            self.stdout.write(f'{done} books ({done / (time.perf_counter() - start):.0f} books/s)')
+
+        # The copies were written with the availability of their books, so
+        # their bulk_changed (which recomputes it) is replaced by this.
+        counters.invalidate()
+        versions.bump(BookInstance)
+
+        # Fresh statistics for the query planner and the admin's estimated counts
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {options["books"]} books, {options["books"] * options["copies_per_book"]} copies, '
+            f'{len(authors)} authors and {len(readers)} readers in {time.perf_counter() - start:.1f}s. '
+            f'Users {READER_PREFIX}000000.. and {LIBRARIAN} have the password given by --password.'
+        ))
+
+    def create_genres(self):
+        existing = set(Genre.objects.values_list('name', flat=True))
+        created = bulk_create_with_pks(Genre, [Genre(name=name) for name in GENRES if name not in existing])
+        transaction.on_commit(lambda: bulk_changed.send(
+            sender=Genre, pks=[genre.pk for genre in created], created=True))
+        return list(Genre.objects.filter(name__in=GENRES).order_by('name').values_list('pk', flat=True))
+
+    def create_authors(self, rng, first, number):
+        authors = bulk_create_with_pks(Author, [
+            Author(
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=f'{rng.choice(LAST_NAMES)} {index:05}',
+                date_of_birth=datetime.date(1900, 1, 1) + datetime.timedelta(days=rng.randrange(365 * 100)),
+            )
+            for index in range(first, first + number)
+        ])
+        transaction.on_commit(lambda: bulk_changed.send(
+            sender=Author, pks=[author.pk for author in authors], created=True))
+        return [author.pk for author in authors]
+
+    def create_users(self, first, number, password):
+        """ Create the readers numbered ``first`` to ``number`` and the librarian, if missing. """
+        # Hashing is slow on purpose: hash once for all the users
+        hashed = make_password(password)
+        readers = bulk_create_with_pks(User, [
+            User(username=f'{READER_PREFIX}{index:06}', password=hashed) for index in range(first, number)
+        ])
+        librarian, created = User.objects.get_or_create(
+            username=LIBRARIAN, defaults={'password': hashed, 'is_staff': True})
+        group, _ = Group.objects.get_or_create(name='Librarians')
+        group.permissions.add(*Permission.objects.filter(
+            content_type__app_label='catalog', codename__in=LIBRARIAN_PERMISSIONS))
+        librarian.groups.add(group)
+        return [reader.pk for reader in readers]
+
+    def create_books(self, rng, numbers, copies_per_book, authors, genres, readers, today):
+        statuses = [status for status, _ in STATUSES]
+        weights = [weight for _, weight in STATUSES]
+        books, copies = [], []
+        for number in numbers:
+            book = Book(
+                title=f'{rng.choice(WORDS).capitalize()} {rng.choice(WORDS)} {number}',
+                summary=' '.join(rng.choice(WORDS) for _ in range(30)),
+                isbn=f'978{number:010}',
+                author_id=rng.choice(authors),
+            )
+            for copy in range(copies_per_book):
+                status = rng.choices(statuses, weights)[0]
+                lent = status in ('o', 'r') and readers
+                # Some loans overdue, the others due within three weeks
+                due_back = today + datetime.timedelta(days=rng.randint(-14, 21)) if status == 'o' else None
+                copies.append((book, BookInstance(
+                    imprint=f'Imprint {copy + 1}',
+                    status=status,
+                    due_back=due_back,
+                    borrower_id=rng.choice(readers) if lent else None,
+                )))
+                # The availability summary is known here: writing it with the
+                # book saves recomputing it from the copies afterwards.
+                field = availability.STATUS_FIELDS[status]
+                setattr(book, field, getattr(book, field) + 1)
+                if due_back and (book.next_due_back is None or due_back < book.next_due_back):
+                    book.next_due_back = due_back
+            books.append(book)
+        bulk_create_with_pks(Book, books)
+
+        through = Book.genre.through
+        through.objects.bulk_create([
+            through(book_id=book.pk, genre_id=genre)
+            for book in books
+            for genre in rng.sample(genres, rng.randint(1, 3))
+        ], batch_size=1000)
+
+        for book, copy in copies:
+            copy.book_id = book.pk
+        BookInstance.objects.bulk_create([copy for _, copy in copies], batch_size=1000)
+        return [book.pk for book in books]
@@ -0,0 +1,37 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the SQLite primary database to the SQLite replicas of CATALOG_REPLICAS '
+        '(see CATALOG_REPLICA_FILES), to try replica routing locally. Run it again, '
+        'or with --loop, to replicate new writes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Copy again every --interval seconds.')
+        parser.add_argument('--interval', type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        replicas = [alias for alias in settings.CATALOG_REPLICAS if connections[alias].vendor == 'sqlite']
+        if connections['default'].vendor != 'sqlite' or not replicas:
+            raise CommandError('Needs a SQLite primary and SQLite replicas (CATALOG_REPLICA_FILES).')
+        while True:
+            primary = connections['default']
+            primary.ensure_connection()
+            for alias in replicas:
+                target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+                try:
+                    # Online backup: consistent even while the primary is being written
+                    primary.connection.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(f'default -> {alias} ({connections[alias].settings_dict["NAME"]})')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,119 @@
+import cProfile
+import os
+import random
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from catalog import profiling, routers
+
+# Session key of the time until which the session reads from the primary.
+PIN_SESSION_KEY = 'catalog_primary_until'
+
+
+class ReplicaMiddleware:
+    """
+    Send the reads of the opted-in views to a replica (catalog.routers),
+    and pin a session to the primary for a while after it wrote, so that
+    it reads its own writes. Must come after SessionMiddleware.
+
+    Clients without a session cookie (e.g. API clients using basic
+    authentication) cannot be pinned.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = routers.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = routers.end_request(token)
+        if wrote and routers.replicas() and hasattr(request, 'session'):
+            request.session[PIN_SESSION_KEY] = time.time() + settings.CATALOG_REPLICA_PIN_SECONDS
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not routers.replicas() or request.method not in ('GET', 'HEAD'):
+            return None
+        if routers.wants_replica(view_func, request.method) and not self.pinned(request):
+            routers.use_replica()
+        return None
+
+    def pinned(self, request):
+        session = getattr(request, 'session', None)
+        return session is not None and session.get(PIN_SESSION_KEY, 0) > time.time()
+
+
+class ProfilingMiddleware:
+    """
+    Record the requests in catalog.profiling, sampling the detailed
+    timings. Goes first in MIDDLEWARE, to time the other middlewares too.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Only one cProfile profiler can run at a time
+        self.profiler_lock = threading.Lock()
+
+    def __call__(self, request):
+        if random.random() >= profiling.sample_rate():
+            response = self.get_response(request)
+            profiling.registry.count(self.view_name(request))
+            return response
+
+        timings, token = profiling.start_request()
+        profiler = self.start_profiler()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings))
+                response = self.get_response(request)
+        finally:
+            duration = time.perf_counter() - start
+            profiling.end_request(token)
+            if profiler is not None:
+                self.stop_profiler(profiler, request, duration)
+
+        view_name = self.view_name(request)
+        profiling.registry.count(view_name)
+        profiling.registry.observe(
+            view_name,
+            duration_seconds=duration,
+            sql_queries=timings.sql_queries,
+            sql_seconds=timings.sql_seconds,
+            template_seconds=timings.template_seconds,
+            response_bytes=0 if response.streaming else len(response.content),
+        )
+        return response
+
+    def view_name(self, request):
+        match = getattr(request, 'resolver_match', None)
+        return match.view_name if match is not None else 'unresolved'
+
+    def start_profiler(self):
+        if not getattr(settings, 'CATALOG_PROFILING_DUMP_DIR', None) or not self.profiler_lock.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def stop_profiler(self, profiler, request, duration):
+        try:
+            profiler.disable()
+            if duration >= settings.CATALOG_PROFILING_SLOW_SECONDS:
+                name = self.view_name(request).replace(':', '-')
+                path = os.path.join(
+                    settings.CATALOG_PROFILING_DUMP_DIR,
+                    f'{timezone.now():%Y%m%d-%H%M%S}-{name}-{duration * 1000:.0f}ms.prof',
+                )
+                os.makedirs(settings.CATALOG_PROFILING_DUMP_DIR, exist_ok=True)
+                profiler.dump_stats(path)
+        finally:
+            self.profiler_lock.release()
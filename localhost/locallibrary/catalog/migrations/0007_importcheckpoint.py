@@ -0,0 +1,22 @@
+# Generated by Django 3.2 on 2026-10-18 02:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(help_text='Name of the imported file', max_length=255, unique=True)),
+                ('position', models.PositiveBigIntegerField(default=0, help_text='Number of records already imported')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
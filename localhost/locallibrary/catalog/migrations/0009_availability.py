@@ -0,0 +1,58 @@
+# Generated by Django 3.2 on 2026-10-18 02:17
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_availability(apps, schema_editor):
+    """ Compute the availability of the existing books. """
+    Book = apps.get_model('catalog', 'Book')
+    BookInstance = apps.get_model('catalog', 'BookInstance')
+    copies = BookInstance.objects.filter(book=OuterRef('pk')).order_by()
+    fields = {'a': 'copies_available', 'o': 'copies_on_loan', 'r': 'copies_reserved', 'm': 'copies_maintenance'}
+    Book.objects.update(
+        **{
+            field: Coalesce(Subquery(
+                copies.filter(status=status).values('book').annotate(number=Count('pk')).values('number')
+            ), 0)
+            for status, field in fields.items()
+        },
+        next_due_back=Subquery(copies.filter(status='o', due_back__isnull=False).order_by('due_back').values('due_back')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0008_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='copies_available',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='copies_maintenance',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='copies_on_loan',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='copies_reserved',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='next_due_back',
+            field=models.DateField(blank=True, editable=False, help_text='Earliest return date of the copies on loan', null=True),
+        ),
+        migrations.RunPython(fill_availability, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.2 on 2026-10-18 02:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0009_availability'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OverdueRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField()),
+                ('loans', models.PositiveIntegerField(default=0, help_text='Overdue loans processed')),
+                ('emails', models.PositiveIntegerField(default=0, help_text='Reminder emails sent')),
+                ('skipped', models.PositiveIntegerField(default=0, help_text='Loans whose borrower has no email address')),
+                ('chunks', models.PositiveIntegerField(default=0)),
+                ('query_seconds', models.FloatField(default=0, help_text='Time spent reading and marking the loans')),
+                ('mail_seconds', models.FloatField(default=0, help_text='Time spent sending the emails')),
+                ('total_seconds', models.FloatField(default=0)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='bookinstance',
+            name='last_reminded',
+            field=models.DateField(blank=True, editable=False, help_text='Date of the last overdue reminder sent to the borrower', null=True),
+        ),
+    ]
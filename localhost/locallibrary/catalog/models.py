@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.contrib.auth.models import User
 from datetime import date
 
@@ -6,6 +6,12 @@ from datetime import date
 class Genre(models.Model):
     """ Model representing a book genre. """
     name = models.CharField(max_length=200, help_text='Enter a book genre (e.g. Science Fiction)')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['name', 'id'], name='catalog_genre_name_idx'),
+        ]
 
     def __str__(self):
         """ String for representing the Model object. """
@@ -27,6 +33,26 @@ class Book(models.Model):
     # ManyToManyField used because genre can contain many books. Books can cover many genres.
     # Genre class has already been defined so we can specify the object above.
     genre = models.ManyToManyField(Genre, help_text='Select a genre for this book')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    # Availability of the copies, kept up to date by catalog.availability
+    copies_available = models.PositiveIntegerField(default=0, editable=False)
+    copies_on_loan = models.PositiveIntegerField(default=0, editable=False)
+    copies_reserved = models.PositiveIntegerField(default=0, editable=False)
+    copies_maintenance = models.PositiveIntegerField(default=0, editable=False)
+    next_due_back = models.DateField(null=True, blank=True, editable=False,
+                                     help_text='Earliest return date of the copies on loan')
+
+    # Not written back by save() on existing books, unless named in
+    # update_fields: the copies may have changed since the book was loaded.
+    AVAILABILITY_FIELDS = ('copies_available', 'copies_on_loan', 'copies_reserved', 'copies_maintenance',
+                           'next_due_back')
+
+    class Meta:
+        indexes = [
+            # Ordering of the book list and API
+            models.Index(fields=['title', 'id'], name='catalog_book_title_idx'),
+        ]
 
     def __str__(self):
         """String for representing the Model object."""
@@ -36,14 +62,40 @@ class Book(models.Model):
         """Returns the url to access a detail record for this book."""
         return reverse('book-detail', args=[str(self.id)])
 
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        # Only the UPDATE leaves them out: a save of deferred fields or of a
+        # deleted row (inserted again) goes on as usual.
+        if update_fields is None:
+            values = [value for value in values if value[0].name not in self.AVAILABILITY_FIELDS]
+        return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+
     def display_genre(self):
         """ Create a string for the Genre. This is required to display genre in Admin. """
         return ', '.join(genre.name for genre in self.genre.all()[:3])
 
     display_genre.short_description = 'Genre'
 
+    @property
+    def copies_total(self):
+        """ Number of copies of the book, whatever their status. """
+        return self.copies_available + self.copies_on_loan + self.copies_reserved + self.copies_maintenance
+
 import uuid # Required for unique book instances
 
+class BookInstanceQuerySet(models.QuerySet):
+    """ QuerySet of book copies, with the overdue test done in SQL. """
+
+    def overdue(self, today=None):
+        """ Copies on loan whose due date is past. """
+        return self.filter(status__exact='o', due_back__lt=today or date.today())
+
+    def with_overdue(self, today=None):
+        """ Annotate each copy with ``overdue``, like is_overdue but computed by the database. """
+        return self.annotate(overdue=models.ExpressionWrapper(
+            models.Q(due_back__lt=today or date.today()), output_field=models.BooleanField(),
+        ))
+
+
 class BookInstance(models.Model):
     """Model representing a specific copy of a book (i.e. that can be borrowed from the library)."""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, help_text='Unique ID for this particular book across whole library')
@@ -67,6 +119,18 @@ class BookInstance(models.Model):
     )
 
     borrower = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    last_reminded = models.DateField(null=True, blank=True, editable=False,
+                                     help_text='Date of the last overdue reminder sent to the borrower')
+
+    objects = BookInstanceQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        # Together with the refresh of the book's availability from post_save
+        # (catalog.availability); delete() already runs its signals in the
+        # deletion's transaction.
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(type(self), instance=self)):
+            super().save(*args, **kwargs)
 
     @property
     def is_overdue(self):
@@ -77,6 +141,15 @@ class BookInstance(models.Model):
     class Meta:
         ordering = ['due_back']
         permissions = (("can_mark_returned", "Set book as returned"),("can_view_borrowed", "Available for viewing who is borrowing"),)
+        indexes = [
+            models.Index(fields=['status'], name='catalog_bi_status_idx'),
+            # Loans of a user (LoanedBooksByUserListView)
+            models.Index(fields=['borrower', 'status', 'due_back'], name='catalog_bi_borrower_idx'),
+            # Books on loan by due date (BorrowedListView), only over the loans
+            models.Index(fields=['due_back', 'id'], name='catalog_bi_on_loan_idx', condition=models.Q(status='o')),
+            # Admin changelist of the copies, ordered and filtered by due date
+            models.Index(fields=['due_back', 'id'], name='catalog_bi_due_back_idx'),
+        ]
 
     def __str__(self):
         """String for representing the Model object."""
@@ -88,9 +161,13 @@ class Author(models.Model):
     last_name = models.CharField(max_length=100)
     date_of_birth = models.DateField(null=True, blank=True)
     date_of_death = models.DateField('died', null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ['last_name', 'first_name']
+        indexes = [
+            models.Index(fields=['last_name', 'first_name', 'id'], name='catalog_author_name_idx'),
+        ]
 
     def get_absolute_url(self):
         """Returns the url to access a particular author instance."""
@@ -100,3 +177,52 @@ class Author(models.Model):
         """String for representing the Model object."""
         return f'{self.last_name}, {self.first_name}'
 
+
+
+class SearchTerm(models.Model):
+    """
+    Inverted index entry used by catalog.search on databases without FTS5:
+    ``term`` appears in ``book`` with the given ranking weight.
+    """
+    term = models.CharField(max_length=100)
+    book = models.ForeignKey('Book', on_delete=models.CASCADE)
+    weight = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['term', 'book'], name='catalog_searchterm_term_idx'),
+        ]
+
+    def __str__(self):
+        """String for representing the Model object."""
+        return f'{self.term} ({self.book_id})'
+
+
+class ImportCheckpoint(models.Model):
+    """Progress of a catalog import, used by import_catalog to resume."""
+    source = models.CharField(max_length=255, unique=True, help_text='Name of the imported file')
+    position = models.PositiveBigIntegerField(default=0, help_text='Number of records already imported')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        """String for representing the Model object."""
+        return f'{self.source} ({self.position})'
+
+
+class OverdueRun(models.Model):
+    """A run of the overdue loan reminders (process_overdue_loans), with its timings."""
+    started_at = models.DateTimeField()
+    loans = models.PositiveIntegerField(default=0, help_text='Overdue loans processed')
+    emails = models.PositiveIntegerField(default=0, help_text='Reminder emails sent')
+    skipped = models.PositiveIntegerField(default=0, help_text='Loans whose borrower has no email address')
+    chunks = models.PositiveIntegerField(default=0)
+    query_seconds = models.FloatField(default=0, help_text='Time spent reading and marking the loans')
+    mail_seconds = models.FloatField(default=0, help_text='Time spent sending the emails')
+    total_seconds = models.FloatField(default=0)
+
+    class Meta:
+        ordering = ['-started_at']
+
+    def __str__(self):
+        """String for representing the Model object."""
+        return f'{self.started_at:%Y-%m-%d %H:%M} ({self.loans} loans, {self.emails} emails)'
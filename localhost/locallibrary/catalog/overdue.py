@@ -0,0 +1,79 @@
+"""
+Reminder emails for the overdue loans.
+
+process_overdue() walks the overdue loans not reminded today in chunks of
+``chunk_size`` (keyset pagination on the copy id), sends one email per
+borrower and chunk over a single connection of the configured email
+backend, and marks the chunk as reminded with one UPDATE. Running it again
+the same day sends nothing twice, so it can be scheduled as often as
+wanted. Each run is recorded as an OverdueRun with its timings.
+"""
+import datetime
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from catalog.models import BookInstance, OverdueRun
+
+SUBJECT = 'Overdue library books'
+
+
+def reminders(loans):
+    """ Return the reminder emails for a chunk of loans, and the number of loans skipped. """
+    by_borrower = {}
+    for loan in loans:
+        by_borrower.setdefault(loan.borrower_id, []).append(loan)
+    messages, skipped = [], 0
+    for borrower_loans in by_borrower.values():
+        borrower = borrower_loans[0].borrower
+        if borrower is None or not borrower.email:
+            skipped += len(borrower_loans)
+            continue
+        body = render_to_string('catalog/email/overdue_reminder.txt', {'borrower': borrower, 'loans': borrower_loans})
+        messages.append(EmailMessage(SUBJECT, body, settings.DEFAULT_FROM_EMAIL, [borrower.email]))
+    return messages, skipped
+
+
+def process_overdue(chunk_size=500, today=None, log=None):
+    """ Send the reminders of the loans overdue on ``today``, returning the OverdueRun. """
+    today = today or datetime.date.today()
+    log = log or (lambda message: None)
+    run = OverdueRun(started_at=timezone.now())
+    start = time.perf_counter()
+    pending = (BookInstance.objects.overdue(today)
+               .filter(Q(last_reminded__isnull=True) | Q(last_reminded__lt=today))
+               .select_related('book', 'borrower').order_by('id'))
+
+    with get_connection() as connection:
+        last_id = None
+        while True:
+            query_start = time.perf_counter()
+            chunk = pending if last_id is None else pending.filter(id__gt=last_id)
+            loans = list(chunk[:chunk_size])
+            run.query_seconds += time.perf_counter() - query_start
+            if not loans:
+                break
+            last_id = loans[-1].id
+
+            messages, skipped = reminders(loans)
+            mail_start = time.perf_counter()
+            sent = connection.send_messages(messages) if messages else 0
+            run.mail_seconds += time.perf_counter() - mail_start
+
+            query_start = time.perf_counter()
+            BookInstance.objects.filter(id__in=[loan.id for loan in loans]).update(last_reminded=today)
+            run.query_seconds += time.perf_counter() - query_start
+
+            run.chunks += 1
+            run.loans += len(loans)
+            run.emails += sent or 0
+            run.skipped += skipped
+            log(f'Chunk {run.chunks}: {len(loans)} loans, {sent or 0} emails')
+
+    run.total_seconds = time.perf_counter() - start
+    run.save()
+    return run
@@ -0,0 +1,186 @@
+"""
+Keyset (cursor) pagination for the catalog list views and the REST API.
+
+OFFSET pagination gets slower with every page and needs a COUNT(*) to know
+how many pages there are. Keyset pagination instead remembers the ordering
+values of the last row shown and asks for the rows after it, which costs the
+same on every page and never counts the table.
+
+The admin keeps its OFFSET pagination, but EstimatedCountPaginator spares
+it the COUNT(*) of a whole large table.
+"""
+import base64
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import F, Q, QuerySet
+from django.utils.functional import cached_property
+from django.http import Http404
+from rest_framework.pagination import CursorPagination
+
+
+def encode_cursor(direction, values):
+    """ Encode ``direction`` ('after' or 'before') and the key ``values``. """
+    data = json.dumps([direction, values], default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, fields):
+    """ Decode a cursor made by encode_cursor() for the model ``fields``. """
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, values = json.loads(data)
+        if direction not in ('after', 'before') or len(values) != len(fields):
+            raise ValueError
+        return direction, [
+            None if value is None else field.to_python(value)
+            for field, value in zip(fields, values)
+        ]
+    except Exception:
+        raise Http404('Invalid cursor')
+
+
+def keyset_filter(names, values, direction):
+    """
+    Build the Q object selecting the rows after (or before) ``values`` for an
+    ascending, nulls first ordering on ``names``.
+    """
+    condition = Q(pk__in=[])
+    equal = Q()
+    for name, value in zip(names, values):
+        if direction == 'after':
+            beyond = Q(**{f'{name}__isnull': False}) if value is None else Q(**{f'{name}__gt': value})
+        else:
+            beyond = Q(pk__in=[]) if value is None else Q(**{f'{name}__lt': value}) | Q(**{f'{name}__isnull': True})
+        condition |= equal & beyond
+        equal &= Q(**{f'{name}__isnull': True}) if value is None else Q(**{name: value})
+    return condition
+
+
+def keyset_ordering(names, reverse=False):
+    if reverse:
+        return [F(name).desc(nulls_last=True) for name in names]
+    return [F(name).asc(nulls_first=True) for name in names]
+
+
+class CursorPage:
+    """ A page of a keyset-paginated list, used in place of a Django Page. """
+    paginator = None
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginationMixin:
+    """
+    ListView mixin paginating with ``?cursor=`` on ``cursor_ordering``.
+
+    The ordering must end with a unique field. Requests using ``?page=N``
+    still get the usual OFFSET pagination so that old links keep working.
+    """
+    cursor_ordering = ('pk',)
+
+    def paginate_queryset(self, queryset, page_size):
+        names = self.cursor_ordering
+        if self.request.GET.get(self.page_kwarg) or self.kwargs.get(self.page_kwarg):
+            return super().paginate_queryset(queryset.order_by(*keyset_ordering(names)), page_size)
+
+        fields = [queryset.model._meta.pk if name == 'pk' else queryset.model._meta.get_field(name) for name in names]
+        cursor = self.request.GET.get('cursor')
+        direction, values = decode_cursor(cursor, fields) if cursor else ('after', None)
+
+        queryset = queryset.order_by(*keyset_ordering(names, reverse=direction == 'before'))
+        if values is not None:
+            queryset = queryset.filter(keyset_filter(names, values, direction))
+        rows = list(queryset[:page_size + 1])
+        more = len(rows) > page_size
+        rows = rows[:page_size]
+        if direction == 'before':
+            rows.reverse()
+
+        def key(row):
+            return [getattr(row, field.attname) for field in fields]
+
+        next_cursor = previous_cursor = None
+        if rows and (more or direction == 'before'):
+            next_cursor = encode_cursor('after', key(rows[-1]))
+        if rows and (values is not None and (more or direction == 'after')):
+            previous_cursor = encode_cursor('before', key(rows[0]))
+
+        page = CursorPage(rows, next_cursor, previous_cursor)
+        return (None, page, rows, page.has_other_pages())
+
+
+class CatalogCursorPagination(CursorPagination):
+    """ DRF cursor pagination ordered on the viewset's ``cursor_ordering``. """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        return tuple(getattr(view, 'cursor_ordering', self.ordering))
+
+
+def estimate_rows(model, using='default'):
+    """
+    Return the number of rows of ``model``'s table according to the
+    database statistics, or None when there are none: pg_class.reltuples on
+    PostgreSQL, sqlite_stat1 (written by ANALYZE) on SQLite.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'postgresql':
+        sql, params = 'SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [connection.ops.quote_name(table)]
+    elif connection.vendor == 'sqlite':
+        sql, params = 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table]
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+    except DatabaseError:
+        # SQLite without ANALYZE: no sqlite_stat1 table
+        return None
+    if row is None:
+        return None
+    # The first number of a sqlite_stat1 row is the number of rows
+    estimate = int(float(str(row[0]).split()[0]))
+    # PostgreSQL: -1 for a table never analyzed
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator counting an unfiltered queryset from the database statistics
+    when they put it above ``CATALOG_ESTIMATED_COUNT_THRESHOLD`` rows, the
+    exact count not being worth a full scan. Filtered querysets are counted.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where:
+            estimate = estimate_rows(queryset.model, queryset.db)
+            if estimate is not None and estimate >= settings.CATALOG_ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
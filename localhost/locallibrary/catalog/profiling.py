@@ -0,0 +1,218 @@
+"""
+In-process request profiling, aggregated per URL name.
+
+catalog.middleware.ProfilingMiddleware counts every request by URL name
+(``view_name`` of the resolver match: ``books``, ``api-book-list``,
+``admin:catalog_book_changelist``...) and, for a random sample of
+``CATALOG_PROFILING_SAMPLE_RATE`` of them, observes
+
+    duration_seconds    wall time of the request
+    sql_queries         queries run, on every database
+    sql_seconds         time spent in those queries
+    template_seconds    time spent rendering templates
+    response_bytes      size of the response (0 when streamed)
+
+into fixed-bucket histograms, so the memory used doesn't grow with the
+traffic. Templates are timed by ProfilingDjangoTemplates, the template
+backend of the settings, which times the top-level templates whether they
+are rendered by render() or by a TemplateResponse.
+
+The figures are kept per process: with several workers, each page or
+scrape shows the worker that served it (the ``pid`` label tells them
+apart). They are shown on /catalog/profiling/ (staff) and exported in the
+Prometheus text format on /catalog/metrics/.
+
+With ``CATALOG_PROFILING_DUMP_DIR`` set, the sampled requests run under
+cProfile and those slower than ``CATALOG_PROFILING_SLOW_SECONDS`` are
+dumped there (``python -m pstats <file>`` or snakeviz to read them). One
+request at a time is profiled per process.
+"""
+import bisect
+import contextvars
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates, Template
+
+# Upper bounds of the histogram buckets, the last one being +Inf.
+BUCKETS = {
+    'duration_seconds': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    'sql_queries': (1, 2, 5, 10, 20, 50, 100, 200, 500),
+    'sql_seconds': (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+    'template_seconds': (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+    'response_bytes': (256, 1024, 4096, 16384, 65536, 262144, 1048576),
+}
+
+# Timings of the sampled request being served, None otherwise.
+_current = contextvars.ContextVar('catalog_profiling_request', default=None)
+
+
+class Histogram:
+    """ Counts of observations per bucket, as in Prometheus (not cumulative here). """
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0
+
+    def quantile(self, q):
+        """ Estimate the ``q`` (0..1) quantile, interpolating within its bucket. """
+        if not self.count:
+            return 0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.bounds[index - 1] if index else 0
+                if index == len(self.bounds):
+                    # +Inf bucket: the best we know is its lower bound
+                    return lower
+                return lower + (self.bounds[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+
+class ViewStats:
+    def __init__(self):
+        self.requests = 0
+        self.histograms = {name: Histogram(bounds) for name, bounds in BUCKETS.items()}
+
+
+class Registry:
+    """ Per URL name statistics of this process. """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def count(self, view_name):
+        with self.lock:
+            self._stats(view_name).requests += 1
+
+    def observe(self, view_name, **values):
+        with self.lock:
+            histograms = self._stats(view_name).histograms
+            for name, value in values.items():
+                histograms[name].observe(value)
+
+    def _stats(self, view_name):
+        stats = self.views.get(view_name)
+        if stats is None:
+            stats = self.views[view_name] = ViewStats()
+        return stats
+
+    def snapshot(self):
+        """ Return a copy of {view name: ViewStats}, sorted by name. """
+        with self.lock:
+            copies = {}
+            for view_name, stats in sorted(self.views.items()):
+                copy = copies[view_name] = ViewStats()
+                copy.requests = stats.requests
+                for name, histogram in stats.histograms.items():
+                    copied = copy.histograms[name]
+                    copied.counts, copied.sum, copied.count = list(histogram.counts), histogram.sum, histogram.count
+            return copies
+
+    def reset(self):
+        with self.lock:
+            self.views = {}
+
+
+registry = Registry()
+
+
+def sample_rate():
+    return getattr(settings, 'CATALOG_PROFILING_SAMPLE_RATE', 0.0)
+
+
+class Timings:
+    """ What a sampled request spent in SQL and templates. """
+
+    def __init__(self):
+        self.sql_queries = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """ Execute wrapper of the connections (connection.execute_wrapper). """
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_seconds += time.perf_counter() - start
+            self.sql_queries += 1
+
+
+def start_request():
+    timings = Timings()
+    return timings, _current.set(timings)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+class ProfilingTemplate(Template):
+    def render(self, context=None, request=None):
+        timings = _current.get()
+        if timings is None:
+            return super().render(context, request)
+        # A template rendered while rendering another is already being timed
+        timings.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timings.template_depth -= 1
+            if not timings.template_depth:
+                timings.template_seconds += time.perf_counter() - start
+
+
+class ProfilingDjangoTemplates(DjangoTemplates):
+    """ The Django template engine, timing the renders of the sampled requests. """
+
+    def from_string(self, template_code):
+        return ProfilingTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return ProfilingTemplate(template.template, template.backend)
+
+
+def prometheus(snapshot=None):
+    """ Return the statistics in the Prometheus text exposition format. """
+    snapshot = registry.snapshot() if snapshot is None else snapshot
+    pid = os.getpid()
+    lines = [
+        '# HELP catalog_requests_total Requests served, sampled or not.',
+        '# TYPE catalog_requests_total counter',
+    ]
+    for view_name, stats in snapshot.items():
+        lines.append(f'catalog_requests_total{{view="{view_name}",pid="{pid}"}} {stats.requests}')
+    for name in BUCKETS:
+        metric = f'catalog_request_{name}'
+        lines += [f'# HELP {metric} {name.replace("_", " ").capitalize()} of the sampled requests.',
+                  f'# TYPE {metric} histogram']
+        for view_name, stats in snapshot.items():
+            histogram = stats.histograms[name]
+            labels = f'view="{view_name}",pid="{pid}"'
+            cumulative = 0
+            for bound, count in zip((*histogram.bounds, '+Inf'), histogram.counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{{labels}}} {histogram.sum:g}')
+            lines.append(f'{metric}_count{{{labels}}} {histogram.count}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,9 @@
+from rest_framework.renderers import JSONRenderer
+
+
+class CompactJSONRenderer(JSONRenderer):
+    """
+    JSON selected with ``?format=compact``: views render related objects as
+    integer ids instead of hyperlinks (see CompactFormatMixin).
+    """
+    format = 'compact'
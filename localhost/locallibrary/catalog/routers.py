@@ -0,0 +1,105 @@
+"""
+Routing of the catalog page reads to read replicas.
+
+The database aliases listed in ``CATALOG_REPLICAS`` are replicas of
+``default``. Outside a request (commands, tests, shells) everything uses
+``default``; within a request, catalog.middleware.ReplicaMiddleware sends
+the reads to a random replica when the view opted in:
+
+  - function views decorated with @replica_reads,
+  - class-based views with ``replica_reads = True``,
+  - DRF viewsets for the actions of ``replica_actions``,
+
+only for GET and HEAD, and never in the ``CATALOG_REPLICA_PIN_SECONDS``
+following a write of the same session, which must read its own writes.
+Writes always go to ``default``, as do the reads of sessions, written on
+most requests, and of the database cache (settings.CACHES), whose writes do
+not pin the session.
+
+The cached fragments and ETags (catalog.fragments, catalog.versions) are
+keyed by versions bumped on the primary: a fragment rendered from a
+replica is only kept for the pin period, by which time the replica is
+expected to have caught up.
+"""
+import contextvars
+import random
+
+from django.conf import settings
+
+# Applications always read from the primary; django_cache is the table of
+# the DatabaseCache.
+PRIMARY_APPS = {'sessions', 'django_cache'}
+
+# {'replica': bool, 'wrote': bool} for the current request, None outside requests.
+_request = contextvars.ContextVar('catalog_db_request', default=None)
+
+
+def replicas():
+    return list(getattr(settings, 'CATALOG_REPLICAS', ()))
+
+
+def replica_reads(view_func):
+    """ Mark a view function as safe to serve from a replica. """
+    view_func.replica_reads = True
+    return view_func
+
+
+def wants_replica(view_func, method):
+    """ Whether the view serving ``method`` opted in to replica reads. """
+    if getattr(view_func, 'replica_reads', False):
+        return True
+    view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    if getattr(view_class, 'replica_reads', False):
+        return True
+    actions = getattr(view_func, 'actions', None) or {}
+    # DRF serves HEAD with the GET action unless told otherwise
+    action = actions.get(method.lower()) or (actions.get('get') if method == 'HEAD' else None)
+    return action in getattr(view_class, 'replica_actions', ())
+
+
+def start_request():
+    return _request.set({'replica': False, 'wrote': False})
+
+
+def end_request(token):
+    """ Forget the current request, returning whether it wrote to the database. """
+    state = _request.get()
+    _request.reset(token)
+    return bool(state and state['wrote'])
+
+
+def use_replica():
+    state = _request.get()
+    if state is not None:
+        state['replica'] = True
+
+
+def reading_from_replica():
+    state = _request.get()
+    return bool(state and state['replica'] and replicas())
+
+
+class ReplicaRouter:
+    """ Database router of DATABASE_ROUTERS, see the module docstring. """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in PRIMARY_APPS and reading_from_replica():
+            return random.choice(replicas())
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        state = _request.get()
+        if state is not None and model._meta.app_label not in PRIMARY_APPS:
+            state['wrote'] = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the same rows as the primary
+        aliases = {'default', *replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replicas get the schema from the primary
+        return db not in replicas()
@@ -0,0 +1,230 @@
+"""
+Full-text search over books, their authors and genres.
+
+On SQLite the books are indexed in an FTS5 virtual table (catalog_book_fts,
+created by migration 0006) whose rowid is the book id, and results are
+ranked with bm25(). Other databases use SearchTerm, a plain inverted index
+of (term, book, weight) rows, ranked by the summed weights of the matched
+terms.
+
+Both are kept in sync from model signals and catalog.signals.bulk_changed;
+``manage.py rebuild_search_index`` rebuilds them from scratch.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Count, Sum
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+
+from catalog import signals
+from catalog.models import Author, Book, Genre, SearchTerm
+
+FTS_TABLE = 'catalog_book_fts'
+
+# Weight of a match in each indexed column, in the order of the FTS columns.
+WEIGHTS = {
+    'title': 4,
+    'summary': 1,
+    'isbn': 4,
+    'authors': 3,
+    'genres': 2,
+}
+
+TOKEN_RE = re.compile(r'\w+')
+
+# SearchTerm.term is a CharField, longer tokens are cut.
+MAX_TERM_LENGTH = 100
+
+
+def tokenize(text):
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall(text.lower())]
+
+
+# Whether the FTS table exists, by database name.
+_fts_available = {}
+
+
+def uses_fts():
+    """ True when the FTS5 table exists on the database in use. """
+    if connection.vendor != 'sqlite':
+        return False
+    name = connection.settings_dict['NAME']
+    if name not in _fts_available:
+        _fts_available[name] = FTS_TABLE in connection.introspection.table_names()
+    return _fts_available[name]
+
+
+def book_document(book):
+    """ Return the indexed text of a book, by FTS column. """
+    return {
+        'title': book.title,
+        'summary': book.summary,
+        'isbn': book.isbn,
+        'authors': f'{book.author.first_name} {book.author.last_name}' if book.author else '',
+        'genres': ' '.join(genre.name for genre in book.genre.all()),
+    }
+
+
+def index_books(book_ids):
+    """ (Re)index the given books, removing those that no longer exist. """
+    book_ids = list(book_ids)
+    if not book_ids:
+        return
+    books = Book.objects.filter(pk__in=book_ids).select_related('author').prefetch_related('genre')
+    if uses_fts():
+        with connection.cursor() as cursor:
+            placeholders = ', '.join(['%s'] * len(book_ids))
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', book_ids)
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, {", ".join(WEIGHTS)}) VALUES (%s{", %s" * len(WEIGHTS)})',
+                [[book.pk, *book_document(book).values()] for book in books],
+            )
+    else:
+        SearchTerm.objects.filter(book_id__in=book_ids).delete()
+        terms = []
+        for book in books:
+            weights = {}
+            for column, text in book_document(book).items():
+                for term in tokenize(text):
+                    weights[term] = weights.get(term, 0) + WEIGHTS[column]
+            terms += [SearchTerm(term=term, book=book, weight=weight) for term, weight in weights.items()]
+        SearchTerm.objects.bulk_create(terms, batch_size=1000)
+
+
+def rebuild_index(batch_size=1000):
+    """ Rebuild the whole search index, returning the number of books. """
+    if uses_fts():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+    else:
+        SearchTerm.objects.all().delete()
+    book_ids = list(Book.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(book_ids), batch_size):
+        index_books(book_ids[start:start + batch_size])
+    return len(book_ids)
+
+
+class SearchResults:
+    """
+    Lazily evaluated, ranked search results.
+
+    Supports count() and slicing, so it can be handed to a Django Paginator
+    (and so to ListView and DRF pagination); slices return Book objects.
+    """
+    model = Book
+
+    def __init__(self, query):
+        self.query = query
+        self.terms = tokenize(query)
+        self._count = None
+
+    def _fts_match(self):
+        # Every term must match, the last one as a prefix (search as you type).
+        quoted = [f'"{term}"' for term in self.terms]
+        quoted[-1] += '*'
+        return ' AND '.join(quoted)
+
+    def _ranked_ids(self, offset, limit):
+        if not self.terms:
+            return []
+        if uses_fts():
+            weights = ', '.join(str(float(weight)) for weight in WEIGHTS.values())
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                    f'ORDER BY bm25({FTS_TABLE}, {weights}), rowid LIMIT %s OFFSET %s',
+                    [self._fts_match(), limit, offset],
+                )
+                return [row[0] for row in cursor.fetchall()]
+        return list(self._matching_terms().order_by('-score', 'book').values_list('book', flat=True)[offset:offset + limit])
+
+    def _matching_terms(self):
+        terms = set(self.terms)
+        return (SearchTerm.objects.filter(term__in=terms).values('book')
+                .annotate(score=Sum('weight'), matched=Count('term'))
+                .filter(matched=len(terms)))
+
+    def count(self):
+        if self._count is None:
+            if not self.terms:
+                self._count = 0
+            elif uses_fts():
+                with connection.cursor() as cursor:
+                    cursor.execute(f'SELECT COUNT(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [self._fts_match()])
+                    self._count = cursor.fetchone()[0]
+            else:
+                self._count = self._matching_terms().count()
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self[key:key + 1][0]
+        start = key.start or 0
+        stop = self.count() if key.stop is None else key.stop
+        ids = self._ranked_ids(start, max(0, stop - start))
+        books = Book.objects.select_related('author').in_bulk(ids)
+        return [books[pk] for pk in ids if pk in books]
+
+
+def search(query):
+    """ Return the books matching ``query``, best matches first. """
+    return SearchResults(query)
+
+
+def book_saved(sender, instance, **kwargs):
+    index_books([instance.pk])
+
+
+def book_deleted(sender, instance, **kwargs):
+    index_books([instance.pk])
+
+
+def book_genre_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # Remember which books lose the genre, pk_set is not given for clears.
+        instance._search_book_ids = list(instance.book_set.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            index_books([instance.pk])
+        elif action == 'post_clear':
+            index_books(getattr(instance, '_search_book_ids', []))
+        else:
+            index_books(pk_set)
+
+
+def remember_books(sender, instance, **kwargs):
+    """ Remember the books of an author or genre about to be deleted. """
+    instance._search_book_ids = list(instance.book_set.values_list('pk', flat=True))
+
+
+def related_changed(sender, instance, created=False, **kwargs):
+    """ Reindex the books of a saved or deleted author or genre. """
+    if created:
+        return
+    book_ids = getattr(instance, '_search_book_ids', None)
+    if book_ids is None:
+        book_ids = instance.book_set.values_list('pk', flat=True)
+    index_books(book_ids)
+
+
+def bulk_changed(sender, pks, created=False, **kwargs):
+    if sender is Book:
+        index_books(pks)
+    elif sender in (Author, Genre) and not created:
+        # New authors and genres only have books sent as created too.
+        lookup = 'author__in' if sender is Author else 'genre__in'
+        index_books(Book.objects.filter(**{lookup: pks}).values_list('pk', flat=True).distinct())
+
+
+def connect_signals():
+    post_save.connect(book_saved, sender=Book, dispatch_uid='search_book_saved')
+    post_delete.connect(book_deleted, sender=Book, dispatch_uid='search_book_deleted')
+    m2m_changed.connect(book_genre_changed, sender=Book.genre.through, dispatch_uid='search_book_genre')
+    for model in (Author, Genre):
+        pre_delete.connect(remember_books, sender=model, dispatch_uid=f'search_{model.__name__}_pre_delete')
+        post_save.connect(related_changed, sender=model, dispatch_uid=f'search_{model.__name__}_saved')
+        post_delete.connect(related_changed, sender=model, dispatch_uid=f'search_{model.__name__}_deleted')
+    signals.bulk_changed.connect(bulk_changed, dispatch_uid='search_bulk_changed')
@@ -1,6 +1,40 @@
+import datetime
+
+from django.conf import settings
 from django.contrib.auth.models import User, Group
+from django.db import transaction
+from django.utils import timezone
+from catalog import loans
+from catalog.bulk import bulk_create_with_pks
 from catalog.models import Book, Genre, Author
+from catalog.signals import bulk_changed
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def requested_fields(request):
+    """ Return the set of field names given by ``?fields=``, or None. """
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    fields = request.query_params.get('fields')
+    if not fields:
+        return None
+    return {name.strip() for name in fields.split(',') if name.strip()}
+
+
+class SparseFieldsMixin:
+    """ Only serializes the fields listed in ``?fields=``, when given. """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        wanted = requested_fields(self.context.get('request'))
+        if wanted:
+            for name in set(self.fields) - wanted:
+                self.fields.pop(name)
+
+
+# Read-only copy availability of a book (see catalog.availability).
+AVAILABILITY_FIELDS = ['copies_available', 'copies_on_loan', 'copies_reserved', 'copies_maintenance', 'next_due_back']
 
 
 class UserSerializer(serializers.HyperlinkedModelSerializer):
@@ -14,17 +48,212 @@ class GroupSerializer(serializers.HyperlinkedModelSerializer):
         model = Group
         fields = ['url', 'name']
 
-class BookSerializer(serializers.HyperlinkedModelSerializer):
+class BookSerializer(SparseFieldsMixin, serializers.HyperlinkedModelSerializer):
     class Meta:
         model = Book
-        fields = ['url', 'title', 'author', 'summary', 'isbn', 'genre']
+        fields = ['url', 'title', 'author', 'summary', 'isbn', 'genre', *AVAILABILITY_FIELDS]
+        extra_kwargs = {
+            'url': {'view_name': 'api-book-detail'},
+            'author': {'view_name': 'api-author-detail'},
+            'genre': {'view_name': 'api-genre-detail'},
+        }
 
-class GenreSerializer(serializers.HyperlinkedModelSerializer):
+class GenreSerializer(SparseFieldsMixin, serializers.HyperlinkedModelSerializer):
     class Meta:
         model = Genre
         fields = ['url', 'name']
+        extra_kwargs = {'url': {'view_name': 'api-genre-detail'}}
 
-class AuthorSerializer(serializers.HyperlinkedModelSerializer):
+class AuthorSerializer(SparseFieldsMixin, serializers.HyperlinkedModelSerializer):
     class Meta:
         model = Author
         fields = ['url', 'first_name', 'last_name', 'date_of_birth', 'date_of_death']
+        extra_kwargs = {'url': {'view_name': 'api-author-detail'}}
+
+
+class IdListField(serializers.ListField):
+    """ Many-to-many relation written and shown as a list of primary keys. """
+    child = serializers.IntegerField()
+
+    def to_representation(self, value):
+        return [item.pk for item in value.all()]
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """
+    Validates a whole batch in one pass and writes it with bulk_create() or
+    bulk_update().
+
+    The ids given for the relations named in the child's ``bulk_relations``
+    are checked with one query per relation for the whole batch. Errors are
+    reported per item, in the order of the items, and nothing is written
+    unless every item is valid.
+    """
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            raise serializers.ValidationError({'non_field_errors': ['Expected a list of items.']})
+        if not data:
+            raise serializers.ValidationError({'non_field_errors': ['Expected at least one item.']})
+        max_items = settings.CATALOG_BULK_MAX_ITEMS
+        if len(data) > max_items:
+            raise serializers.ValidationError({'non_field_errors': [f'At most {max_items} items per request.']})
+
+        validated, errors = [], []
+        for item in data:
+            try:
+                validated.append(self.child.run_validation(item))
+                errors.append({})
+            except serializers.ValidationError as exc:
+                validated.append(None)
+                errors.append(exc.detail)
+
+        if self.instance is not None:
+            self.check_ids(validated, errors)
+        self.check_relations(validated, errors)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return validated
+
+    def check_ids(self, validated, errors):
+        instances = {instance.pk for instance in self.instance}
+        seen = set()
+        for attrs, item_errors in zip(validated, errors):
+            if attrs is None:
+                continue
+            pk = attrs.get('id')
+            if pk is None:
+                item_errors['id'] = ['This field is required.']
+            elif pk not in instances:
+                item_errors['id'] = [f'Invalid pk "{pk}" - object does not exist.']
+            elif pk in seen:
+                item_errors['id'] = [f'Duplicate pk "{pk}".']
+            seen.add(pk)
+
+    def check_relations(self, validated, errors):
+        for field_name, model in self.child.bulk_relations.items():
+            name = self.child.fields[field_name].source
+            wanted = set()
+            for attrs in validated:
+                value = attrs.get(name) if attrs else None
+                if isinstance(value, list):
+                    wanted.update(value)
+                elif value is not None:
+                    wanted.add(value)
+            existing = set(model.objects.filter(pk__in=wanted).values_list('pk', flat=True))
+            for attrs, item_errors in zip(validated, errors):
+                value = attrs.get(name) if attrs else None
+                values = value if isinstance(value, list) else [value]
+                missing = [pk for pk in values if pk is not None and pk not in existing]
+                if missing:
+                    item_errors[field_name] = [f'Invalid pk "{pk}" - object does not exist.' for pk in missing]
+
+    def many_to_many(self):
+        model = self.child.Meta.model
+        sources = [self.child.fields[field_name].source for field_name in self.child.bulk_relations]
+        return [name for name in sources if model._meta.get_field(name).many_to_many]
+
+    def set_many_to_many(self, objs, validated_data, replace):
+        for name in self.many_to_many():
+            field = self.child.Meta.model._meta.get_field(name)
+            through = field.remote_field.through
+            source = field.m2m_field_name() + '_id'
+            target = field.m2m_reverse_field_name() + '_id'
+            changed = [(obj, attrs[name]) for obj, attrs in zip(objs, validated_data) if name in attrs]
+            if replace:
+                through.objects.filter(**{f'{source}__in': [obj.pk for obj, ids in changed]}).delete()
+            through.objects.bulk_create([
+                through(**{source: obj.pk, target: pk}) for obj, ids in changed for pk in set(ids)
+            ])
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        m2m = self.many_to_many()
+        with transaction.atomic():
+            objs = bulk_create_with_pks(model, [
+                model(**{key: value for key, value in attrs.items() if key not in m2m and key != 'id'})
+                for attrs in validated_data
+            ])
+            self.set_many_to_many(objs, validated_data, replace=False)
+            transaction.on_commit(lambda: bulk_changed.send(sender=model, pks=[obj.pk for obj in objs], created=True))
+        return objs
+
+    def update(self, instances, validated_data):
+        model = self.child.Meta.model
+        m2m = self.many_to_many()
+        by_pk = {instance.pk: instance for instance in instances}
+        objs, fields = [], {'updated_at'}
+        now = timezone.now()
+        for attrs in validated_data:
+            obj = by_pk[attrs['id']]
+            for key, value in attrs.items():
+                if key not in m2m and key != 'id':
+                    setattr(obj, key, value)
+                    fields.add(key)
+            obj.updated_at = now
+            objs.append(obj)
+        with transaction.atomic():
+            model.objects.bulk_update(objs, sorted(fields), batch_size=500)
+            self.set_many_to_many(objs, validated_data, replace=True)
+            transaction.on_commit(lambda: bulk_changed.send(sender=model, pks=[obj.pk for obj in objs]))
+        return objs
+
+
+class BookBulkSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Book with the author and genres given by id: written by the bulk
+    endpoints and read with ``?format=compact``.
+    """
+    id = serializers.IntegerField(required=False)
+    author = serializers.IntegerField(source='author_id', allow_null=True, required=False)
+    genre = IdListField(required=False)
+
+    bulk_relations = {'author': Author, 'genre': Genre}
+
+    class Meta:
+        model = Book
+        fields = ['id', 'title', 'author', 'summary', 'isbn', 'genre', *AVAILABILITY_FIELDS]
+        list_serializer_class = BulkListSerializer
+
+
+class GenreBulkSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
+
+    bulk_relations = {}
+
+    class Meta:
+        model = Genre
+        fields = ['id', 'name']
+        list_serializer_class = BulkListSerializer
+
+
+class AuthorBulkSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
+
+    bulk_relations = {}
+
+    class Meta:
+        model = Author
+        fields = ['id', 'first_name', 'last_name', 'date_of_birth', 'date_of_death']
+        list_serializer_class = BulkListSerializer
+
+
+class LoanSerializer(serializers.Serializer):
+    """ Copies to check out, return, renew or reserve, and for whom. """
+    copies = serializers.ListField(child=serializers.UUIDField(), allow_empty=False)
+    borrower = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), required=False)
+    due_back = serializers.DateField(required=False)
+
+    def validate_copies(self, value):
+        max_items = settings.CATALOG_BULK_MAX_ITEMS
+        if len(value) > max_items:
+            raise serializers.ValidationError(f'At most {max_items} copies per request.')
+        return value
+
+    def validate_due_back(self, value):
+        today = datetime.date.today()
+        if value < today:
+            raise serializers.ValidationError('Invalid date - in the past.')
+        if value > today + loans.MAX_LOAN_PERIOD:
+            raise serializers.ValidationError('Invalid date - more than 4 weeks ahead.')
+        return value
@@ -0,0 +1,13 @@
+"""
+Signals of the catalog app.
+
+``bulk_changed`` is sent after rows were written without the model signals,
+e.g. with ``bulk_create()``, ``bulk_update()`` or ``QuerySet.update()``, so
+that the caches and indexes kept from post_save/post_delete can catch up.
+Its ``sender`` is the model class, ``pks`` the primary keys of the created,
+changed or deleted rows and ``created`` is True when the rows were only
+inserted.
+"""
+from django.dispatch import Signal
+
+bulk_changed = Signal()
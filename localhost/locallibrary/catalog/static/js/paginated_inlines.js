@@ -0,0 +1,54 @@
+/*
+ * Paginated admin inlines (catalog.inlines): "Show more" appends the rows of
+ * the next page, and the rows left untouched are not submitted.
+ */
+'use strict';
+{
+    const $ = django.jQuery;
+
+    function setUp(pager) {
+        const group = $('#' + pager.data('prefix') + '-group');
+        const form = group.closest('form');
+
+        // Rows coming back from a failed save were all changed
+        if (pager.data('bound')) {
+            group.find('.has_original').addClass('changed-row');
+        }
+        group.on('input change', ':input', function() {
+            $(this).closest('.has_original').addClass('changed-row');
+        });
+        form.on('submit', function() {
+            group.find('.has_original').not('.changed-row').find(':input').prop('disabled', true);
+        });
+
+        pager.find('button').on('click', function() {
+            const button = $(this).prop('disabled', true);
+            $.getJSON(pager.data('url'), {page: pager.data('next-page')}).done(function(data) {
+                const rows = $($.parseHTML(data.html)).find('.has_original');
+                rows.each(function() {
+                    // Unique ids, from the form index of the row
+                    const name = $(this).find(':input[name]').first().attr('name') || '';
+                    this.id = name.split('-').slice(0, -1).join('-');
+                });
+                group.find('.has_original').last().after(rows);
+                if ($.fn.djangoAdminSelect2) {
+                    rows.find('.admin-autocomplete').djangoAdminSelect2();
+                }
+                if (data.has_more) {
+                    pager.data('next-page', data.next_page);
+                    button.prop('disabled', false);
+                } else {
+                    pager.remove();
+                }
+            }).fail(function() {
+                button.prop('disabled', false);
+            });
+        });
+    }
+
+    $(function() {
+        $('.paginated-inline').each(function() {
+            setUp($(this));
+        });
+    });
+}
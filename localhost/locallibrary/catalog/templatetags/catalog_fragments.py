@@ -0,0 +1,43 @@
+from django import template
+
+from catalog.fragments import get_or_render
+
+register = template.Library()
+
+
+class FragmentNode(template.Node):
+    def __init__(self, nodelist, name, pk, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.pk = pk
+        self.vary_on = vary_on
+
+    def render(self, context):
+        vary_on = [value.resolve(context) for value in self.vary_on]
+        return get_or_render(
+            self.name.resolve(context), self.pk.resolve(context), vary_on,
+            lambda: self.nodelist.render(context),
+        )
+
+
+@register.tag
+def fragment(parser, token):
+    """
+    Cache the enclosed part of the template by object and version::
+
+        {% load catalog_fragments %}
+        {% fragment "book-copies" book.pk request.GET.page %}
+            ...
+        {% endfragment %}
+
+    The first argument names the fragment (see catalog.fragments), the
+    second is the primary key of the object, and the others are values the
+    content varies on.
+    """
+    nodelist = parser.parse(('endfragment',))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' takes at least two arguments (name and object id).")
+    name, pk, *vary_on = [parser.compile_filter(bit) for bit in bits[1:]]
+    return FragmentNode(nodelist, name, pk, vary_on)
@@ -0,0 +1,195 @@
+import json
+from unittest import mock
+
+from django.contrib.auth.models import Permission, User
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from catalog.models import Author, Book, Genre
+from catalog.search import search
+from catalog.tests.utils import CaptureQueriesContext
+
+class AuthorAPITest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        for author_id in range(45):
+            Author.objects.create(first_name=f'Christian {author_id}', last_name='Surname')
+
+    def setUp(self):
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+
+    def test_list_is_cursor_paginated(self):
+        url = reverse('api-author-list')
+        names = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            names += [author['first_name'] for author in response.data['results']]
+            url = response.data['next']
+        expected = Author.objects.order_by('last_name', 'first_name', 'id').values_list('first_name', flat=True)
+        self.assertEqual(names, list(expected))
+
+    def test_page_size_query_param(self):
+        response = self.client.get(reverse('api-author-list') + '?page_size=5')
+        self.assertEqual(len(response.data['results']), 5)
+
+
+class BulkAPITest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='librarian1', password='2HJ1vRV0Z&3iD')
+        cls.user.user_permissions.set(Permission.objects.filter(
+            codename__in=['add_book', 'change_book', 'delete_book', 'add_author']))
+        cls.author = Author.objects.create(first_name='John', last_name='Smith')
+        cls.genres = [Genre.objects.create(name=name) for name in ('Fantasy', 'Science Fiction')]
+
+    def setUp(self):
+        self.client.login(username='librarian1', password='2HJ1vRV0Z&3iD')
+        self.url = reverse('api-book-bulk')
+
+    def send(self, method, data):
+        return getattr(self.client, method)(self.url, json.dumps(data), content_type='application/json')
+
+    def test_create_in_constant_queries(self):
+        def items(count):
+            return [
+                {'title': f'Book {i}', 'summary': 'Summary', 'isbn': f'{i:013}',
+                 'author': self.author.pk, 'genre': [genre.pk for genre in self.genres]}
+                for i in range(count)
+            ]
+
+        # Warm up the cached permission sets first
+        self.assertEqual(self.send('post', items(1)).status_code, 201)
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.send('post', items(2)).status_code, 201)
+        with CaptureQueriesContext(connection) as large:
+            response = self.send('post', items(50))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(large), len(small))
+        self.assertEqual(Book.objects.count(), 53)
+        self.assertEqual(response.data[0]['author'], self.author.pk)
+        self.assertEqual(sorted(response.data[0]['genre']), [genre.pk for genre in self.genres])
+        self.assertEqual(Book.objects.get(pk=response.data[-1]['id']).title, 'Book 49')
+
+    def test_invalid_batch_writes_nothing(self):
+        response = self.send('post', [
+            {'title': 'Good', 'summary': 'Summary', 'isbn': '1', 'author': self.author.pk},
+            {'summary': 'No title', 'isbn': '2'},
+            {'title': 'Bad author', 'summary': 'Summary', 'isbn': '3', 'author': 999, 'genre': [998]},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('title', response.data[1])
+        self.assertIn('author', response.data[2])
+        self.assertIn('genre', response.data[2])
+        self.assertFalse(Book.objects.exists())
+
+    def test_ids_allocated_again_after_a_concurrent_insert(self):
+        book = Book.objects.create(title='Concurrent', summary='Summary', isbn='0')
+        # The first allocation reads the maximum before the concurrent insert
+        with mock.patch('catalog.bulk._last_pk', side_effect=[0, book.pk]):
+            response = self.send('post', [{'title': 'Book', 'summary': 'Summary', 'isbn': '1'}])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data[0]['id'], book.pk + 1)
+        self.assertEqual(Book.objects.count(), 2)
+
+    def test_conflict(self):
+        Book.objects.create(title='Concurrent', summary='Summary', isbn='0')
+        with mock.patch('catalog.bulk._last_pk', return_value=0):
+            response = self.send('post', [{'title': 'Book', 'summary': 'Summary', 'isbn': '1'}])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Book.objects.count(), 1)
+
+    def test_update(self):
+        books = [Book.objects.create(title=f'Book {i}', summary='Summary', isbn=str(i)) for i in range(3)]
+        books[0].genre.set(self.genres)
+        response = self.send('patch', [
+            {'id': books[0].pk, 'title': 'Renamed', 'genre': [self.genres[0].pk]},
+            {'id': books[1].pk, 'author': self.author.pk},
+        ])
+        self.assertEqual(response.status_code, 200)
+        books[0].refresh_from_db()
+        books[1].refresh_from_db()
+        self.assertEqual(books[0].title, 'Renamed')
+        self.assertEqual(list(books[0].genre.all()), [self.genres[0]])
+        self.assertEqual(books[1].author, self.author)
+        self.assertEqual(books[1].title, 'Book 1')
+
+    def test_update_requires_existing_ids(self):
+        book = Book.objects.create(title='Book', summary='Summary', isbn='1')
+        response = self.send('patch', [{'id': book.pk, 'title': 'Renamed'}, {'title': 'No id'}, {'id': 999}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('id', response.data[1])
+        self.assertIn('id', response.data[2])
+        book.refresh_from_db()
+        self.assertEqual(book.title, 'Book')
+
+    def test_delete(self):
+        books = [Book.objects.create(title=f'Book {i}', summary='Summary', isbn=str(i)) for i in range(3)]
+        self.assertEqual(self.send('delete', [books[0].pk, 999]).status_code, 400)
+        self.assertEqual(Book.objects.count(), 3)
+        self.assertEqual(self.send('delete', [books[0].pk, books[1].pk]).status_code, 204)
+        self.assertEqual(list(Book.objects.all()), [books[2]])
+
+    def test_batch_size_limit(self):
+        with self.settings(CATALOG_BULK_MAX_ITEMS=2):
+            response = self.send('post', [{'title': 'Book', 'summary': 'Summary', 'isbn': '1'}] * 3)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Book.objects.exists())
+
+    def test_requires_model_permissions(self):
+        response = self.client.post(reverse('api-genre-bulk'), json.dumps([{'name': 'Horror'}]),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_search_index_follows_bulk_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.send('post', [{'title': 'Silmarillion', 'summary': 'Summary', 'isbn': '1'}])
+        self.assertEqual([book.pk for book in search('silmarillion')[:10]], [response.data[0]['id']])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.send('patch', [{'id': response.data[0]['id'], 'title': 'Hobbit'}])
+        self.assertEqual(search('silmarillion').count(), 0)
+        self.assertEqual(search('hobbit').count(), 1)
+
+
+class BookReadFormatTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        cls.author = Author.objects.create(first_name='John', last_name='Smith')
+        cls.genres = [Genre.objects.create(name=name) for name in ('Fantasy', 'Science Fiction')]
+        for i in range(10):
+            book = Book.objects.create(title=f'Book {i}', summary='Summary', isbn=str(i), author=cls.author)
+            book.genre.set(cls.genres)
+
+    def setUp(self):
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+
+    def test_list_queries_do_not_grow_with_the_page(self):
+        url = reverse('api-book-list')
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url + '?page_size=2')
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(url + '?page_size=10')
+        self.assertEqual(len(large), len(small))
+
+    def test_compact_format(self):
+        response = self.client.get(reverse('api-book-list') + '?format=compact&page_size=5')
+        self.assertEqual(response.status_code, 200)
+        book = response.json()['results'][0]
+        self.assertEqual(book['author'], self.author.pk)
+        self.assertEqual(sorted(book['genre']), [genre.pk for genre in self.genres])
+        self.assertIn('format=compact', response.json()['next'])
+
+    def test_sparse_fields(self):
+        response = self.client.get(reverse('api-book-list') + '?fields=title,author')
+        self.assertEqual(set(response.json()['results'][0]), {'title', 'author'})
+
+    def test_sparse_fields_skip_the_genre_prefetch(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('api-book-list') + '?format=compact&fields=id,title')
+        self.assertFalse(any('catalog_book_genre' in query['sql'] for query in queries))
@@ -0,0 +1,64 @@
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from catalog import counters
+from catalog.models import Author, Book, BookInstance
+
+
+class AsyncCountersTest(TransactionTestCase):
+    """ Missing counters are computed in other threads, which only see committed rows. """
+
+    def setUp(self):
+        cache.clear()
+        book = Book.objects.create(title='Book', summary='Summary', isbn='1')
+        BookInstance.objects.create(book=book, imprint='Imprint', status='a')
+        BookInstance.objects.create(book=book, imprint='Imprint', status='o')
+        Author.objects.create(first_name='John', last_name='Smith')
+        cache.clear()
+
+    def test_same_counters_as_sync(self):
+        computed = async_to_sync(counters.aget_counters)()
+        self.assertEqual(computed, counters.get_counters())
+        self.assertEqual(computed['num_instances_available'], 1)
+        # Now read from the cache
+        self.assertEqual(async_to_sync(counters.aget_counters)(), computed)
+
+    def test_index(self):
+        response = self.client.get(reverse('async-index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['num_books'], 1)
+        self.assertEqual(response.context['num_visits'], 1)
+        self.assertEqual(self.client.get(reverse('async-index')).context['num_visits'], 2)
+
+
+class AsyncPagesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='John', last_name='Smith')
+        cls.book = Book.objects.create(title='The Hobbit', summary='Summary', isbn='1', author=cls.author)
+
+    def test_pages_match_the_sync_views(self):
+        for name, kwargs in (('books', {}), ('book-detail', {'pk': self.book.pk}), ('author', {})):
+            with self.subTest(name):
+                expected = self.client.get(reverse(name, kwargs=kwargs))
+                response = self.client.get(reverse(f'async-{name}', kwargs=kwargs))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.templates[0].name, expected.templates[0].name)
+                self.assertContains(response, 'The Hobbit' if name != 'author' else 'Smith')
+
+    def test_conditional_get(self):
+        for name, kwargs in (('books', {}), ('book-detail', {'pk': self.book.pk}), ('author', {})):
+            with self.subTest(name):
+                response = self.client.get(reverse(f'async-{name}', kwargs=kwargs))
+                self.assertTrue(response.has_header('Last-Modified'))
+                response = self.client.get(reverse(f'async-{name}', kwargs=kwargs),
+                                           HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+
+    def test_missing_book(self):
+        self.assertEqual(self.client.get(reverse('async-book-detail', args=[999])).status_code, 404)
+
+    def test_api(self):
+        self.assertJSONEqual(self.client.get(reverse('async-api')).content, {'message': 'Hello World!'})
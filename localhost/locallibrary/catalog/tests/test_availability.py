@@ -0,0 +1,125 @@
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase
+from django.urls import reverse
+
+from catalog import availability
+from catalog.models import Book, BookInstance
+from catalog.signals import bulk_changed
+from catalog.tests.utils import CaptureQueriesContext
+
+
+class AvailabilityTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.create(title='Book', summary='Summary', isbn='1')
+        cls.other = Book.objects.create(title='Other', summary='Summary', isbn='2')
+
+    def add_copy(self, status, due_back=None, book=None):
+        return BookInstance.objects.create(book=book or self.book, imprint='Imprint', status=status, due_back=due_back)
+
+    def availability(self, book=None):
+        book = Book.objects.get(pk=(book or self.book).pk)
+        return [getattr(book, field) for field in availability.FIELDS]
+
+    def test_copies_are_counted_by_status(self):
+        self.add_copy('a')
+        self.add_copy('a')
+        self.add_copy('o', datetime.date(2030, 1, 5))
+        self.add_copy('o', datetime.date(2030, 1, 2))
+        self.add_copy('r')
+        self.assertEqual(self.availability(), [2, 2, 1, 0, datetime.date(2030, 1, 2)])
+        self.assertEqual(Book.objects.get(pk=self.book.pk).copies_total, 5)
+
+    def test_status_change_and_delete(self):
+        copy = self.add_copy('a')
+        copy.status = 'o'
+        copy.due_back = datetime.date(2030, 1, 1)
+        copy.save()
+        self.assertEqual(self.availability(), [0, 1, 0, 0, datetime.date(2030, 1, 1)])
+        copy.delete()
+        self.assertEqual(self.availability(), [0, 0, 0, 0, None])
+
+    def test_copy_moved_to_another_book(self):
+        copy = self.add_copy('m')
+        copy = BookInstance.objects.get(pk=copy.pk)
+        copy.book = self.other
+        copy.save()
+        self.assertEqual(self.availability(), [0, 0, 0, 0, None])
+        self.assertEqual(self.availability(self.other), [0, 0, 0, 1, None])
+
+    def test_saving_a_loaded_book_keeps_the_availability(self):
+        book = Book.objects.get(pk=self.book.pk)
+        # A copy is lent while the book is being edited
+        self.add_copy('o', datetime.date(2030, 1, 1))
+        book.title = 'New title'
+        book.save()
+        self.assertEqual(self.availability(), [0, 1, 0, 0, datetime.date(2030, 1, 1)])
+        self.assertEqual(Book.objects.get(pk=self.book.pk).title, 'New title')
+
+    def test_saving_a_deferred_book(self):
+        self.add_copy('a')
+        book = Book.objects.only('title').get(pk=self.book.pk)
+        book.title = 'New title'
+        with CaptureQueriesContext(connection) as queries:
+            book.save()
+        # Only the loaded fields are written, without loading the others first
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "catalog_book" ')]
+        self.assertIn('"title"', updates[0])
+        self.assertNotIn('"summary"', updates[0])
+        self.assertNotIn('"copies_available" =', updates[0])
+        self.assertEqual(self.availability(), [1, 0, 0, 0, None])
+        self.assertEqual(Book.objects.get(pk=self.book.pk).title, 'New title')
+
+    def test_saving_a_deleted_book_inserts_it(self):
+        book = Book.objects.get(pk=self.book.pk)
+        Book.objects.filter(pk=self.book.pk).delete()
+        book.save()
+        self.assertEqual(Book.objects.get(pk=self.book.pk).title, 'Book')
+
+    def test_copy_saved_with_the_availability(self):
+        copy = self.add_copy('a')
+        copy.status = 'o'
+        with mock.patch('catalog.availability.refresh', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                copy.save()
+        # The copy's change went with the failed refresh
+        self.assertEqual(BookInstance.objects.get(pk=copy.pk).status, 'a')
+        self.assertEqual(self.availability(), [1, 0, 0, 0, None])
+
+    def test_bulk_changes(self):
+        copy = self.add_copy('a')
+        BookInstance.objects.filter(pk=copy.pk).update(status='r')
+        bulk_changed.send(sender=BookInstance, pks=[copy.pk])
+        self.assertEqual(self.availability(), [0, 0, 1, 0, None])
+
+    def test_reconcile_command(self):
+        self.add_copy('a')
+        self.add_copy('o', datetime.date(2030, 1, 1))
+        Book.objects.filter(pk=self.book.pk).update(copies_available=7, next_due_back=None)
+        self.assertEqual(availability.stale([self.book.pk, self.other.pk]), [self.book.pk])
+
+        out = StringIO()
+        call_command('reconcile_availability', '--check', stdout=out)
+        self.assertIn('1 of 2 books', out.getvalue())
+        self.assertEqual(self.availability()[0], 7)
+
+        call_command('reconcile_availability', stdout=StringIO())
+        self.assertEqual(self.availability(), [1, 1, 0, 0, datetime.date(2030, 1, 1)])
+
+    def test_exposed_in_pages_and_api(self):
+        self.add_copy('a')
+        self.add_copy('o', datetime.date(2030, 1, 1))
+        self.assertContains(self.client.get(reverse('books')), '1 of 2 copies available')
+        self.assertContains(self.client.get(self.book.get_absolute_url()), '1 of 2 copies available')
+
+        User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+        data = self.client.get(reverse('api-book-detail', args=[self.book.pk])).json()
+        self.assertEqual(data['copies_available'], 1)
+        self.assertEqual(data['next_due_back'], '2030-01-01')
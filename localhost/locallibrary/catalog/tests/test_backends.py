@@ -0,0 +1,89 @@
+from django.contrib.auth.models import Group, Permission, User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from catalog.tests.utils import CaptureQueriesContext
+
+
+class CachedModelBackendTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='librarian', password='2HJ1vRV0Z&3iD')
+        cls.group = Group.objects.create(name='Librarians')
+        cls.group.permissions.add(Permission.objects.get(codename='can_view_borrowed'))
+        cls.user.groups.add(cls.group)
+
+    def setUp(self):
+        cache.clear()
+
+    def perms(self):
+        # A new user object, as each request loads
+        return User.objects.get(pk=self.user.pk).get_all_permissions()
+
+    def test_cached_across_requests(self):
+        self.assertEqual(self.perms(), {'catalog.can_view_borrowed'})
+        user = User.objects.get(pk=self.user.pk)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(user.has_perm('catalog.can_view_borrowed'))
+            self.assertFalse(user.has_perm('catalog.can_mark_returned'))
+            self.assertTrue(user.has_module_perms('catalog'))
+            self.assertEqual(user.get_group_permissions(), {'catalog.can_view_borrowed'})
+        self.assertEqual(len(queries), 0)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_not_cached_in_a_process_local_cache(self):
+        self.perms()
+        user = User.objects.get(pk=self.user.pk)
+        # Read from the database, as ModelBackend does
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(user.has_perm('catalog.can_view_borrowed'))
+        self.assertEqual(len(queries), 2)
+
+    def test_group_permission_changes(self):
+        self.perms()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        self.assertEqual(self.perms(), {'catalog.can_view_borrowed', 'catalog.can_mark_returned'})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.permissions.clear()
+        self.assertEqual(self.perms(), set())
+
+    def test_recomputed_after_commit(self):
+        self.perms()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.group.permissions.remove(Permission.objects.get(codename='can_view_borrowed'))
+            # Read before the commit, under the version about to be replaced
+            self.perms()
+        # One bump, after the rows changed (post_remove)
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertEqual(self.perms(), set())
+
+    def test_membership_and_user_permission_changes(self):
+        self.perms()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.remove(self.group)
+        self.assertEqual(self.perms(), set())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        self.assertEqual(self.perms(), {'catalog.can_mark_returned'})
+
+    def test_permission_deleted(self):
+        self.perms()
+        with self.captureOnCommitCallbacks(execute=True):
+            Permission.objects.get(codename='can_view_borrowed').delete()
+        self.assertEqual(self.perms(), set())
+
+    def test_inactive_user(self):
+        self.perms()
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.perms(), set())
+
+    def test_views(self):
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+        self.assertEqual(self.client.get(reverse('borrowed')).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.remove(self.group)
+        self.assertEqual(self.client.get(reverse('borrowed')).status_code, 403)
@@ -0,0 +1,119 @@
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from catalog import counters
+from catalog.models import Author, Book, BookInstance, Genre
+from catalog.tests.utils import CaptureQueriesContext
+
+class CountersTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = Author.objects.create(first_name='John', last_name='Smith')
+        self.science = Genre.objects.create(name='Science Fiction')
+        self.fantasy = Genre.objects.create(name='Fantasy')
+        self.book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG', author=self.author)
+        self.book.genre.set([self.science])
+        self.copy = BookInstance.objects.create(book=self.book, imprint='Imprint', status='a')
+
+    def assertCountersMatchDatabase(self):
+        cached = counters.get_counters()
+        counters.invalidate()
+        self.assertEqual(cached, counters.get_counters())
+
+    def test_initial_values(self):
+        self.assertEqual(counters.get_counters(), {
+            'num_books': 1,
+            'num_instances': 1,
+            'num_instances_available': 1,
+            'num_authors': 1,
+            'num_dorama': 1,
+        })
+
+    def test_steady_state_does_not_query(self):
+        counters.get_counters()
+        with CaptureQueriesContext() as queries:
+            counters.get_counters()
+        self.assertEqual(len(queries), 0)
+
+    def test_creates_and_deletes_are_counted(self):
+        counters.get_counters()
+        with self.captureOnCommitCallbacks(execute=True):
+            other = Book.objects.create(title='Other', summary='Summary', isbn='HIJKLMN', author=self.author)
+            BookInstance.objects.create(book=other, imprint='Imprint', status='a')
+            Author.objects.create(first_name='Jane', last_name='Doe')
+            self.copy.delete()
+        self.assertCountersMatchDatabase()
+
+    def test_writes_drop_the_counters(self):
+        counters.get_counters()
+        with self.captureOnCommitCallbacks(execute=True):
+            Author.objects.create(first_name='Jane', last_name='Doe')
+        # Recomputed on the next read rather than incremented in the cache
+        self.assertIsNone(cache.get(counters._key('num_authors')))
+        self.assertIsNotNone(cache.get(counters._key('num_books')))
+        copy = BookInstance.objects.get(pk=self.copy.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            # Status unchanged
+            copy.save()
+        self.assertIsNotNone(cache.get(counters._key('num_instances_available')))
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_not_cached_in_a_process_local_cache(self):
+        counters.get_counters()
+        with CaptureQueriesContext() as queries:
+            self.assertEqual(counters.get_counters()['num_books'], 1)
+        self.assertEqual(len(queries), len(counters.COUNTERS))
+
+    def test_rolled_back_writes_are_not_counted(self):
+        counters.get_counters()
+        try:
+            with transaction.atomic():
+                Author.objects.create(first_name='Jane', last_name='Doe')
+                raise DatabaseError
+        except DatabaseError:
+            pass
+        self.assertEqual(counters.get_counters()['num_authors'], 1)
+
+    def test_counted_on_commit(self):
+        counters.get_counters()
+        with self.captureOnCommitCallbacks() as callbacks:
+            Author.objects.create(first_name='Jane', last_name='Doe')
+            # Other requests do not see the author yet
+            self.assertEqual(counters.get_counters()['num_authors'], 1)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(counters.get_counters()['num_authors'], 2)
+
+    def test_status_changes_are_counted(self):
+        counters.get_counters()
+        copy = BookInstance.objects.get(pk=self.copy.pk)
+        copy.status = 'o'
+        with self.captureOnCommitCallbacks(execute=True):
+            copy.save()
+        self.assertEqual(counters.get_counters()['num_instances_available'], 0)
+        copy.status = 'a'
+        with self.captureOnCommitCallbacks(execute=True):
+            copy.save()
+        self.assertCountersMatchDatabase()
+
+    def test_genre_changes_are_counted(self):
+        counters.get_counters()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.genre.add(self.fantasy)
+            self.book.genre.remove(self.science)
+        self.assertEqual(counters.get_counters()['num_dorama'], 0)
+        self.fantasy.name = 'Science Fantasy'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fantasy.save()
+        self.assertEqual(counters.get_counters()['num_dorama'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.delete()
+        self.assertCountersMatchDatabase()
+
+    def test_index_uses_counters(self):
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['num_books'], 1)
+        self.assertEqual(response.context['num_instances_available'], 1)
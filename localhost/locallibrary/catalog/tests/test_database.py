@@ -0,0 +1,44 @@
+from unittest import mock
+
+from django.db import connections
+from django.test import SimpleTestCase, override_settings
+
+from catalog import database
+
+
+class DatabaseProfileTest(SimpleTestCase):
+    databases = {'default'}
+
+    def new_connection(self):
+        wrapper = connections.create_connection('default')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    @override_settings(CATALOG_SQLITE_PRAGMAS={'synchronous': 'NORMAL', 'busy_timeout': 1234, 'cache_size': -2048})
+    def test_pragmas_applied_to_new_connections(self):
+        wrapper = self.new_connection()
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 1234)
+        self.assertEqual(self.pragma(wrapper, 'cache_size'), -2048)
+
+    @override_settings(CATALOG_SQLITE_PRAGMAS={})
+    def test_no_pragma_by_default(self):
+        self.assertEqual(self.pragma(self.new_connection(), 'synchronous'), 2)
+
+    def test_unusable_persistent_connection_closed(self):
+        wrapper = self.new_connection()
+        wrapper.ensure_connection()
+        wrapper.settings_dict = dict(wrapper.settings_dict, CONN_MAX_AGE=600)
+        # Django never closes the in-memory test database: check the call instead.
+        with mock.patch.object(database, 'connections', mock.Mock(all=lambda: [wrapper])), \
+                mock.patch.object(wrapper, 'close') as close:
+            database.check_connections()
+            close.assert_not_called()
+            with mock.patch.object(wrapper, 'is_usable', return_value=False):
+                database.check_connections()
+            close.assert_called_once_with()
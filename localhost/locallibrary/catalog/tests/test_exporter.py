@@ -0,0 +1,143 @@
+import csv
+import datetime
+import io
+import json
+
+from django.contrib.auth.models import Permission, User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from catalog import exporter
+from catalog.models import Author, Book, BookInstance, Genre
+from catalog.signals import bulk_changed
+from catalog.tests.utils import CaptureQueriesContext
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        genres = [Genre.objects.create(name='Fantasy'), Genre.objects.create(name='Drama')]
+        for number in range(30):
+            book = Book.objects.create(title=f'Book {number}', summary='Summary', isbn=f'{number:013}', author=author)
+            book.genre.set(genres)
+            BookInstance.objects.create(book=book, imprint='Imprint', status='a')
+        cls.librarian = User.objects.create_user(username='librarian', password='2HJ1vRV0Z&3iD')
+        cls.librarian.user_permissions.add(Permission.objects.get(codename='can_view_borrowed'))
+
+    def test_books_are_denormalized_without_n_plus_one(self):
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(exporter.export_rows('books', chunk_size=10))
+        self.assertEqual(len(rows), 30)
+        self.assertEqual(rows[0]['author'], 'Smith, John')
+        self.assertEqual(rows[0]['genres'], 'Drama;Fantasy')
+        # One query for the books and one per chunk for the genres
+        self.assertLessEqual(len(queries), 1 + 3 + 1)
+
+    def test_since(self):
+        Book.objects.update(updated_at=timezone.now() - datetime.timedelta(days=2))
+        book = Book.objects.get(title='Book 3')
+        book.save()
+        since = timezone.now() - datetime.timedelta(days=1)
+        self.assertEqual([row['title'] for row in exporter.export_rows('books', since=since)], ['Book 3'])
+
+    def test_since_includes_genre_changes(self):
+        Book.objects.update(updated_at=timezone.now() - datetime.timedelta(days=2))
+        since = timezone.now() - datetime.timedelta(days=1)
+        fantasy = Genre.objects.get(name='Fantasy')
+        Book.objects.get(title='Book 3').genre.remove(fantasy)
+        fantasy.book_set.remove(Book.objects.get(title='Book 5'))
+        self.assertEqual([row['title'] for row in exporter.export_rows('books', since=since)], ['Book 3', 'Book 5'])
+
+        drama = Genre.objects.get(name='Drama')
+        drama.name = 'Tragedy'
+        drama.save()
+        self.assertEqual(len(list(exporter.export_rows('books', since=since))), 30)
+
+    def changed_since(self, name):
+        return [row['id'] for row in exporter.export_rows(name, since=self.since)]
+
+    def age_rows(self):
+        long_ago = timezone.now() - datetime.timedelta(days=2)
+        Book.objects.update(updated_at=long_ago)
+        BookInstance.objects.update(updated_at=long_ago)
+        self.since = timezone.now() - datetime.timedelta(days=1)
+
+    def test_since_includes_author_changes(self):
+        other = Author.objects.create(first_name='Jane', last_name='Doe')
+        Book.objects.filter(title='Book 3').update(author=other)
+        self.age_rows()
+        other.last_name = 'Austen'
+        other.save()
+        self.assertEqual(self.changed_since('books'), [Book.objects.get(title='Book 3').pk])
+        other.delete()
+        self.assertEqual(self.changed_since('books'), [Book.objects.get(title='Book 3').pk])
+
+    def test_since_includes_book_changes(self):
+        self.age_rows()
+        book = Book.objects.get(title='Book 3')
+        book.title = 'Book III'
+        book.save()
+        self.assertEqual(self.changed_since('copies'), list(book.bookinstance_set.values_list('pk', flat=True)))
+        self.assertEqual([row['book'] for row in exporter.export_rows('copies', since=self.since)], ['Book III'])
+        copies = self.changed_since('copies')
+        Book.objects.get(title='Book 5').delete()
+        self.assertEqual(len(self.changed_since('copies')), len(copies) + 1)
+
+    def test_since_includes_borrower_changes(self):
+        reader = User.objects.create_user(username='reader', password='1X<ISRUkw+tuK')
+        copy = BookInstance.objects.filter(book__title='Book 3').get()
+        BookInstance.objects.filter(pk=copy.pk).update(borrower=reader, status='o')
+        self.age_rows()
+        # Logging in changes nothing exported
+        self.client.login(username='reader', password='1X<ISRUkw+tuK')
+        self.assertEqual(self.changed_since('copies'), [])
+        reader.username = 'reader2'
+        reader.save()
+        self.assertEqual(self.changed_since('copies'), [copy.pk])
+        self.age_rows()
+        reader.delete()
+        self.assertEqual(self.changed_since('copies'), [copy.pk])
+
+    def test_since_includes_bulk_changes(self):
+        self.age_rows()
+        book = Book.objects.get(title='Book 3')
+        Book.objects.filter(pk=book.pk).update(title='Book III')
+        bulk_changed.send(sender=Book, pks=[book.pk])
+        self.assertEqual(self.changed_since('copies'), list(book.bookinstance_set.values_list('pk', flat=True)))
+        Author.objects.update(last_name='Jones')
+        bulk_changed.send(sender=Author, pks=list(Author.objects.values_list('pk', flat=True)))
+        self.assertEqual(len(self.changed_since('books')), 30)
+
+    def test_csv_and_jsonl(self):
+        lines = list(exporter.render('copies', exporter.export_rows('copies'), 'csv'))
+        rows = list(csv.DictReader(io.StringIO(''.join(lines))))
+        self.assertEqual(len(rows), 30)
+        self.assertEqual(rows[0]['status'], 'a')
+
+        lines = list(exporter.render('authors', exporter.export_rows('authors'), 'jsonl'))
+        self.assertEqual(json.loads(lines[0])['last_name'], 'Smith')
+
+    def test_export_command(self):
+        out = io.StringIO()
+        call_command('export_catalog', 'genres', '--format', 'csv', stdout=out)
+        self.assertEqual(out.getvalue().splitlines()[0], 'id,name,updated_at')
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
+
+    def test_export_view_streams(self):
+        response = self.client.get(reverse('export', args=['books', 'ndjson']))
+        self.assertEqual(response.status_code, 302)
+
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+        response = self.client.get(reverse('export', args=['books', 'ndjson']))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 30)
+
+        response = self.client.get(reverse('export', args=['books', 'xml']))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse('export', args=['books', 'csv']) + '?since=yesterday')
+        self.assertEqual(response.status_code, 400)
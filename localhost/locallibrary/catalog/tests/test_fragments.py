@@ -0,0 +1,95 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from catalog import fragments, versions
+from catalog.models import Author, Book, BookInstance, Genre
+from catalog.signals import bulk_changed
+from catalog.tests.utils import CaptureQueriesContext
+
+
+class FragmentCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='John', last_name='Smith')
+        cls.genre = Genre.objects.create(name='Fantasy')
+        cls.book = Book.objects.create(title='The Hobbit', summary='Summary', isbn='1', author=cls.author)
+        cls.book.genre.add(cls.genre)
+        cls.copy = BookInstance.objects.create(book=cls.book, imprint='First Imprint', status='a')
+
+    def setUp(self):
+        cache.clear()
+
+    def get_book(self):
+        return self.client.get(self.book.get_absolute_url())
+
+    def test_hit_skips_the_queries(self):
+        self.get_book()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_book()
+        self.assertContains(response, 'Fantasy')
+        self.assertContains(response, 'First Imprint')
+        self.assertFalse(any('catalog_bookinstance' in query['sql'] for query in queries))
+        self.assertFalse(any('catalog_book_genre' in query['sql'] for query in queries))
+        self.assertEqual(fragments.stats()['book-copies'], (1, 1))
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_not_cached_in_a_process_local_cache(self):
+        self.get_book()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertContains(self.get_book(), 'First Imprint')
+        self.assertTrue(any('catalog_bookinstance' in query['sql'] for query in queries))
+
+    def test_copy_change_invalidates_the_copies(self):
+        self.get_book()
+        self.copy.imprint = 'Second Imprint'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.copy.save()
+        self.assertContains(self.get_book(), 'Second Imprint')
+        self.assertEqual(fragments.stats()['book'], (1, 1))
+
+    def test_invalidated_on_commit(self):
+        self.get_book()
+        version = versions.get_object_version('book-copies', self.book.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.copy.save()
+            # Renders by other requests still read the old rows
+            self.assertEqual(versions.get_object_version('book-copies', self.book.pk), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(versions.get_object_version('book-copies', self.book.pk), version)
+
+    def test_copy_moved_to_another_book(self):
+        other = Book.objects.create(title='Other', summary='Summary', isbn='2')
+        self.client.get(other.get_absolute_url())
+        copy = BookInstance.objects.get(pk=self.copy.pk)
+        copy.book = other
+        with self.captureOnCommitCallbacks(execute=True):
+            copy.save()
+        self.assertContains(self.client.get(other.get_absolute_url()), 'First Imprint')
+        self.assertNotContains(self.get_book(), 'First Imprint')
+
+    def test_genre_rename_invalidates_its_books(self):
+        self.get_book()
+        self.genre.name = 'High Fantasy'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.genre.save()
+        self.assertContains(self.get_book(), 'High Fantasy')
+
+    def test_bulk_changes(self):
+        self.get_book()
+        BookInstance.objects.filter(pk=self.copy.pk).update(imprint='Bulk Imprint')
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_changed.send(sender=BookInstance, pks=[self.copy.pk])
+        self.assertContains(self.get_book(), 'Bulk Imprint')
+
+    def test_author_works(self):
+        self.client.get(self.author.get_absolute_url())
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.create(title='The Silmarillion', summary='Summary', isbn='3', author=self.author)
+        self.assertContains(self.client.get(self.author.get_absolute_url()), 'The Silmarillion')
+
+        self.book.author = Author.objects.create(first_name='Jane', last_name='Doe')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.save()
+        self.assertNotContains(self.client.get(self.author.get_absolute_url()), 'The Hobbit')
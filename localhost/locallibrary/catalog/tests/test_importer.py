@@ -0,0 +1,81 @@
+import io
+import json
+import os
+import tempfile
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TransactionTestCase
+
+from catalog import counters, search
+from catalog.importer import CatalogImporter, read_records
+from catalog.models import Author, Book, BookInstance, Genre, ImportCheckpoint
+
+RECORDS = [
+    {'title': 'The Hobbit', 'author': 'Tolkien, John', 'summary': 'A dragon.', 'isbn': '9780261102217',
+     'genres': ['Fantasy'], 'copies': 2, 'imprint': 'Allen & Unwin'},
+    {'title': 'The Silmarillion', 'author': 'Tolkien, John', 'genres': ['Fantasy', 'Myth'], 'copies': 1},
+    {'title': '', 'author': 'Nobody, No'},
+    {'title': 'Dune', 'author': 'Herbert, Frank', 'genres': ['Science Fiction'], 'copies': 3, 'status': 'o'},
+]
+
+
+class ImportCatalogTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        # The FTS table is not emptied between TransactionTestCases
+        search.rebuild_index()
+        Genre.objects.create(name='Fantasy')
+        f = tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False)
+        with f:
+            for record in RECORDS:
+                f.write(json.dumps(record) + '\n')
+        self.path = f.name
+        self.addCleanup(os.remove, self.path)
+
+    def test_import_jsonl(self):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_catalog', self.path, '--chunk-size', '2', stdout=out, stderr=err)
+        self.assertIn('Imported 3 books and 6 copies', out.getvalue())
+        self.assertEqual(err.getvalue(), 'Record 3: title is required\n')
+        self.assertEqual(Book.objects.count(), 3)
+        self.assertEqual(Author.objects.count(), 2)
+        self.assertEqual(sorted(Genre.objects.values_list('name', flat=True)), ['Fantasy', 'Myth', 'Science Fiction'])
+        silmarillion = Book.objects.get(title='The Silmarillion')
+        self.assertEqual(str(silmarillion.author), 'Tolkien, John')
+        self.assertEqual(sorted(silmarillion.genre.values_list('name', flat=True)), ['Fantasy', 'Myth'])
+        self.assertEqual(BookInstance.objects.count(), 6)
+        self.assertEqual(BookInstance.objects.filter(status='o').count(), 3)
+
+    def test_caches_and_search_follow_the_import(self):
+        counters.get_counters()
+        importer = CatalogImporter('records')
+        importer.run(read_records(self.path, 'jsonl'))
+        self.assertEqual(importer.errors, [(3, 'title is required')])
+        self.assertEqual(counters.get_counters()['num_books'], 3)
+        self.assertEqual(counters.get_counters()['num_dorama'], 1)
+        self.assertEqual([book.title for book in search.search('dragon')[:10]], ['The Hobbit'])
+
+    def test_resume_after_checkpoint(self):
+        ImportCheckpoint.objects.create(source='records', position=2)
+        CatalogImporter('records', chunk_size=1).run(read_records(self.path, 'jsonl'))
+        self.assertEqual(list(Book.objects.values_list('title', flat=True)), ['Dune'])
+        self.assertEqual(ImportCheckpoint.objects.get(source='records').position, 4)
+
+        # Running again imports nothing more
+        CatalogImporter('records').run(read_records(self.path, 'jsonl'))
+        self.assertEqual(Book.objects.count(), 1)
+
+    def test_parallel_parsing(self):
+        CatalogImporter('records', chunk_size=1, workers=2).run(read_records(self.path, 'jsonl'))
+        self.assertEqual(Book.objects.count(), 3)
+
+    def test_import_csv(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, newline='') as f:
+            f.write('title,author,genres,copies\n"Dune","Herbert, Frank",Science Fiction;Classic,2\n')
+        self.addCleanup(os.remove, f.name)
+        CatalogImporter('csv').run(read_records(f.name, 'csv'))
+        dune = Book.objects.get()
+        self.assertEqual(str(dune.author), 'Herbert, Frank')
+        self.assertEqual(dune.genre.count(), 2)
+        self.assertEqual(dune.bookinstance_set.count(), 2)
@@ -0,0 +1,174 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.forms.models import inlineformset_factory
+from django.http import QueryDict
+from django.test import TestCase
+from django.urls import reverse
+
+from catalog.inlines import LOADED_INDEX_START, PaginatedInlineFormSet
+from catalog.models import Author, Book, BookInstance, Genre
+from catalog.tests.utils import CaptureQueriesContext
+
+PREFIX = 'bookinstance_set'
+
+
+def row(index, copy, **changes):
+    """ POST data of the inline row ``index`` editing ``copy`` (None: a new copy). """
+    values = {
+        'id': copy.pk if copy else '',
+        'book': copy.book_id if copy else '',
+        'imprint': copy.imprint if copy else '',
+        'status': copy.status if copy else 'm',
+        'due_back': '',
+        'borrower': '',
+    }
+    values.update(changes)
+    return {f'{PREFIX}-{index}-{name}': value for name, value in values.items()}
+
+
+def management(total, initial):
+    return {f'{PREFIX}-TOTAL_FORMS': str(total), f'{PREFIX}-INITIAL_FORMS': str(initial),
+            f'{PREFIX}-MIN_NUM_FORMS': '0', f'{PREFIX}-MAX_NUM_FORMS': '1000'}
+
+
+def query_dict(data):
+    query = QueryDict(mutable=True)
+    for key, value in data.items():
+        query[key] = str(value)
+    return query
+
+
+class PaginatedInlineFormSetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.create(title='Book', summary='Summary', isbn='1')
+        for number in range(7):
+            BookInstance.objects.create(book=cls.book, imprint=f'Imprint {number}', status='a',
+                                        due_back=datetime.date(2030, 1, 1 + number))
+        cls.copies = list(cls.book.bookinstance_set.order_by('due_back', 'id'))
+        cls.formset_class = inlineformset_factory(
+            Book, BookInstance, formset=PaginatedInlineFormSet,
+            fields=['imprint', 'status', 'due_back', 'borrower'], extra=1,
+        )
+        cls.formset_class.per_page = 3
+
+    def formset(self, data=None, page=1):
+        queryset = BookInstance.objects.order_by('due_back', 'id')
+        return self.formset_class(data, instance=self.book, queryset=queryset, page=page, prefix=PREFIX)
+
+    def test_pages(self):
+        first = self.formset()
+        self.assertEqual([form.instance for form in first.initial_forms], self.copies[:3])
+        self.assertTrue(first.has_more)
+        self.assertEqual(first.forms[0].add_prefix('imprint'), f'{PREFIX}-0-imprint')
+
+        last = self.formset(page=3)
+        self.assertEqual([form.instance for form in last.initial_forms], self.copies[6:])
+        self.assertFalse(last.has_more)
+        self.assertEqual(last.forms[0].add_prefix('imprint'), f'{PREFIX}-{LOADED_INDEX_START + 3}-imprint')
+
+    def test_only_submitted_rows_saved(self):
+        first, loaded = self.copies[1], self.copies[5]
+        data = {
+            # Row 1 of the first page and row 2 of the third one; the others left out
+            **management(total=4, initial=3),
+            **row(1, first, imprint='Changed'),
+            **row(LOADED_INDEX_START + 3 + 2, loaded, status='m'),
+            # A copy added with "Add another"
+            **row(3, None, imprint='New', book=self.book.pk),
+        }
+        with CaptureQueriesContext(connection) as queries:
+            formset = self.formset(query_dict(data))
+            self.assertTrue(formset.is_valid(), formset.errors)
+            formset.save()
+        self.assertEqual(formset.initial_form_count(), 2)
+        self.assertEqual(formset.total_form_count(), 3)
+        self.assertEqual(BookInstance.objects.get(pk=first.pk).imprint, 'Changed')
+        self.assertEqual(BookInstance.objects.get(pk=loaded.pk).status, 'm')
+        self.assertEqual(BookInstance.objects.filter(imprint='New').count(), 1)
+        self.assertEqual(BookInstance.objects.count(), 8)
+        # Only the submitted copies are read, never all the copies of the book
+        select = [query['sql'] for query in queries if query['sql'].startswith('SELECT "catalog_bookinstance"."id"')]
+        self.assertTrue(select)
+        for sql in select:
+            self.assertRegex(sql, r'"catalog_bookinstance"\."id" (IN \(|= )')
+
+    def test_copy_of_another_book_rejected(self):
+        other = BookInstance.objects.create(book=Book.objects.create(title='Other', summary='S', isbn='2'),
+                                            imprint='Other', status='a')
+        formset = self.formset(query_dict({**management(total=1, initial=1), **row(0, other, imprint='Stolen')}))
+        if formset.is_valid():
+            formset.save()
+        self.assertEqual(BookInstance.objects.get(pk=other.pk).imprint, 'Other')
+
+
+class PaginatedInlineAdminTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin', password='2HJ1vRV0Z&3iD')
+        cls.author = Author.objects.create(first_name='John', last_name='Smith')
+        cls.book = Book.objects.create(title='Book', summary='Summary', isbn='1', author=cls.author)
+        cls.genre = Genre.objects.create(name='Fantasy')
+        cls.book.genre.add(cls.genre)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_copies(self, number):
+        BookInstance.objects.bulk_create([
+            BookInstance(book=self.book, imprint=f'Imprint {copy}', status='a') for copy in range(number)
+        ])
+
+    def change_page(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:catalog_book_change', args=[self.book.pk]))
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_change_page_bounded(self):
+        self.add_copies(25)
+        self.change_page()
+        response, queries = self.change_page()
+        self.assertEqual(response.content.decode().count('Imprint '), 20)
+        self.assertContains(response, reverse('admin:catalog_book_inline_page', args=[self.book.pk, PREFIX]))
+        size = len(response.content)
+
+        self.add_copies(200)
+        response, more_queries = self.change_page()
+        self.assertEqual(more_queries, queries)
+        self.assertLess(abs(len(response.content) - size), 1000)
+
+    def test_inline_pages(self):
+        self.add_copies(25)
+        url = reverse('admin:catalog_book_inline_page', args=[self.book.pk, PREFIX])
+        data = self.client.get(url, {'page': 2}).json()
+        self.assertFalse(data['has_more'])
+        self.assertEqual(data['html'].count('Imprint '), 5)
+        self.assertIn(f'{PREFIX}-{LOADED_INDEX_START}-imprint', data['html'])
+        self.assertEqual(self.client.get(url, {'page': 1}).status_code, 404)
+        self.assertEqual(self.client.get(url, {'page': 'x'}).status_code, 404)
+        self.assertEqual(self.client.get(url.replace(PREFIX, 'unknown'), {'page': 2}).status_code, 404)
+        # The books of an author too
+        url = reverse('admin:catalog_author_inline_page', args=[self.author.pk, 'book_set'])
+        self.assertEqual(self.client.get(url, {'page': 2}).status_code, 200)
+
+    def test_inline_pages_need_permission(self):
+        self.add_copies(25)
+        self.client.force_login(User.objects.create_user(username='staff', is_staff=True))
+        url = reverse('admin:catalog_book_inline_page', args=[self.book.pk, PREFIX])
+        self.assertEqual(self.client.get(url, {'page': 2}).status_code, 403)
+
+    def test_save_changed_rows_only(self):
+        self.add_copies(25)
+        copies = list(self.book.bookinstance_set.order_by('due_back', 'id'))
+        data = {
+            'title': 'Book', 'summary': 'Summary', 'isbn': '1', 'author': self.author.pk, 'genre': [self.genre.pk],
+            **management(total=20, initial=20),
+            **row(LOADED_INDEX_START + 2, copies[22], imprint='Changed'),
+        }
+        response = self.client.post(reverse('admin:catalog_book_change', args=[self.book.pk]), data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(BookInstance.objects.get(pk=copies[22].pk).imprint, 'Changed')
+        self.assertEqual(BookInstance.objects.filter(book=self.book).count(), 25)
@@ -0,0 +1,113 @@
+import io
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TransactionTestCase
+
+from catalog import availability, counters, loadtest, search
+from catalog.models import Author, Book, BookInstance, Genre
+
+
+class SeedCatalogTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        # The FTS table is not emptied between TransactionTestCases
+        search.rebuild_index()
+
+    def seed(self, *args):
+        """ Run seed_catalog, returning its output. """
+        out = io.StringIO()
+        call_command('seed_catalog', '--books', '30', '--copies-per-book', '3', '--users', '5',
+                     '--chunk-size', '7', *args, stdout=out)
+        return out.getvalue()
+
+    def catalog(self):
+        return (
+            list(Book.objects.order_by('isbn').values_list('title', 'isbn', 'author__last_name')),
+            list(BookInstance.objects.order_by('book__isbn', 'imprint').values_list(
+                'status', 'due_back', 'borrower__username')),
+        )
+
+    def test_counts(self):
+        output = self.seed()
+        self.assertIn('Generated 30 books, 90 copies, 3 authors and 5 readers', output)
+        # One progress line per chunk of books
+        self.assertEqual(output.count('books/s'), 5)
+        self.assertEqual(Book.objects.count(), 30)
+        self.assertEqual(BookInstance.objects.count(), 90)
+        self.assertEqual(Author.objects.count(), 3)
+        self.assertTrue(Genre.objects.exists())
+        self.assertEqual(User.objects.filter(username__startswith='reader').count(), 5)
+        librarian = User.objects.get(username='librarian')
+        self.assertTrue(librarian.has_perm('catalog.can_mark_returned'))
+        self.assertTrue(librarian.check_password('loadtest-2HJ1vRV0Z'))
+
+    def test_derived_data_up_to_date(self):
+        counters.get_counters()
+        self.seed()
+        # Written with the books rather than recomputed from the copies
+        self.assertEqual(availability.stale(Book.objects.values_list('pk', flat=True)), [])
+        self.assertEqual(counters.get_counters()['num_instances'], 90)
+        book = Book.objects.first()
+        self.assertIn(book, list(search.search(book.title.split()[-1])))
+
+    def test_same_seed_same_catalog(self):
+        self.seed('--seed', '3')
+        first = self.catalog()
+        BookInstance.objects.all().delete()
+        Book.objects.all().delete()
+        Author.objects.all().delete()
+        User.objects.all().delete()
+        self.seed('--seed', '3')
+        self.assertEqual(self.catalog(), first)
+
+    def test_refuses_existing_catalog(self):
+        self.seed()
+        with self.assertRaises(CommandError):
+            self.seed()
+
+    def test_append(self):
+        self.seed()
+        self.assertIn('and 8 readers', self.seed('--append', '--users', '8'))
+        self.assertEqual(Book.objects.count(), 60)
+        self.assertEqual(len(set(Book.objects.values_list('isbn', flat=True))), 60)
+        self.assertEqual(len(set(Author.objects.values_list('last_name', flat=True))), 6)
+        # The existing readers are reused, the missing ones added
+        self.assertEqual(User.objects.filter(username__startswith='reader').count(), 8)
+        self.assertEqual(availability.stale(Book.objects.values_list('pk', flat=True)), [])
+
+
+class CompareTest(SimpleTestCase):
+    baseline = {
+        'index': {'throughput': 100.0, 'p50_ms': 10.0, 'p95_ms': 20.0, 'p99_ms': 30.0},
+        'books': {'throughput': 50.0, 'p50_ms': 20.0, 'p95_ms': 40.0, 'p99_ms': 60.0},
+    }
+
+    def test_within_threshold(self):
+        current = {
+            'index': {'throughput': 95.0, 'p50_ms': 10.5, 'p95_ms': 21.0, 'p99_ms': 29.0},
+            'books': {'throughput': 80.0, 'p50_ms': 5.0, 'p95_ms': 10.0, 'p99_ms': 20.0},
+        }
+        self.assertEqual(loadtest.compare(self.baseline, current, 0.1), [])
+
+    def test_regressions(self):
+        current = {
+            'index': {'throughput': 80.0, 'p50_ms': 10.0, 'p95_ms': 25.0, 'p99_ms': 30.0},
+            # Not in the baseline
+            'renew': {'throughput': 1.0, 'p50_ms': 1000.0, 'p95_ms': 1000.0, 'p99_ms': 1000.0},
+        }
+        self.assertEqual(loadtest.compare(self.baseline, current, 0.1), [
+            ('index', 'throughput', 100.0, 80.0),
+            ('index', 'p95_ms', 20.0, 25.0),
+        ])
+        self.assertEqual(loadtest.compare(self.baseline, current, 0.3), [])
+
+
+class RequestTest(SimpleTestCase):
+    def test_get_and_post(self):
+        method, url, body = loadtest._request('http://testserver/catalog/books/?page=2')
+        self.assertEqual((method, url.path, url.query, body), ('GET', '/catalog/books/', 'page=2', None))
+        method, url, body = loadtest._request(('POST', 'http://testserver/renew/', {'renewal_date': '2026-01-01'}))
+        self.assertEqual((method, url.path, body), ('POST', '/renew/', 'renewal_date=2026-01-01'))
@@ -0,0 +1,124 @@
+import datetime
+import json
+import uuid
+
+from django.contrib.auth.models import Permission, User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from catalog import loans
+from catalog.models import Book, BookInstance
+
+
+class LoanServiceTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.create(title='The Hobbit', summary='Summary', isbn='1')
+        cls.reader = User.objects.create_user(username='reader', password='1X<ISRUkw+tuK')
+        cls.other = User.objects.create_user(username='other', password='2HJ1vRV0Z&3iD')
+
+    def add_copies(self, status, number=1, borrower=None):
+        return [
+            BookInstance.objects.create(book=self.book, imprint='Imprint', status=status, borrower=borrower).pk
+            for _ in range(number)
+        ]
+
+    def test_checkout_only_lends_available_copies(self):
+        available = self.add_copies('a', 2)
+        on_loan = self.add_copies('o', borrower=self.other)
+        missing = uuid.uuid4()
+        with self.captureOnCommitCallbacks(execute=True):
+            result = loans.checkout(available + on_loan + [missing], self.reader)
+        self.assertEqual(result.done, available)
+        self.assertEqual(result.failed, {on_loan[0]: 'not available', missing: 'not found'})
+        copy = BookInstance.objects.get(pk=available[0])
+        self.assertEqual((copy.status, copy.borrower), ('o', self.reader))
+        self.assertEqual(copy.due_back, datetime.date.today() + loans.LOAN_PERIOD)
+        # bulk_changed kept the availability summary up to date
+        self.assertEqual(Book.objects.get(pk=self.book.pk).copies_on_loan, 3)
+
+    def test_second_checkout_of_a_copy_fails(self):
+        copy = self.add_copies('a')
+        self.assertEqual(loans.checkout(copy, self.reader).done, copy)
+        self.assertEqual(loans.checkout(copy, self.other).failed, {copy[0]: 'not available'})
+        self.assertEqual(BookInstance.objects.get(pk=copy[0]).borrower, self.reader)
+
+    def test_reserved_copies_are_lent_to_their_borrower_only(self):
+        copy = self.add_copies('a')
+        self.assertEqual(loans.reserve(copy, self.reader).done, copy)
+        self.assertEqual(loans.checkout(copy, self.other).done, [])
+        self.assertEqual(loans.checkout(copy, self.reader).done, copy)
+
+    def test_return_and_renew(self):
+        copy = self.add_copies('o', borrower=self.reader)
+        due_back = datetime.date.today() + datetime.timedelta(weeks=4)
+        self.assertEqual(loans.renew(copy, due_back).done, copy)
+        self.assertEqual(BookInstance.objects.get(pk=copy[0]).due_back, due_back)
+        self.assertEqual(loans.return_copies(copy).done, copy)
+        self.assertEqual(loans.return_copies(copy).failed, {copy[0]: 'not on loan'})
+        self.assertEqual(loans.renew(copy, due_back).done, [])
+        copy = BookInstance.objects.get(pk=copy[0])
+        self.assertEqual((copy.status, copy.borrower, copy.due_back), ('a', None, None))
+
+
+class LoanAPITest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.create(title='The Hobbit', summary='Summary', isbn='1')
+        cls.reader = User.objects.create_user(username='reader', password='1X<ISRUkw+tuK')
+        cls.librarian = User.objects.create_user(username='librarian', password='2HJ1vRV0Z&3iD')
+        cls.librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        cls.copies = [
+            BookInstance.objects.create(book=cls.book, imprint='Imprint', status='a').pk for _ in range(3)
+        ]
+
+    def setUp(self):
+        # Permissions cached by earlier tests for users of the same pk
+        cache.clear()
+
+    def post(self, action, data):
+        return self.client.post(reverse(f'api-loan-{action}'), json.dumps(data), content_type='application/json')
+
+    def test_checkout_and_return(self):
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+        copies = [str(pk) for pk in self.copies]
+        response = self.post('checkout', {'copies': copies[:2], 'borrower': self.reader.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([str(pk) for pk in response.data['done']], copies[:2])
+
+        response = self.post('checkout', {'copies': copies, 'borrower': self.reader.pk})
+        self.assertEqual([str(pk) for pk in response.data['done']], copies[2:])
+        self.assertEqual(len(response.data['failed']), 2)
+
+        response = self.post('return', {'copies': copies})
+        self.assertEqual(len(response.data['done']), 3)
+
+    def test_validation(self):
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+        self.assertEqual(self.post('checkout', {'copies': [str(self.copies[0])]}).status_code, 400)
+        late = datetime.date.today() + datetime.timedelta(weeks=5)
+        response = self.post('renew', {'copies': [str(self.copies[0])], 'due_back': late.isoformat()})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('due_back', response.data)
+
+    def test_librarians_only(self):
+        self.client.login(username='reader', password='1X<ISRUkw+tuK')
+        response = self.post('reserve', {'copies': [str(self.copies[0])]})
+        self.assertEqual(response.status_code, 403)
+
+
+class RenewViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_copy_returned_meanwhile(self):
+        book = Book.objects.create(title='The Hobbit', summary='Summary', isbn='1')
+        copy = BookInstance.objects.create(book=book, imprint='Imprint', status='a')
+        librarian = User.objects.create_user(username='librarian', password='2HJ1vRV0Z&3iD')
+        librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+        response = self.client.post(reverse('renew-book-librarian', args=[copy.pk]),
+                                    {'renewal_date': datetime.date.today() + datetime.timedelta(weeks=2)})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'no longer on loan')
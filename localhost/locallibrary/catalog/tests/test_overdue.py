@@ -0,0 +1,67 @@
+import datetime
+from io import StringIO
+
+from django.contrib.auth.models import Permission, User
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase
+
+from catalog.models import Book, BookInstance, OverdueRun
+from catalog.overdue import process_overdue
+
+TODAY = datetime.date(2030, 6, 15)
+
+
+class OverdueTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.create(title='The Hobbit', summary='Summary', isbn='1')
+        cls.reader = User.objects.create_user(username='reader', password='1X<ISRUkw+tuK', email='reader@example.com')
+        cls.no_email = User.objects.create_user(username='noemail', password='2HJ1vRV0Z&3iD')
+
+        def loan(days_late, borrower, status='o'):
+            return BookInstance.objects.create(
+                book=cls.book, imprint='Imprint', status=status, borrower=borrower,
+                due_back=TODAY - datetime.timedelta(days=days_late),
+            )
+        cls.late = [loan(days, cls.reader) for days in (1, 2, 3)]
+        cls.late_no_email = loan(5, cls.no_email)
+        cls.on_time = loan(0, cls.reader)
+        cls.returned = loan(10, None, status='a')
+
+    def test_overdue_queryset(self):
+        overdue = BookInstance.objects.overdue(TODAY)
+        self.assertEqual(set(overdue), {*self.late, self.late_no_email})
+        annotated = {copy.pk: copy.overdue for copy in BookInstance.objects.filter(status='o').with_overdue(TODAY)}
+        self.assertTrue(annotated[self.late[0].pk])
+        self.assertFalse(annotated[self.on_time.pk])
+
+    def test_reminders_are_sent_once_per_day(self):
+        run = process_overdue(chunk_size=2, today=TODAY)
+        self.assertEqual((run.loans, run.skipped, run.chunks), (4, 1, 2))
+        self.assertEqual(run.emails, len(mail.outbox))
+        self.assertTrue(all(message.to == ['reader@example.com'] for message in mail.outbox))
+        self.assertIn('The Hobbit', mail.outbox[0].body)
+        self.assertEqual(OverdueRun.objects.count(), 1)
+
+        mail.outbox.clear()
+        run = process_overdue(today=TODAY)
+        self.assertEqual((run.loans, len(mail.outbox)), (0, 0))
+
+        run = process_overdue(today=TODAY + datetime.timedelta(days=1))
+        self.assertEqual(run.loans, 5)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('process_overdue_loans', '--chunk-size', '10', stdout=out)
+        self.assertIn('overdue loans', out.getvalue())
+        self.assertEqual(OverdueRun.objects.count(), 1)
+
+    def test_borrowed_list_marks_overdue_loans(self):
+        librarian = User.objects.create_user(username='librarian', password='3HJ1vRV0Z&3iD')
+        librarian.user_permissions.add(*Permission.objects.filter(codename__in=['can_view_borrowed', 'can_mark_returned']))
+        self.client.login(username='librarian', password='3HJ1vRV0Z&3iD')
+        response = self.client.get('/catalog/borrowed')
+        self.assertContains(response, '<strong>borrower: </strong>', count=5)
+        self.assertContains(response, 'Renew', count=5)
@@ -0,0 +1,85 @@
+import os
+import tempfile
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from catalog import profiling
+from catalog.models import Author
+
+
+class HistogramTest(TestCase):
+    def test_quantiles(self):
+        histogram = profiling.Histogram((1, 2, 4))
+        for value in (0.5, 1.5, 1.5, 3, 10):
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [1, 2, 1, 1])
+        self.assertEqual(histogram.count, 5)
+        self.assertEqual(histogram.sum, 16.5)
+        self.assertEqual(histogram.quantile(0.2), 1)
+        self.assertEqual(histogram.quantile(0.5), 1.75)
+        # In the +Inf bucket: its lower bound
+        self.assertEqual(histogram.quantile(0.99), 4)
+        self.assertEqual(profiling.Histogram((1,)).quantile(0.5), 0)
+
+
+@override_settings(CATALOG_PROFILING_SAMPLE_RATE=1.0)
+class ProfilingMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Author.objects.create(first_name='John', last_name='Smith')
+        cls.staff = User.objects.create_user(username='staff', password='2HJ1vRV0Z&3iD', is_staff=True)
+
+    def setUp(self):
+        profiling.registry.reset()
+
+    def test_sampled_request(self):
+        response = self.client.get(reverse('author'))
+        stats = profiling.registry.snapshot()['author']
+        self.assertEqual(stats.requests, 1)
+        histograms = stats.histograms
+        self.assertEqual(histograms['duration_seconds'].count, 1)
+        self.assertGreater(histograms['sql_queries'].sum, 0)
+        self.assertGreater(histograms['template_seconds'].sum, 0)
+        self.assertLess(histograms['template_seconds'].sum, histograms['duration_seconds'].sum)
+        self.assertEqual(histograms['response_bytes'].sum, len(response.content))
+
+    @override_settings(CATALOG_PROFILING_SAMPLE_RATE=0.0)
+    def test_not_sampled_request_only_counted(self):
+        self.client.get(reverse('author'))
+        self.client.get('/catalog/nothing-here/')
+        snapshot = profiling.registry.snapshot()
+        self.assertEqual(snapshot['author'].requests, 1)
+        self.assertEqual(snapshot['author'].histograms['duration_seconds'].count, 0)
+        self.assertEqual(snapshot['unresolved'].requests, 1)
+
+    def test_dashboard_staff_only(self):
+        self.client.get(reverse('author'))
+        self.assertEqual(self.client.get(reverse('profiling')).status_code, 302)
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('profiling'))
+        self.assertContains(response, '<td>author</td>', html=False)
+
+    @override_settings(CATALOG_METRICS_TOKEN='secret')
+    def test_metrics(self):
+        self.client.get(reverse('author'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        pid = os.getpid()
+        self.assertIn(f'catalog_requests_total{{view="author",pid="{pid}"}} 1', text)
+        self.assertIn(f'catalog_request_duration_seconds_bucket{{view="author",pid="{pid}",le="+Inf"}} 1', text)
+        self.assertIn('# TYPE catalog_request_sql_queries histogram', text)
+
+    def test_slow_requests_dumped(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(CATALOG_PROFILING_DUMP_DIR=directory, CATALOG_PROFILING_SLOW_SECONDS=0):
+                self.client.get(reverse('author'))
+            with override_settings(CATALOG_PROFILING_DUMP_DIR=directory, CATALOG_PROFILING_SLOW_SECONDS=60):
+                self.client.get(reverse('author'))
+            dumps = os.listdir(directory)
+        self.assertEqual(len(dumps), 1)
+        self.assertRegex(dumps[0], r'-author-\d+ms\.prof$')
@@ -0,0 +1,176 @@
+"""
+Query-count and wall-clock budgets for every page of the site.
+
+Each named route of catalog.urls, every DRF router endpoint and every admin
+changelist is requested against a deterministic dataset, and the number of
+SQL queries and the time taken are compared with the budgets checked in to
+query_budgets.json.
+
+After an intended change, regenerate the file with:
+
+    CATALOG_UPDATE_BUDGETS=1 python manage.py test catalog.tests.test_query_budgets
+"""
+import datetime
+import json
+import os
+import time
+from pathlib import Path
+
+from django.contrib import admin
+from django.contrib.auth.models import Group, Permission, User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.urls import URLPattern, reverse
+
+from catalog import urls as catalog_urls
+from catalog.models import Author, Book, BookInstance, Genre
+from catalog.tests.utils import CaptureQueriesContext
+from locallibrary.urls import router
+
+BUDGETS_FILE = Path(__file__).with_name('query_budgets.json')
+
+# Wall-clock budgets are written with this much headroom over the measured
+# time, and never below MIN_MILLISECONDS, so that slow CI machines pass.
+TIME_HEADROOM = 5
+MIN_MILLISECONDS = 250
+
+NUMBER_OF_AUTHORS = 20
+NUMBER_OF_GENRES = 8
+BOOKS_PER_AUTHOR = 5
+COPIES_PER_BOOK = 10
+
+LIBRARIAN_PERMISSIONS = [
+    'can_mark_returned', 'can_view_borrowed',
+    'view_author', 'add_author', 'change_author', 'delete_author',
+    'view_book', 'add_book', 'change_book', 'delete_book',
+    'view_bookinstance', 'change_bookinstance', 'view_genre',
+    'view_user', 'view_group', 'view_overduerun',
+]
+
+
+def create_dataset():
+    """ Create a deterministic catalog of authors, books and copies. """
+    genres = [Genre.objects.create(name=f'Genre {i}') for i in range(NUMBER_OF_GENRES)]
+    genres[0].name = 'Science Fiction'
+    genres[0].save()
+
+    borrower = User.objects.create_user(username='borrower', password='1X<ISRUkw+tuK')
+    librarian = User.objects.create_user(username='librarian', password='2HJ1vRV0Z&3iD', is_staff=True)
+    librarians = Group.objects.create(name='Librarians')
+    librarians.permissions.set(Permission.objects.filter(codename__in=LIBRARIAN_PERMISSIONS))
+    librarian.groups.add(librarians)
+
+    authors = [
+        Author.objects.create(first_name=f'First {i}', last_name=f'Last {i:03}', date_of_birth=datetime.date(1900 + i, 1, 1))
+        for i in range(NUMBER_OF_AUTHORS)
+    ]
+    statuses = ['a', 'o', 'm', 'r']
+    for author_index, author in enumerate(authors):
+        for book_index in range(BOOKS_PER_AUTHOR):
+            number = author_index * BOOKS_PER_AUTHOR + book_index
+            book = Book.objects.create(
+                title=f'Book {number:04}',
+                summary=f'Summary of book {number}',
+                isbn=f'{number:013}',
+                author=author,
+            )
+            book.genre.set([genres[number % NUMBER_OF_GENRES], genres[(number + 3) % NUMBER_OF_GENRES]])
+            BookInstance.objects.bulk_create([
+                BookInstance(
+                    book=book,
+                    imprint=f'Imprint {copy}',
+                    status=statuses[copy % len(statuses)],
+                    due_back=datetime.date(2030, 1, 1) + datetime.timedelta(days=copy),
+                    borrower=borrower if statuses[copy % len(statuses)] == 'o' else None,
+                )
+                for copy in range(COPIES_PER_BOOK)
+            ])
+    return librarian
+
+
+# URL arguments of the routes not taking a primary key
+ROUTE_KWARGS = {
+    'export': {'name': 'books', 'file_format': 'csv'},
+}
+
+
+def route_urls():
+    """ Yield (budget name, url) for every page covered by the budgets. """
+    objects = {
+        'book': Book.objects.order_by('pk').first().pk,
+        'books': Book.objects.order_by('pk').first().pk,
+        'author': Author.objects.order_by('pk').first().pk,
+        'renew': BookInstance.objects.filter(status='o').order_by('pk').first().pk,
+    }
+    for pattern in catalog_urls.urlpatterns:
+        if not isinstance(pattern, URLPattern) or not pattern.name:
+            continue
+        kwargs = ROUTE_KWARGS.get(pattern.name, {})
+        if 'pk' in pattern.pattern.converters:
+            kwargs = {'pk': objects[pattern.name.replace('async-', '').split('-')[0]]}
+        yield f'catalog:{pattern.name}', reverse(pattern.name, kwargs=kwargs)
+
+    api_objects = {
+        'user': User.objects.order_by('pk').first().pk,
+        'group': Group.objects.order_by('pk').first().pk,
+        'api-book': objects['book'],
+        'api-genre': Genre.objects.order_by('pk').first().pk,
+        'api-author': objects['author'],
+    }
+    for prefix, viewset, basename in router.registry:
+        if not hasattr(viewset, 'list'):
+            # Action-only viewsets (loans) have no pages to GET.
+            continue
+        basename = basename or router.get_default_basename(viewset)
+        yield f'api:{basename}-list', reverse(f'{basename}-list')
+        yield f'api:{basename}-detail', reverse(f'{basename}-detail', args=[api_objects[basename]])
+
+    for model in admin.site._registry:
+        opts = model._meta
+        name = f'{opts.app_label}_{opts.model_name}_changelist'
+        yield f'admin:{name}', reverse(f'admin:{name}')
+
+
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.librarian = create_dataset()
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+
+    def measure(self, url):
+        # Warm up template loading and the caches first, so the budgets
+        # describe the steady state.
+        self.client.get(url)
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        elapsed = (time.perf_counter() - start) * 1000
+        self.assertLess(response.status_code, 400, url)
+        return len(queries), elapsed
+
+    def test_budgets(self):
+        measured = {name: self.measure(url) for name, url in route_urls()}
+
+        if os.environ.get('CATALOG_UPDATE_BUDGETS'):
+            budgets = {
+                name: {
+                    'queries': queries,
+                    'milliseconds': max(MIN_MILLISECONDS, round(elapsed * TIME_HEADROOM)),
+                }
+                for name, (queries, elapsed) in sorted(measured.items())
+            }
+            BUDGETS_FILE.write_text(json.dumps(budgets, indent=2) + '\n')
+            return
+
+        budgets = json.loads(BUDGETS_FILE.read_text())
+        for name, (queries, elapsed) in measured.items():
+            with self.subTest(name):
+                self.assertIn(name, budgets, 'No budget recorded, regenerate query_budgets.json')
+                self.assertLessEqual(queries, budgets[name]['queries'], 'SQL query budget exceeded')
+                self.assertLessEqual(elapsed, budgets[name]['milliseconds'], 'Wall-clock budget exceeded')
@@ -0,0 +1,140 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import router
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.views import View
+
+from catalog import counters, fragments, routers, versions
+from catalog.APIviews import BookViewSet
+from catalog.middleware import PIN_SESSION_KEY, ReplicaMiddleware
+from catalog.models import Author, Book
+
+
+@routers.replica_reads
+def read_view(request):
+    return HttpResponse(router.db_for_read(Book))
+
+
+def primary_view(request):
+    return HttpResponse(router.db_for_read(Book))
+
+
+@routers.replica_reads
+def write_view(request):
+    Author.objects.create(first_name='John', last_name='Smith')
+    return HttpResponse(router.db_for_read(Book))
+
+
+@routers.replica_reads
+@versions.conditional(Book)
+def conditional_view(request):
+    return HttpResponse(router.db_for_read(Book))
+
+
+@routers.replica_reads
+def counters_view(request):
+    return HttpResponse(counters.get_counters()['num_books'])
+
+
+class ReadView(View):
+    replica_reads = True
+
+    def get(self, request):
+        return HttpResponse(router.db_for_read(Book))
+
+
+@override_settings(CATALOG_REPLICAS=['replica1'], CATALOG_REPLICA_PIN_SECONDS=10)
+class ReplicaRouterTest(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.cookies = {}
+
+    def request(self, view, method='get'):
+        return self.get_response(view, method).content.decode()
+
+    def get_response(self, view, method='get'):
+        """ Run ``view`` behind the session and replica middlewares, keeping the session cookie. """
+        replica = ReplicaMiddleware(lambda request: view(request))
+
+        def get_response(request):
+            return replica.process_view(request, view, (), {}) or view(request)
+
+        request = getattr(self.factory, method)('/')
+        request.COOKIES.update(self.cookies)
+        request.user = AnonymousUser()
+        response = SessionMiddleware(lambda request: ReplicaMiddleware(get_response)(request))(request)
+        self.cookies.update({name: morsel.value for name, morsel in response.cookies.items()})
+        return response
+
+    def test_primary_outside_requests(self):
+        self.assertEqual(router.db_for_read(Book), 'default')
+        self.assertEqual(router.db_for_write(Book), 'default')
+
+    def test_marked_views_read_from_replica(self):
+        self.assertEqual(self.request(read_view), 'replica1')
+        self.assertEqual(self.request(ReadView.as_view()), 'replica1')
+        self.assertEqual(self.request(primary_view), 'default')
+        self.assertEqual(self.request(read_view, 'post'), 'default')
+
+    @override_settings(CATALOG_REPLICAS=[])
+    def test_no_replica(self):
+        self.assertEqual(self.request(read_view), 'default')
+
+    def test_viewset_actions(self):
+        self.assertTrue(routers.wants_replica(BookViewSet.as_view({'get': 'list'}), 'GET'))
+        self.assertTrue(routers.wants_replica(BookViewSet.as_view({'get': 'retrieve'}), 'HEAD'))
+        self.assertFalse(routers.wants_replica(BookViewSet.as_view({'post': 'create'}), 'POST'))
+        self.assertFalse(routers.wants_replica(BookViewSet.as_view({'get': 'bulk_write'}), 'GET'))
+
+    def test_session_reads_its_writes(self):
+        # The write itself happens on the primary, then the session is pinned to it
+        self.assertEqual(self.request(write_view), 'replica1')
+        self.assertEqual(Author.objects.count(), 1)
+        self.assertEqual(self.request(read_view), 'default')
+
+        session = Session.objects.get().get_decoded()
+        self.assertAlmostEqual(session[PIN_SESSION_KEY], time.time() + 10, delta=2)
+        # Another session is not pinned
+        self.cookies = {}
+        self.assertEqual(self.request(read_view), 'replica1')
+
+    def test_pin_expires(self):
+        self.request(write_view)
+        with override_settings(CATALOG_REPLICA_PIN_SECONDS=-1):
+            self.request(write_view)
+        self.assertEqual(self.request(read_view), 'replica1')
+
+    def test_sessions_read_from_primary(self):
+        token = routers.start_request()
+        try:
+            routers.use_replica()
+            self.assertEqual(router.db_for_read(Book), 'replica1')
+            self.assertEqual(router.db_for_read(Session), 'default')
+            # Short-lived: the replica may lag behind the fragment versions
+            self.assertEqual(fragments._timeout(), 10)
+        finally:
+            self.assertFalse(routers.end_request(token))
+        self.assertEqual(router.db_for_read(Book), 'default')
+
+    def test_no_conditional_get_from_replica(self):
+        response = self.get_response(conditional_view)
+        self.assertEqual(response.content, b'replica1')
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
+
+        self.request(write_view)
+        # Pinned to the primary, which has the versions' data
+        response = self.get_response(conditional_view)
+        self.assertEqual(response.content, b'default')
+        self.assertTrue(response.has_header('ETag'))
+
+    def test_counters_computed_on_primary(self):
+        # There is no replica1 database: a count read from it would fail
+        Book.objects.create(title='Book', summary='Summary', isbn='1')
+        cache.clear()
+        self.assertEqual(self.request(counters_view), '1')
@@ -0,0 +1,72 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from catalog import search
+from catalog.models import Author, Book, Genre
+
+class SearchTest(TestCase):
+    def setUp(self):
+        self.tolkien = Author.objects.create(first_name='John', last_name='Tolkien')
+        self.fantasy = Genre.objects.create(name='Fantasy')
+        self.hobbit = Book.objects.create(
+            title='The Hobbit', summary='A dragon guards a mountain of gold.', isbn='9780261102217', author=self.tolkien)
+        self.hobbit.genre.add(self.fantasy)
+        self.silmarillion = Book.objects.create(
+            title='The Silmarillion', summary='Elves and a hobbit named nobody.', isbn='9780261102736', author=self.tolkien)
+
+    def titles(self, query):
+        return [book.title for book in search.search(query)[:10]]
+
+    def test_ranks_title_matches_first(self):
+        self.assertEqual(self.titles('hobbit'), ['The Hobbit', 'The Silmarillion'])
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.titles('tolkien dragon'), ['The Hobbit'])
+        self.assertEqual(search.search('tolkien dragon').count(), 1)
+
+    def test_empty_query(self):
+        self.assertEqual(self.titles(''), [])
+
+    def test_index_follows_changes(self):
+        self.assertEqual(self.titles('fantasy'), ['The Hobbit'])
+        self.silmarillion.genre.add(self.fantasy)
+        self.assertEqual(len(self.titles('fantasy')), 2)
+
+        self.fantasy.name = 'Epic'
+        self.fantasy.save()
+        self.assertEqual(self.titles('fantasy'), [])
+        self.assertEqual(len(self.titles('epic')), 2)
+
+        self.tolkien.last_name = 'Lewis'
+        self.tolkien.save()
+        self.assertEqual(len(self.titles('lewis')), 2)
+
+        self.hobbit.delete()
+        self.assertEqual(self.titles('dragon'), [])
+
+    def test_search_page(self):
+        response = self.client.get(reverse('search') + '?q=dragon')
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'catalog/search_results.html')
+        self.assertEqual(list(response.context['book_list']), [self.hobbit])
+
+    def test_search_api(self):
+        User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+        response = self.client.get(reverse('api-search') + '?q=hobbit')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(response.data['results'][0]['title'], 'The Hobbit')
+
+
+class InvertedIndexSearchTest(SearchTest):
+    """ The same tests against the index used on databases without FTS5. """
+
+    def setUp(self):
+        patcher = mock.patch('catalog.search.uses_fts', return_value=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super().setUp()
@@ -0,0 +1,124 @@
+from unittest import mock
+
+from django.contrib.auth.models import Permission, User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from catalog import versions
+from catalog.models import Author, Book, BookInstance, Genre
+from catalog.signals import bulk_changed
+
+
+class VersionsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_changes_only_the_given_table(self):
+        before = versions.get_versions(Book, Author)
+        versions.bump(Book)
+        after = versions.get_versions(Book, Author)
+        self.assertGreater(after['catalog.book'], before['catalog.book'])
+        self.assertEqual(after['catalog.author'], before['catalog.author'])
+
+    def test_signals_bump_versions(self):
+        before = versions.get_versions(Book, Genre, BookInstance)
+        with self.captureOnCommitCallbacks(execute=True):
+            book = Book.objects.create(title='Book', summary='Summary', isbn='1')
+        self.assertGreater(versions.get_versions(Book)['catalog.book'], before['catalog.book'])
+
+        before = versions.get_versions(Book)
+        with self.captureOnCommitCallbacks(execute=True):
+            book.genre.add(Genre.objects.create(name='Fantasy'))
+        self.assertGreater(versions.get_versions(Book)['catalog.book'], before['catalog.book'])
+
+        before = versions.get_versions(BookInstance)
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_changed.send(sender=BookInstance, pks=[], created=True)
+        self.assertGreater(versions.get_versions(BookInstance)['catalog.bookinstance'], before['catalog.bookinstance'])
+
+    def test_bumped_on_commit(self):
+        before = versions.get_versions(Author)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Author.objects.create(first_name='John', last_name='Smith')
+            # Requests reading the old rows keep the old version
+            self.assertEqual(versions.get_versions(Author), before)
+        for callback in callbacks:
+            callback()
+        self.assertGreater(versions.get_versions(Author)['catalog.author'], before['catalog.author'])
+
+    def test_concurrent_bumps_give_different_versions(self):
+        # Two bumps in the same microsecond
+        with mock.patch('catalog.versions._now', return_value=10 ** 15):
+            versions.bump(Book)
+            first = versions.get_versions(Book)['catalog.book']
+            versions.bump(Book)
+            self.assertNotEqual(versions.get_versions(Book)['catalog.book'], first)
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        User.objects.create_user(username='testuser2', password='2HJ1vRV0Z&3iD')
+        cls.author = Author.objects.create(first_name='John', last_name='Smith')
+        cls.book = Book.objects.create(title='Book', summary='Summary', isbn='1', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+
+    def assertNotModifiedUntil(self, url, change):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_book_detail(self):
+        self.assertNotModifiedUntil(
+            self.book.get_absolute_url(),
+            lambda: BookInstance.objects.create(book=self.book, imprint='Imprint', status='a'),
+        )
+
+    def test_book_list(self):
+        self.assertNotModifiedUntil(reverse('books'), lambda: Book.objects.create(title='New', summary='S', isbn='2'))
+
+    def test_author_detail(self):
+        def rename():
+            self.author.last_name = 'Jones'
+            self.author.save()
+        self.assertNotModifiedUntil(self.author.get_absolute_url(), rename)
+
+    def test_api_list(self):
+        self.assertNotModifiedUntil(
+            reverse('api-book-list'),
+            lambda: self.book.genre.add(Genre.objects.create(name='Fantasy')),
+        )
+
+    def test_permission_changes(self):
+        self.assertNotModifiedUntil(
+            self.book.get_absolute_url(),
+            lambda: self.user.user_permissions.add(Permission.objects.get(codename='can_mark_returned')),
+        )
+
+    def test_etag_depends_on_user(self):
+        etag = self.client.get(reverse('books'))['ETag']
+        self.client.login(username='testuser2', password='2HJ1vRV0Z&3iD')
+        response = self.client.get(reverse('books'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_no_etag_from_a_process_local_cache(self):
+        response = self.client.get(reverse('books'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
@@ -43,6 +43,30 @@ class AuthorListViewTest(TestCase):
         self.assertTrue(response.context['is_paginated'] == True)
         self.assertTrue(len(response.context['author_list']) == 3)
 
+    def test_cursor_pagination_walks_all_authors(self):
+        response = self.client.get(reverse('author'))
+        self.assertIsNone(response.context['page_obj'].previous_cursor)
+        authors = list(response.context['author_list'])
+
+        next_cursor = response.context['page_obj'].next_cursor
+        response = self.client.get(reverse('author') + f'?cursor={next_cursor}')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['page_obj'].has_next())
+        authors += response.context['author_list']
+        self.assertEqual(authors, list(Author.objects.order_by('last_name', 'first_name', 'id')))
+
+        previous_cursor = response.context['page_obj'].previous_cursor
+        response = self.client.get(reverse('author') + f'?cursor={previous_cursor}')
+        self.assertEqual(list(response.context['author_list']), authors[:5])
+
+    def test_cursor_pagination_does_not_count(self):
+        response = self.client.get(reverse('author'))
+        self.assertIsNone(response.context['paginator'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('author') + '?cursor=garbage')
+        self.assertEqual(response.status_code, 404)
+
 import datetime
 
 from django.utils import timezone
@@ -104,7 +128,7 @@ class LoanedBookInstancesByUserListViewTest(TestCase):
         # Check we used correct template
         self.assertTemplateUsed(response, 'catalog/bookinstance_list_borrowed_user.html')
 
-def test_only_borrowed_books_in_list(self):
+    def test_only_borrowed_books_in_list(self):
         login = self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
         response = self.client.get(reverse('my-borrowed'))
 
@@ -161,4 +185,159 @@ def test_only_borrowed_books_in_list(self):
                 last_date = book.due_back
             else:
                 self.assertTrue(last_date <= book.due_back)
-                last_date = book.due_back
\ No newline at end of file
+                last_date = book.due_back
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.db import connection
+from catalog.tests.utils import CaptureQueriesContext
+
+class BookDetailViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        test_author = Author.objects.create(first_name='John', last_name='Smith')
+        Genre.objects.create(name='Fantasy')
+        Genre.objects.create(name='Science Fiction')
+        cls.test_book = Book.objects.create(
+            title='Book Title',
+            summary='My book summary',
+            isbn='ABCDEFG',
+            author=test_author,
+        )
+        cls.test_book.genre.set(Genre.objects.all())
+
+        cls.librarian = User.objects.create_user(username='librarian', password='2HJ1vRV0Z&3iD')
+        cls.librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+
+    def add_copies(self, number_of_copies):
+        BookInstance.objects.bulk_create([
+            BookInstance(book=self.test_book, imprint='Unlikely Imprint, 2016', status='a')
+            for book_copy in range(number_of_copies)
+        ])
+
+    def count_queries(self):
+        # Measure a full render, without the fragment cache.
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('book-detail', args=[self.test_book.pk]))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_view_url_exists_at_desired_location(self):
+        response = self.client.get(f'/catalog/books/{self.test_book.pk}')
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'catalog/book_detail.html')
+
+    def test_copies_are_paginated(self):
+        self.add_copies(25)
+        response = self.client.get(reverse('book-detail', args=[self.test_book.pk]) + '?page=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['copies']), 5)
+
+    def test_query_count_does_not_grow_with_copies(self):
+        self.add_copies(5)
+        few_copies = self.count_queries()
+        self.add_copies(200)
+        self.assertEqual(few_copies, self.count_queries())
+
+    def test_librarian_query_count_does_not_grow_with_copies(self):
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+        self.add_copies(5)
+        few_copies = self.count_queries()
+        self.add_copies(200)
+        self.assertEqual(few_copies, self.count_queries())
+        response = self.client.get(reverse('book-detail', args=[self.test_book.pk]))
+        self.assertContains(response, 'Renew', count=20)
+
+class BorrowedListViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.librarian = User.objects.create_user(username='librarian', password='2HJ1vRV0Z&3iD')
+        cls.librarian.user_permissions.add(Permission.objects.get(codename='can_view_borrowed'))
+        test_book = Book.objects.create(title='Book Title', summary='My book summary', isbn='ABCDEFG')
+        for book_copy in range(25):
+            # A few loans without a due date, which sort first
+            due_back = None if book_copy % 7 == 0 else datetime.date(2030, 1, 1) + datetime.timedelta(days=book_copy % 4)
+            BookInstance.objects.create(book=test_book, imprint='Unlikely Imprint, 2016', due_back=due_back, status='o')
+
+    def test_cursor_pagination_with_null_due_dates(self):
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+        response = self.client.get(reverse('borrowed'))
+        copies = list(response.context['bookinstance_list'])
+        while response.context['page_obj'].has_next():
+            response = self.client.get(reverse('borrowed') + f"?cursor={response.context['page_obj'].next_cursor}")
+            copies += response.context['bookinstance_list']
+        self.assertEqual(len(copies), 25)
+        self.assertEqual(len(set(copy.pk for copy in copies)), 25)
+        due_dates = [copy.due_back for copy in copies]
+        self.assertEqual(due_dates[:4], [None] * 4)
+        self.assertEqual(due_dates[4:], sorted(due_dates[4:]))
+
+
+class AuthorDetailViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='John', last_name='Smith')
+        cls.genres = [Genre.objects.create(name=name) for name in ('Fantasy', 'Poetry')]
+        Author.objects.create(first_name='Other', last_name='Author')
+
+    def setUp(self):
+        cache.clear()
+
+    def add_works(self, number_of_works):
+        start = self.author.book_set.count()
+        for number in range(start, start + number_of_works):
+            book = Book.objects.create(title=f'Work {number:03}', summary='Summary', isbn=str(number), author=self.author)
+            book.genre.set(self.genres)
+            BookInstance.objects.create(book=book, imprint='Imprint', status='a')
+            BookInstance.objects.create(book=book, imprint='Imprint', status='o')
+
+    def count_queries(self, url=None):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url or self.author.get_absolute_url())
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_works_of_the_author_only(self):
+        Book.objects.create(title='Not mine', summary='Summary', isbn='X', author=Author.objects.get(first_name='Other'))
+        self.add_works(2)
+        response = self.client.get(self.author.get_absolute_url())
+        self.assertEqual([work.title for work in response.context['works']], ['Work 000', 'Work 001'])
+        self.assertContains(response, '1 of 2 copies available', count=2)
+        self.assertContains(response, 'Fantasy, Poetry', count=2)
+
+    def test_works_are_paginated(self):
+        self.add_works(25)
+        response = self.client.get(self.author.get_absolute_url() + '?page=2')
+        self.assertEqual(len(response.context['works']), 5)
+        self.assertEqual(response.context['works'][0].title, 'Work 020')
+
+    def test_query_count_does_not_grow_with_works(self):
+        self.add_works(2)
+        few_works = self.count_queries()
+        self.add_works(18)
+        self.assertEqual(few_works, self.count_queries())
+
+
+from django.conf import settings
+
+
+class IndexViewTest(TestCase):
+    def test_visits_counted_without_database_write(self):
+        for number in (1, 2, 3):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('index'))
+            self.assertEqual(response.context['num_visits'], number)
+            self.assertFalse([query for query in queries if not query['sql'].startswith('SELECT')])
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+    def test_tampered_count_ignored(self):
+        self.client.cookies['num_visits'] = '100'
+        self.assertEqual(self.client.get(reverse('index')).context['num_visits'], 1)
+
+    def test_count_kept_from_session(self):
+        session = self.client.session
+        session['num_visits'] = 7
+        session.save()
+        self.assertEqual(self.client.get(reverse('index')).context['num_visits'], 7)
+        self.assertEqual(self.client.get(reverse('index')).context['num_visits'], 8)
@@ -0,0 +1,43 @@
+from django.db import connection
+from django.test import utils
+
+from catalog import caches
+
+
+class CaptureQueriesContext(utils.CaptureQueriesContext):
+    """ CaptureQueriesContext leaving out the queries of the database cache. """
+
+    def __init__(self, connection=connection):
+        super().__init__(connection)
+
+    @property
+    def captured_queries(self):
+        table = caches.table_name()
+        queries = super().captured_queries
+        if table is None:
+            return queries
+        kept, savepoints = [], []
+        for query in queries:
+            sql = query['sql']
+            if sql.startswith('SAVEPOINT '):
+                # Dropped with its release if it only wrapped cache queries
+                savepoints.append(len(kept))
+                kept.append(query)
+            elif sql.startswith(('RELEASE SAVEPOINT ', 'ROLLBACK TO SAVEPOINT ')) and savepoints:
+                start = savepoints.pop()
+                if len(kept) == start + 1:
+                    kept.pop()
+                else:
+                    kept.append(query)
+            elif table not in sql:
+                kept.append(query)
+        return kept
+
+    def __len__(self):
+        return len(self.captured_queries)
+
+    def __getitem__(self, index):
+        return self.captured_queries[index]
+
+    def __iter__(self):
+        return iter(self.captured_queries)
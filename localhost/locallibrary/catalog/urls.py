@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views, APIviews
+from . import async_views, views, APIviews
 
 urlpatterns = [
     path('api/1', APIviews.api, name='api'),
@@ -8,6 +8,7 @@ urlpatterns = [
     path('books/<int:pk>', views.BookDetailView.as_view(), name='book-detail'),
     path('author/', views.AuthorListView.as_view(), name='author'),
     path('author/<int:pk>', views.AuthorDetailView.as_view(), name='author-detail'),
+    path('search/', views.SearchView.as_view(), name='search'),
     # path('myurl/<int:fish>', views.my_view, {'my_template_name': 'some_path'}, name='aurl'),
 ]
 
@@ -16,6 +17,10 @@ urlpatterns += [
     path('borrowed', views.BorrowedListView.as_view(), name='borrowed')
 ]
 
+urlpatterns += [
+    path('export/<str:name>.<str:file_format>', views.export, name='export'),
+]
+
 urlpatterns += [
     path('book/<uuid:pk>/renew/', views.renew_book_librarian, name='renew-book-librarian'),
 ]
@@ -31,3 +36,17 @@ urlpatterns += [
     path('books/<int:pk>/update/', views.BookUpdate.as_view(), name='book-update'),
     path('books/<int:pk>/delete/', views.BookDelete.as_view(), name='book-delete'),
 ]
+
+urlpatterns += [
+    path('profiling/', views.profiling_dashboard, name='profiling'),
+    path('metrics/', views.metrics, name='metrics'),
+]
+
+# Asynchronous versions of the read-only pages, for ASGI servers
+urlpatterns += [
+    path('async/', async_views.index, name='async-index'),
+    path('async/books/', async_views.book_list, name='async-books'),
+    path('async/books/<int:pk>', async_views.book_detail, name='async-book-detail'),
+    path('async/author/', async_views.author_list, name='async-author'),
+    path('async/api/1', async_views.api, name='async-api'),
+]
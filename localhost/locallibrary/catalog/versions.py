@@ -0,0 +1,197 @@
+"""
+Per-table version numbers, for cheap HTTP conditional GET.
+
+Every catalog table has a version kept in the cache and changed from model
+signals and catalog.signals.bulk_changed whenever one of its rows is
+written. A version is a timestamp in microseconds, made to grow by at least
+one on every change, so the versions of the tables a page is built from
+give both its ETag and its Last-Modified date without rendering anything.
+
+Parts of single objects (a book's copies, an author's works...) have
+versions too, used to key the fragment cache (catalog.fragments).
+
+The receivers bump the versions once the write commits: a version bumped
+before would be seen by requests still reading the old rows, which would
+then be served under it.
+
+A missing version (cold or cleared cache) is set to the current time, which
+is newer than any version handed out before. Every version handed out is
+first claimed with ``cache.add``, so that two bumps never give the same
+version to different data.
+
+The versions are bumped in the cache of the process handling the write, so
+they are only handed out when the cache is shared by the worker processes
+(catalog.caches): with a per-process cache, conditional() sends no ETag or
+Last-Modified date and the fragments are not cached.
+"""
+import datetime
+import hashlib
+import time
+
+from django.contrib.auth.models import Group, Permission, User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.views.decorators.http import condition
+
+from catalog import caches, signals
+from catalog.routers import reading_from_replica
+from catalog.models import Author, Book, BookInstance, Genre
+
+CACHE_PREFIX = 'catalog:version:'
+CLAIM_PREFIX = 'catalog:version-claim:'
+
+# Seconds a version stays claimed: versions are times, so only a clock going
+# back by as much could hand one out again.
+CLAIM_TIMEOUT = 60
+
+# Version of the users, groups and permissions: pages show what the user
+# may do.
+AUTH = 'auth'
+
+
+def _key(name):
+    return CACHE_PREFIX + name
+
+
+def _name(model):
+    return model if isinstance(model, str) else model._meta.label_lower
+
+
+def _now():
+    return time.time_ns() // 1000
+
+
+def _claim(key):
+    """ Return a version for ``key`` no other caller got: the current time or just after. """
+    version = _now()
+    while not cache.add(f'{CLAIM_PREFIX}{key}:{version}', True, CLAIM_TIMEOUT):
+        version += 1
+    return version
+
+
+def get_versions(*models):
+    """ Return the current versions of ``models`` (models or names), by name. """
+    names = [_name(model) for model in models]
+    cached = cache.get_many([_key(name) for name in names])
+    versions, missing = {}, {}
+    for name in names:
+        version = cached.get(_key(name))
+        if version is None:
+            version = missing[_key(name)] = _claim(_key(name))
+        versions[name] = version
+    if missing:
+        cache.set_many(missing, None)
+    return versions
+
+
+def bump(*models):
+    """ Record a change to the tables of ``models``. """
+    keys = [_key(name) for name in map(_name, models)]
+    cache.set_many({key: _claim(key) for key in keys}, None)
+
+
+def bump_on_commit(*models):
+    """ bump() once the current transaction commits (at once outside of one). """
+    transaction.on_commit(lambda: bump(*models))
+
+
+def object_key(name, pk):
+    return f'{CACHE_PREFIX}{name}:{pk}'
+
+
+def get_object_version(name, pk):
+    """
+    Return the version of the object part ``name`` (e.g. 'book-copies') of
+    the object ``pk``.
+    """
+    key = object_key(name, pk)
+    version = cache.get(key)
+    if version is None:
+        version = _claim(key)
+        cache.set(key, version, None)
+    return version
+
+
+def bump_objects(name, pks):
+    """ Record a change to the object part ``name`` of the objects ``pks``. """
+    # Dropping the versions is enough: they come back as the current time.
+    cache.delete_many([object_key(name, pk) for pk in set(pks) if pk is not None])
+
+
+def etag(request, versions):
+    """ ETag of the response to ``request`` built from ``versions``. """
+    user = request.user.pk if request.user.is_authenticated else ''
+    # Loans show as overdue from a date on, so the date is part of the tag.
+    parts = [request.get_full_path(), request.META.get('HTTP_ACCEPT', ''), str(user), str(datetime.date.today())]
+    parts += [f'{name}={version}' for name, version in sorted(versions.items())]
+    return hashlib.md5('\n'.join(parts).encode()).hexdigest()
+
+
+def conditional(*models):
+    """
+    View decorator answering conditional GETs with 304 Not Modified while
+    none of the tables of ``models`` (and the auth tables) changed.
+
+    The view must depend only on those tables, the URL and the user.
+    Requests read from a replica (catalog.routers) get neither an ETag nor a
+    Last-Modified date: the replica may not have caught up with the
+    versions yet, and its rows would be tagged as the newer ones. Nor do
+    they when the cache is not shared, as the other processes would not see
+    the bumps.
+    """
+    def tagged():
+        return caches.shared() and not reading_from_replica()
+
+    def versions(request):
+        # Computed once per request for both callbacks.
+        if not hasattr(request, '_catalog_versions'):
+            request._catalog_versions = get_versions(AUTH, *models)
+        return request._catalog_versions
+
+    def etag_func(request, *args, **kwargs):
+        if not tagged():
+            return None
+        return etag(request, versions(request))
+
+    def last_modified_func(request, *args, **kwargs):
+        if not tagged():
+            return None
+        return datetime.datetime.fromtimestamp(max(versions(request).values()) / 1e6, tz=datetime.timezone.utc)
+
+    return condition(etag_func=etag_func, last_modified_func=last_modified_func)
+
+
+def saved(sender, **kwargs):
+    bump_on_commit(sender)
+
+
+def book_genre_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_on_commit(Book)
+
+
+def auth_changed(sender, update_fields=None, action=None, **kwargs):
+    # Once the memberships or permissions changed, not before
+    if action is not None and not action.startswith('post_'):
+        return
+    # Logging in saves last_login, which no page shows.
+    if update_fields != frozenset(['last_login']):
+        bump_on_commit(AUTH)
+
+
+def bulk_changed(sender, **kwargs):
+    bump_on_commit(Book if sender is Book.genre.through else sender)
+
+
+def connect_signals():
+    for model in (Author, Book, BookInstance, Genre):
+        post_save.connect(saved, sender=model, dispatch_uid=f'versions_{model.__name__}_saved')
+        post_delete.connect(saved, sender=model, dispatch_uid=f'versions_{model.__name__}_deleted')
+    m2m_changed.connect(book_genre_changed, sender=Book.genre.through, dispatch_uid='versions_book_genre')
+    for model in (User, Group, Permission):
+        post_save.connect(auth_changed, sender=model, dispatch_uid=f'versions_{model.__name__}_saved')
+        post_delete.connect(auth_changed, sender=model, dispatch_uid=f'versions_{model.__name__}_deleted')
+    for through in (User.groups.through, User.user_permissions.through, Group.permissions.through):
+        m2m_changed.connect(auth_changed, sender=through, dispatch_uid=f'versions_{through.__name__}')
+    signals.bulk_changed.connect(bulk_changed, dispatch_uid='versions_bulk_changed')
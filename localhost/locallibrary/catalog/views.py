@@ -1,20 +1,36 @@
 import datetime
 import json
+import os
 
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib.auth.mixins import (LoginRequiredMixin,
                                         PermissionRequiredMixin)
 from django.contrib.auth.models import Group, User
-from django.http import HttpResponseRedirect
+from django.core.paginator import Paginator
+from django.http import (Http404, HttpResponseBadRequest, HttpResponseForbidden, HttpResponseRedirect,
+                         StreamingHttpResponse)
 from django.http.response import HttpResponse
 from django.shortcuts import get_object_or_404, render
 from django.urls import reverse, reverse_lazy
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.crypto import constant_time_compare
+from django.utils.decorators import method_decorator
+from django.utils.functional import SimpleLazyObject
 from django.views import generic
 from django.views.generic.edit import CreateView, DeleteView, UpdateView
 from rest_framework import permissions, viewsets
 
+from catalog import exporter, loans, profiling, visits
+from catalog.counters import get_counters
 from catalog.forms import RenewBookForm
 from catalog.models import Author, Book, BookInstance, Genre
+from catalog.pagination import CursorPaginationMixin
+from catalog.routers import replica_reads
+from catalog.search import search
+from catalog.versions import conditional
 from catalog.serializers import (AuthorSerializer, BookSerializer,
                                  GenreSerializer, GroupSerializer,
                                  UserSerializer)
@@ -22,92 +38,120 @@ from catalog.serializers import (AuthorSerializer, BookSerializer,
 # Create your views here.
 
 
+@replica_reads
 def index(request):
     """ View function for home page of site."""
 
-    # Generate couts of some of the main objects
-    num_books = Book.objects.all().count()
-    num_instances = BookInstance.objects.all().count()
+    # Counts of the main objects, kept in the cache by catalog.counters
+    counters = get_counters()
 
-    # Available books (status = 'a')
-    num_instances_available = BookInstance.objects.filter(
-        status__exact='a').count()
-
-    # The 'all()' is implied by default.
-    num_authors = Author.objects.count()
-
-    num_visits = request.session.get('num_visits', 1)
-    request.session['num_visits'] = num_visits + 1
-
-    # Filter Genre books
-    num_dorama = Book.objects.filter(genre__name__icontains='science').count()
-    # num_dorama = Book.objects.filter(genre__contains='dorama').count()
-    # num_dorama = Book.objects.filter(genre__exact='dorama').count()
-
-    with open('/etc/map_token.txt') as f:
-        map_token = f.read().strip()
+    # Counted in a signed cookie rather than the session, which would be a
+    # database write per page view
+    num_visits = visits.get_visits(request)
 
     context = {
-        'num_books': num_books,
-        'num_instances': num_instances,
-        'num_instances_available': num_instances_available,
-        'num_authors': num_authors,
-        'num_dorama': num_dorama,
+        **counters,
         'num_visits': num_visits,
-        'map_token': map_token,
+        'map_token': settings.MAP_TOKEN,
     }
 
     # Render the HTML template index.html with the data in the context variable
-    return render(request, 'index.html', context=context)
+    return visits.count_visit(render(request, 'index.html', context=context), num_visits)
 
 
-class BookListView(generic.ListView):
+@method_decorator(conditional(Book, Author, Genre, BookInstance), name='get')
+class BookListView(CursorPaginationMixin, generic.ListView):
     model = Book
+    replica_reads = True
     paginate_by = 3
+    cursor_ordering = ('title', 'id')
     # context_object_name = 'my_book_list'   # your own name for the list as a template variable
     # queryset = Book.objects.filter(title__icontains='war')[:5] # Get 5 books containing the title war
     # template_name = 'books/my_arbitrary_template_name_list.html'  # Specify your own template name/location
 
 
+@method_decorator(conditional(Book, Author, Genre, BookInstance), name='get')
 class BookDetailView(generic.DetailView):
     model = Book
+    replica_reads = True
+    queryset = Book.objects.select_related('author')
+    # Copies are paginated so that a popular title stays a fixed number of queries
+    copies_paginate_by = 20
+
+    def get_context_data(self, **kwargs):
+        context = super(BookDetailView, self).get_context_data(**kwargs)
+        copies = self.object.bookinstance_set.order_by('due_back', 'id')
+        paginator = Paginator(copies, self.copies_paginate_by)
+        # Lazy: only evaluated when the copies fragment is not cached.
+        context['copies'] = SimpleLazyObject(lambda: paginator.get_page(self.request.GET.get('page')))
+        # Resolve the permission once rather than once per copy in the template
+        context['can_mark_returned'] = self.request.user.has_perm('catalog.can_mark_returned')
+        return context
 
 
-class AuthorListView(generic.ListView):
+@method_decorator(conditional(Author), name='get')
+class AuthorListView(CursorPaginationMixin, generic.ListView):
     model = Author
+    replica_reads = True
     paginate_by = 5
+    cursor_ordering = ('last_name', 'first_name', 'id')
 
 
+@method_decorator(conditional(Author, Book, Genre, BookInstance), name='get')
 class AuthorDetailView(generic.DetailView):
     model = Author
+    # Works are paginated so that a prolific author stays a fixed number of queries
+    works_paginate_by = 20
 
     def get_context_data(self, **kwargs):
         context = super(AuthorDetailView, self).get_context_data(**kwargs)
-        author_id = self.request.path.split('/')[-1]
-        works = Book.objects.filter(author__id__exact=author_id)
-        context['works'] = works
+        works = self.object.book_set.order_by('title', 'id').prefetch_related('genre')
+        paginator = Paginator(works, self.works_paginate_by)
+        # Lazy: only evaluated when the works fragment is not cached.
+        context['works'] = SimpleLazyObject(lambda: paginator.get_page(self.request.GET.get('page')))
         return context
 
 
-class LoanedBooksByUserListView(LoginRequiredMixin, generic.ListView):
+@method_decorator(conditional(Book, Author, Genre), name='get')
+class SearchView(generic.ListView):
+    """ Ranked full-text search over books, authors and genres. """
+    template_name = 'catalog/search_results.html'
+    context_object_name = 'book_list'
+    paginate_by = 10
+
+    def get_queryset(self):
+        return search(self.request.GET.get('q', ''))
+
+    def get_context_data(self, **kwargs):
+        context = super(SearchView, self).get_context_data(**kwargs)
+        context['query'] = self.request.GET.get('q', '')
+        return context
+
+
+@method_decorator(conditional(BookInstance, Book), name='get')
+class LoanedBooksByUserListView(LoginRequiredMixin, CursorPaginationMixin, generic.ListView):
     """Generic class-based view listing books on loan to current user."""
     model = BookInstance
     template_name = 'catalog/bookinstance_list_borrowed_user.html'
     paginate_by = 10
+    cursor_ordering = ('due_back', 'id')
 
     def get_queryset(self):
-        return BookInstance.objects.filter(borrower=self.request.user).filter(status__exact='o').order_by('due_back')
+        return (BookInstance.objects.filter(borrower=self.request.user).filter(status__exact='o')
+                .select_related('book').with_overdue())
 
 
-class BorrowedListView(LoginRequiredMixin, PermissionRequiredMixin, generic.ListView):
+@method_decorator(conditional(BookInstance, Book), name='get')
+class BorrowedListView(LoginRequiredMixin, PermissionRequiredMixin, CursorPaginationMixin, generic.ListView):
     """ Generic class-based view listing book borrowed. """
     model = BookInstance
     template_name = 'catalog/borrowed_list.html'
     paginate_by = 10
+    cursor_ordering = ('due_back', 'id')
     permission_required = ('catalog.can_view_borrowed')
 
     def get_queryset(self):
-        return BookInstance.objects.filter(status__exact='o')
+        return BookInstance.objects.filter(status__exact='o').select_related('book', 'borrower').with_overdue()
 
 
 @login_required
@@ -123,12 +167,12 @@ def renew_book_librarian(request, pk):
 
         # Check if the form is valid:
         if form.is_valid():
-            # process the data in form.cleaned_data as required (here we just write it to the model due_back field)
-            book_instance.due_back = form.cleaned_data['renewal_date']
-            book_instance.save()
-
-            # redirect to a new URL:
-            return HttpResponseRedirect(reverse('borrowed'))
+            # Conditional UPDATE: the copy may have been returned meanwhile
+            result = loans.renew([book_instance.pk], form.cleaned_data['renewal_date'])
+            if result.done:
+                # redirect to a new URL:
+                return HttpResponseRedirect(reverse('borrowed'))
+            form.add_error(None, 'This copy is no longer on loan.')
 
     # If this is a GET (or any other method) create the default form.
     else:
@@ -143,6 +187,66 @@ def renew_book_librarian(request, pk):
     return render(request, 'catalog/book_renew_librarian.html', context)
 
 
+@login_required
+@permission_required('catalog.can_view_borrowed', raise_exception=True)
+def export(request, name, file_format):
+    """ Stream a catalog export, optionally limited to the rows changed ``?since=``. """
+    if name not in exporter.EXPORTS or file_format not in exporter.FORMATS:
+        raise Http404('Unknown export')
+    since = None
+    if request.GET.get('since'):
+        since = parse_datetime(request.GET['since'])
+        if since is None:
+            return HttpResponseBadRequest('since must be an ISO 8601 date and time')
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+
+    rows = exporter.export_rows(name, since=since)
+    response = StreamingHttpResponse(
+        exporter.render(name, rows, file_format),
+        content_type=exporter.FORMATS[file_format],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{name}.{file_format}"'
+    return response
+
+
+@staff_member_required
+def profiling_dashboard(request):
+    """ Per URL name timings of this process (catalog.profiling). """
+    views = []
+    for view_name, stats in profiling.registry.snapshot().items():
+        histograms = stats.histograms
+        duration = histograms['duration_seconds']
+        views.append({
+            'name': view_name,
+            'requests': stats.requests,
+            'sampled': duration.count,
+            'p50_ms': duration.quantile(0.50) * 1000,
+            'p95_ms': duration.quantile(0.95) * 1000,
+            'p99_ms': duration.quantile(0.99) * 1000,
+            'sql_queries': histograms['sql_queries'].mean,
+            'sql_ms': histograms['sql_seconds'].mean * 1000,
+            'template_ms': histograms['template_seconds'].mean * 1000,
+            'response_kb': histograms['response_bytes'].mean / 1024,
+        })
+    context = {
+        'views': views,
+        'sample_rate': profiling.sample_rate(),
+        'pid': os.getpid(),
+    }
+    return render(request, 'catalog/profiling.html', context)
+
+
+def metrics(request):
+    """ The statistics of catalog.profiling, for Prometheus. """
+    token = settings.CATALOG_METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if not (request.user.is_active and request.user.is_staff) and \
+            not (token and constant_time_compare(authorization, f'Bearer {token}')):
+        return HttpResponseForbidden()
+    return HttpResponse(profiling.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 class PermissionLibrarian(LoginRequiredMixin, PermissionRequiredMixin):
     permission_required = ('catalog.can_view_borrowed')
 
@@ -24,6 +24,10 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 with open('/etc/secret_key.txt') as f:
     SECRET_KEY = f.read().strip()
 
+# Google Maps key for the home page, read once at startup.
+with open('/etc/map_token.txt') as f:
+    MAP_TOKEN = f.read().strip()
+
 # SECURITY WARNING: don't run with debug turned on in production!
 # DEBUG = True
 DEBUG = os.environ.get('DJANGO_DEBUG', '') != 'False'
@@ -45,11 +49,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'catalog.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'catalog.middleware.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -58,7 +64,8 @@ ROOT_URLCONF = 'locallibrary.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # The Django engine, timing the renders for catalog.profiling
+        'BACKEND': 'catalog.profiling.ProfilingDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR), 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -85,6 +92,74 @@ DATABASES = {
     }
 }
 
+# Database profile, from the CATALOG_DB_PROFILE environment variable:
+# 'default' keeps Django's defaults (a new connection per request, SQLite's
+# rollback journal); 'tuned' is meant for serving from the SQLite file in
+# production: WAL journaling so readers don't wait for writers, and
+# connections kept for CONN_MAX_AGE seconds, checked before being reused.
+# The pragmas are applied by catalog.database on every new connection.
+# manage.py bench_database compares the two on a mixed read/write load.
+CATALOG_DB_PROFILE = os.environ.get('CATALOG_DB_PROFILE', 'default')
+
+CATALOG_SQLITE_PRAGMAS = {}
+
+if CATALOG_DB_PROFILE == 'tuned':
+    DATABASES['default']['CONN_MAX_AGE'] = 600
+    CATALOG_SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        # Only the checkpoints sync to disk; a commit survives a crash of
+        # the application, though not a power loss.
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        # Negative: in KiB, i.e. 64 MiB of page cache per connection.
+        'cache_size': -64 * 1024,
+        # Milliseconds a writer waits for the lock before failing.
+        'busy_timeout': 5000,
+    }
+
+# Read replicas of 'default' (catalog.routers): the reads of the catalog
+# pages and API list/retrieve go to one of CATALOG_REPLICAS, picked at
+# random. For a local test, CATALOG_REPLICA_FILES lists SQLite files kept
+# as copies of db.sqlite3 by manage.py sync_replicas; PostgreSQL replicas
+# are added to DATABASES and CATALOG_REPLICAS the same way.
+for number, name in enumerate(filter(None, os.environ.get('CATALOG_REPLICA_FILES', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME': name,
+        # Tests read the primary's test database
+        'TEST': {'MIRROR': 'default'},
+    }
+
+CATALOG_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
+DATABASE_ROUTERS = ['catalog.routers.ReplicaRouter']
+
+# Seconds a session reads from the primary after writing, to see its own
+# writes; also the longest replication lag expected.
+CATALOG_REPLICA_PIN_SECONDS = 10
+
+# Cache shared by all the worker processes (uwsgi --processes, uvicorn
+# --workers): the permissions, versions and counters kept in it are
+# invalidated by the process handling the write, and must be so for every
+# process (catalog.caches). CATALOG_MEMCACHED (host:port, comma-separated)
+# selects memcached; the default is a table of the database, created by the
+# migrations.
+if os.environ.get('CATALOG_MEMCACHED'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': os.environ['CATALOG_MEMCACHED'].split(','),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'catalog_cache',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -137,7 +212,13 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_REDIRECT_URL = '/'
 
-EMALL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+# ModelBackend, with the permissions of each user kept in the cache
+AUTHENTICATION_BACKENDS = ['catalog.backends.CachedModelBackend']
+
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# Sender of the overdue loan reminders (manage.py process_overdue_loans)
+DEFAULT_FROM_EMAIL = 'library@localhost'
 
 REST_FRAMEWORK = {
     # Use Django's standard `django.contrib.auth` permissions,
@@ -146,3 +227,37 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.DjangoModelPermissionsOrAnonReadOnly'
     ]
 }
+
+# Seconds the home page counters (catalog.counters) stay in the cache
+# before being recomputed from the database.
+CATALOG_COUNTERS_TIMEOUT = 60 * 60
+
+# Seconds the permissions of a user (catalog.backends) stay in the cache.
+CATALOG_PERMISSIONS_TIMEOUT = 60 * 60
+
+# Largest number of items accepted by one request to the bulk API
+# endpoints (/api/<books|authors|genres>/bulk/).
+CATALOG_BULK_MAX_ITEMS = 1000
+
+# Rows above which the admin changelists show the estimated number of rows
+# of an unfiltered table (catalog.pagination.EstimatedCountPaginator)
+# rather than count them.
+CATALOG_ESTIMATED_COUNT_THRESHOLD = 100000
+
+# Seconds a rendered fragment (catalog.fragments) stays in the cache. Stale
+# fragments are never served: a committed change gives the object a new
+# version.
+CATALOG_FRAGMENT_TIMEOUT = 24 * 60 * 60
+
+# Request profiling (catalog.profiling): share of the requests whose SQL,
+# template and total times are recorded; every request is counted.
+CATALOG_PROFILING_SAMPLE_RATE = float(os.environ.get('CATALOG_PROFILING_SAMPLE_RATE', '0.01'))
+
+# Directory receiving the cProfile dumps of the sampled requests slower than
+# CATALOG_PROFILING_SLOW_SECONDS; no profiling when empty.
+CATALOG_PROFILING_DUMP_DIR = os.environ.get('CATALOG_PROFILING_DUMP_DIR', '')
+CATALOG_PROFILING_SLOW_SECONDS = 1.0
+
+# Bearer token giving a Prometheus server access to /catalog/metrics/
+# (staff users always have access).
+CATALOG_METRICS_TOKEN = os.environ.get('CATALOG_METRICS_TOKEN', '')
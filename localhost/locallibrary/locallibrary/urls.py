@@ -66,13 +66,17 @@ class UserViewSet(viewsets.ModelViewSet):
 router = routers.DefaultRouter()
 router.register(r'users', APIviews.UserViewSet)
 router.register(r'groups', APIviews.GroupViewSet)
-router.register(r'books', APIviews.BookViewSet)
-router.register(r'genres', APIviews.GenreViewSet)
-router.register(r'authors', APIviews.AuthorViewSet)
+# The catalog app already uses 'book-detail' and 'author-detail' for its HTML
+# pages, so the API routes get their own prefix.
+router.register(r'books', APIviews.BookViewSet, basename='api-book')
+router.register(r'genres', APIviews.GenreViewSet, basename='api-genre')
+router.register(r'authors', APIviews.AuthorViewSet, basename='api-author')
+router.register(r'loans', APIviews.LoanViewSet, basename='api-loan')
 
 # Wire up our API using automatic URL routing.
 # Additionally, we include login URLs for the browsable API.
 urlpatterns += [
+    path('api/search/', APIviews.SearchAPIView.as_view(), name='api-search'),
     path('api/', include(router.urls)),
     path('api-auth/', include('rest_framework.urls', namespace='rest_framework')),
 ]
\ No newline at end of file